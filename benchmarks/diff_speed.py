@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""Time diffing two pulls of --count Task objects.
+
+The new pull has 1% of the old tasks changed (status, percentComplete or
+assignee), 0.5% removed and 0.5% added. Both sides are decoded Task
+objects; the time to decode them isn't counted.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyattask.diff import ADDED, CHANGED, REMOVED, diff, summarize
+from pyattask.task import Task
+
+STATUSES = ("NEW", "INP", "CPL", "CUR", "ONH")
+
+
+def make_task(rnd, number, users):
+    """Return the JSON for a plausible task"""
+    return {
+        "ID": "{:032x}".format(rnd.getrandbits(128)),
+        "name": "Task {}".format(number),
+        "objCode": "TASK",
+        "status": rnd.choice(STATUSES),
+        "percentComplete": rnd.choice((0.0, 25.0, 50.0, 100.0)),
+        "priority": rnd.randint(0, 4),
+        "projectID": "{:032x}".format(number // 2000),
+        "assignedToID": rnd.choice(users),
+        "lastUpdateDate": "2014-05-01T16:12:00:000-0500",
+    }
+
+
+def make_pulls(count, seed):
+    """Return (old, new) lists of Task objects"""
+    rnd = random.Random(seed)
+    users = ["{:032x}".format(rnd.getrandbits(128)) for _ in range(500)]
+    old = [make_task(rnd, number, users) for number in range(count)]
+
+    new = []
+    for task in old:
+        roll = rnd.random()
+        if roll < 0.005:
+            continue
+        if roll < 0.015:
+            task = dict(task, status=rnd.choice(STATUSES),
+                        assignedToID=rnd.choice(users),
+                        lastUpdateDate="2014-05-02T09:00:00:000-0500")
+        new.append(task)
+    new.extend(make_task(rnd, count + number, users)
+               for number in range(count // 200))
+    rnd.shuffle(new)
+
+    return ([Task.from_json(task) for task in old],
+            [Task.from_json(task) for task in new])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    import logging
+    logging.getLogger('pyattask').setLevel(logging.ERROR)
+
+    old, new = make_pulls(args.count, args.seed)
+    for changes in (False, True):
+        started = time.time()
+        counts = summarize(diff(old, new, changes=changes))
+        elapsed = time.time() - started
+        print("changes={!s:<6} {:>8.2f}s  {:,} added, {:,} removed, "
+              "{:,} changed".format(changes, elapsed, counts[ADDED],
+                                    counts[REMOVED], counts[CHANGED]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
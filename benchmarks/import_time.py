@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""Measure the cold-start cost of importing the pyattask object modules.
+
+Each sample runs a fresh interpreter, so nothing is cached in sys.modules.
+The interpreter's own startup time is measured separately and subtracted.
+The run fails if any of the lazily loaded dependencies were imported, or if
+the import takes longer than --budget milliseconds.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# Modules only the login path (or session creation) should ever load
+LAZY_MODULES = ('requests', 'requests_ntlm', 'bs4', 'cookielib', 'ssl')
+
+IMPORT_STATEMENT = ("import pyattask.task, pyattask.issue, "
+                    "pyattask.project, pyattask.user")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def best_of(code, repeat):
+    """Return the fastest wall-clock time (in ms) to run code in a fresh
+    interpreter"""
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, PYTHONDONTWRITEBYTECODE='1')
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', code], env=env)
+        elapsed = (time.time() - start) * 1000
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def loaded_lazy_modules():
+    """Return the lazily-loaded modules pulled in by IMPORT_STATEMENT"""
+    code = (IMPORT_STATEMENT + "\nimport sys\n" +
+            "print(' '.join(m for m in {!r} if m in sys.modules))".format(
+                LAZY_MODULES))
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, PYTHONDONTWRITEBYTECODE='1')
+    output = subprocess.check_output([sys.executable, '-c', code], env=env)
+    return output.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--budget', type=float, default=50.0,
+                        help="maximum import time in ms (default: 50)")
+    args = parser.parse_args()
+
+    baseline = best_of("pass", args.repeat)
+    total = best_of(IMPORT_STATEMENT, args.repeat)
+    cost = total - baseline
+    print("interpreter startup: {:.1f}ms".format(baseline))
+    print("pyattask import:     {:.1f}ms".format(cost))
+
+    eager = loaded_lazy_modules()
+    if eager:
+        print("FAIL: imported eagerly: {}".format(", ".join(eager)))
+        return 1
+    if cost > args.budget:
+        print("FAIL: over budget of {:.1f}ms".format(args.budget))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""Measure the memory held by decoded Task objects, with and without value
+interning.
+
+Each mode runs in a fresh interpreter, which decodes --count synthetic tasks
+a page of JSON at a time with Task.from_json, keeping only the objects, and
+reports how much its resident set grew. The payload mimics a large tenant: a few hundred
+projects and assignees, and a handful of statuses and priorities.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+STATUSES = ("NEW", "INP", "CPL", "CUR", "ONH")
+PROGRESS = ("ON", "BH", "LT", "AR")
+
+
+def make_pages(count, seed, pagesize=2000):
+    """Return the JSON text of the pages of a search returning count tasks"""
+    rnd = random.Random(seed)
+    projects = ["{:032x}".format(rnd.getrandbits(128)) for _ in range(300)]
+    users = ["{:032x}".format(rnd.getrandbits(128)) for _ in range(500)]
+    tasks = []
+    for number in range(count):
+        project = rnd.choice(projects)
+        tasks.append({
+            "ID": "{:032x}".format(rnd.getrandbits(128)),
+            "name": "Task {}".format(number),
+            "objCode": "TASK",
+            "status": rnd.choice(STATUSES),
+            "progressStatus": rnd.choice(PROGRESS),
+            "priority": rnd.randint(0, 4),
+            "projectID": project,
+            "parentID": None,
+            "assignedToID": rnd.choice(users),
+        })
+    return [json.dumps({"data": tasks[first:first + pagesize]})
+            for first in range(0, count, pagesize)]
+
+
+def rss_kb():
+    """Return this process's current resident set size in kB"""
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    raise RuntimeError("no VmRSS in /proc/self/status")
+
+
+def measure(count, seed, intern):
+    """Decode the payload in this process and print the RSS growth in kB"""
+    import gc
+    from pyattask.task import Task
+
+    if not intern:
+        Task._api_internfields = ()
+    pages = make_pages(count, seed)
+
+    gc.collect()
+    before = rss_kb()
+    tasks = []
+    for page in pages:
+        tasks.extend(Task.from_json(result)
+                     for result in json.loads(page)['data'])
+    gc.collect()
+    print(rss_kb() - before)
+    return tasks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--measure', choices=('interned', 'plain'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        import logging
+        logging.getLogger('pyattask').setLevel(logging.ERROR)
+        measure(args.count, args.seed, args.measure == 'interned')
+        return 0
+
+    results = {}
+    for mode in ('plain', 'interned'):
+        output = subprocess.check_output(
+            [sys.executable, __file__, '--count', str(args.count),
+             '--seed', str(args.seed), '--measure', mode])
+        results[mode] = int(output.split()[-1])
+
+    print("resident memory for {:,} decoded Task objects".format(args.count))
+    print("  plain:    {:>10,} kB".format(results['plain']))
+    print("  interned: {:>10,} kB".format(results['interned']))
+    print("  saved:    {:>10,} kB ({:.0%})".format(
+        results['plain'] - results['interned'],
+        1 - float(results['interned']) / results['plain']))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""Time a paged search against a recording of the API, offline.
+
+Record once against a live tenant:
+
+    replay_search.py --record pyattask.ini Production tasks.rec
+
+then replay it as often as needed, with no network:
+
+    replay_search.py --url https://.../attask/api/v4.0 tasks.rec
+
+Replays run in a single process with the recorded latency by default
+(--latency 0 to measure decoding alone), and report the time for each run.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyattask.cli
+import pyattask.session
+from pyattask.transport import RecordingTransport, ReplayTransport
+
+
+def run(objclass, filters, pagesize):
+    """Fetch every match, returning how many there were"""
+    query = pyattask.cli.parse_filters(objclass, filters)
+    return sum(1 for _ in objclass.iter_search(query, pagesize=pagesize))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('recording')
+    parser.add_argument('--record', nargs=2, metavar=('CONFIG', 'SECTION'),
+                        help="record against the tenant in CONFIG's SECTION")
+    parser.add_argument('--url', help="the API url the recording was made "
+                                      "against (when replaying)")
+    parser.add_argument('--class', dest='objclass', default='task',
+                        choices=sorted(pyattask.cli.CLASSES))
+    parser.add_argument('--filter', action='append', default=[],
+                        help="field=value, as for 'pyattask export'")
+    parser.add_argument('--pagesize', type=int, default=500)
+    parser.add_argument('--latency', default='recorded',
+                        help="'recorded', or seconds per request")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    objclass = pyattask.cli.CLASSES[args.objclass]
+
+    if args.record:
+        pyattask.cli.connect(*args.record)
+        session = pyattask.session.get_session()
+        session.set_transport(RecordingTransport(session.transport,
+                                                 args.recording, mode='w'))
+        print("recorded {} {} objects".format(
+            run(objclass, args.filter, args.pagesize), args.objclass))
+        session.transport.close()
+        return 0
+
+    if not args.url:
+        parser.error("--url is needed to replay")
+    latency = args.latency
+    if latency != 'recorded':
+        latency = float(latency)
+
+    pyattask.session.create_session(args.url)
+    session = pyattask.session.get_session()
+    for number in range(args.repeat):
+        session.set_transport(ReplayTransport(args.recording, latency))
+        started = time.time()
+        count = run(objclass, args.filter, args.pagesize)
+        elapsed = time.time() - started
+        print("run {}: {} objects in {:.3f}s ({:,.0f}/s)".format(
+            number + 1, count, elapsed, count / elapsed if elapsed else 0))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
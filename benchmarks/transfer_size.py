@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""Report the bytes needed to transfer 10k Task objects.
+
+The payload is a synthetic but representative Task search result: a handful
+of projects, statuses and assignees, plenty of null fields. Sizes are shown
+for the plain JSON, with null/empty fields stripped, and projected down to a
+few fields, each uncompressed and with gzip and deflate applied.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyattask.session import _strip_empty
+from pyattask.task import Task
+
+STATUSES = ("NEW", "INP", "CPL", "CUR", "ONH")
+PROGRESS = ("ON", "BH", "LT", "AR", None)
+
+# Fields a typical report actually asks for
+PROJECTED_FIELDS = ("ID", "name", "objCode", "status", "percentComplete",
+                    "plannedCompletionDate")
+
+
+def make_task(rnd, number):
+    """Return the JSON for a plausible task"""
+    day = rnd.randint(1, 28)
+    return {
+        "ID": "{:032x}".format(rnd.getrandbits(128)),
+        "name": "Task {} of the quarterly plan".format(number),
+        "objCode": "TASK",
+        "percentComplete": rnd.choice((0.0, 25.0, 50.0, 100.0)),
+        "plannedCompletionDate": "2014-06-{:02d}T17:00:00:000-0500".format(day),
+        "plannedStartDate": "2014-05-{:02d}T09:00:00:000-0500".format(day),
+        "priority": rnd.randint(0, 4),
+        "progressStatus": rnd.choice(PROGRESS),
+        "projectedCompletionDate": None,
+        "projectedStartDate": None,
+        "status": rnd.choice(STATUSES),
+        "taskNumber": number,
+        "wbs": "{}.{}".format(number // 100, number % 100),
+        "workRequired": rnd.choice((0, 480, 960, None)),
+        "entryDate": "2014-04-{:02d}T11:30:00:000-0500".format(day),
+        "lastUpdateDate": "2014-05-{:02d}T16:12:00:000-0500".format(day),
+        "projectID": "{:032x}".format(number // 2000),
+        "parentID": None,
+        "assignedToID": "{:032x}".format(rnd.randint(0, 300)),
+    }
+
+
+def sizes(payload):
+    """Return (plain, gzip, deflate) sizes of payload"""
+    body = json.dumps({"data": payload}, separators=(',', ':'))
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    gzipped = gzip.compress(body) + gzip.flush()
+    return len(body), len(gzipped), len(zlib.compress(body, 6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    tasks = [make_task(rnd, number) for number in range(args.count)]
+    assert set(tasks[0]) == set(Task.objattrs())
+
+    variants = (
+        ("all fields", tasks),
+        ("nulls stripped", _strip_empty(tasks)),
+        ("projected", [dict((key, task[key]) for key in PROJECTED_FIELDS)
+                       for task in tasks]),
+    )
+
+    scale = 10000.0 / args.count
+    print("bytes per 10k Task objects")
+    print("{:<16}{:>12}{:>12}{:>12}".format("", "plain", "gzip", "deflate"))
+    for name, payload in variants:
+        print("{:<16}{:>12,.0f}{:>12,.0f}{:>12,.0f}".format(
+            name, *[size * scale for size in sizes(payload)]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,525 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""Object caches shared between threads or processes
+
+A cache set on the session with AtTaskSession.set_cache() is consulted by
+AtTaskObject.get() (and so User.current_user()) before going upstream.
+Entries carry their own TTL and are dropped when an event for the object
+arrives (see pyattask.events), or when this process writes to it.
+
+SQLiteCache keeps entries in a SQLite database in WAL mode, so every worker
+process on a host can share it, and fills each key under a file lock: when
+N workers miss on the same object at once, one fetches it and the others
+wait for, then read, its result. MemoryCache is the single-process
+equivalent, holding at most max_entries, least recently used first out.
+
+Given a grace period, a cache also serves entries past their TTL rather
+than making the caller wait for the upstream: read() returns a stale entry
+at once, flagged as stale, and refreshes it in the background. If the
+upstream fails, stale entries keep being served until the grace period
+runs out, so readers ride out a slow or unavailable tenant.
+"""
+
+import collections
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+
+from pyattask.concurrency import SingleFlight
+from pyattask.exceptions import AtTaskException
+from pyattask.locking import locked
+
+import logging
+log = logging.getLogger(__name__)
+
+
+def _now():
+    return time.time()
+
+
+class Entry(object):
+    """A cached value and when it was stored and expires"""
+
+    __slots__ = ('value', 'stored', 'expires')
+
+    def __init__(self, value, stored, expires):
+        self.value = value
+        self.stored = stored
+        self.expires = expires
+
+    def __repr__(self):
+        return "<Entry stored={} expires={}>".format(self.stored,
+                                                     self.expires)
+
+    @property
+    def fresh(self):
+        """Return whether the entry is still within its TTL
+
+        Returns:
+          bool
+        """
+        return _now() < self.expires
+
+
+class _Cache(object):
+    """What the cache backends have in common
+
+    Subclasses provide _lookup, _store, _delete, _delete_tag and clear.
+    """
+
+    def __init__(self, ttl=60, grace=0):
+        self.ttl = ttl
+        self.grace = grace
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+
+    def entry(self, key):
+        """Return the entry for key, fresh or not
+
+        Args:
+          key (str): the cache key
+
+        Returns:
+          Entry: the entry, or None if there isn't one
+        """
+        return self._lookup(key)
+
+    def get(self, key, default=None):
+        """Return the value for key if it's fresh
+
+        Args:
+          key (str): the cache key
+          default (optional): returned on a miss
+
+        Returns:
+          the value, or default
+        """
+        entry = self._lookup(key)
+        if entry is None or not entry.fresh:
+            return default
+        return entry.value
+
+    def set(self, key, value, ttl=None, tag=None):
+        """Store a value
+
+        Args:
+          key (str): the cache key
+          value: anything that can be encoded as json
+          ttl (float, optional): seconds the value stays fresh. Defaults to
+            the cache's ttl
+          tag (str, optional): a name to invalidate() the entry by, e.g. the
+            object it holds. Many keys can share a tag
+        """
+        if ttl is None:
+            ttl = self.ttl
+        now = _now()
+        self._store(key, value, now, now + ttl, tag)
+
+    def delete(self, key):
+        """Drop the entry for key, if there is one
+
+        Args:
+          key (str): the cache key
+        """
+        self._delete(key)
+
+    def invalidate(self, tag):
+        """Drop every entry stored with tag
+
+        Args:
+          tag (str): the tag given to set()
+        """
+        log.debug("invalidating {}".format(tag))
+        self._delete_tag(tag)
+
+    def get_or_fill(self, key, fill, ttl=None, tag=None):
+        """Return the value for key, calling fill to produce it on a miss
+
+        Only one caller fills a key at a time; the others wait for it and
+        use what it stored.
+
+        Args:
+          key (str): the cache key
+          fill (callable): called with no arguments to produce the value
+          ttl (float, optional): seconds the value stays fresh
+          tag (str, optional): see set()
+
+        Returns:
+          the cached or freshly filled value
+        """
+        return self.read(key, fill, ttl, tag)[0]
+
+    def read(self, key, fill, ttl=None, tag=None):
+        """Return the value for key, and whether it is stale
+
+        A fresh entry is returned as is. One past its TTL but within the
+        grace period is returned straight away, flagged as stale, while a
+        background thread refreshes it. Otherwise fill is called; if that
+        fails with an API or network error and the entry is within the
+        grace period, the stale entry is returned instead of the error.
+
+        Args:
+          key (str): the cache key
+          fill (callable): called with no arguments to produce the value
+          ttl (float, optional): seconds the value stays fresh
+          tag (str, optional): see set()
+
+        Returns:
+          (value, bool): the value, and True if it is stale
+
+        Raises:
+          whatever fill raises, when there's nothing to fall back on
+        """
+        entry = self._lookup(key)
+        if entry is not None:
+            if entry.fresh:
+                return entry.value, False
+            if self._servable(entry):
+                self._refresh(key, fill, ttl, tag)
+                return entry.value, True
+
+        try:
+            return self._fill(key, fill, ttl, tag), False
+        except (AtTaskException, IOError):
+            exc_info = sys.exc_info()
+            # The entry may have been refreshed, or have expired, since
+            entry = self._lookup(key)
+            if entry is None or not self._servable(entry):
+                raise exc_info[0], exc_info[1], exc_info[2]
+            log.warning("serving stale {}: {}".format(key, exc_info[1]))
+            return entry.value, not entry.fresh
+
+    def _servable(self, entry):
+        """Return whether entry is within the grace period"""
+        return _now() < entry.expires + self.grace
+
+    def _refresh(self, key, fill, ttl, tag):
+        """Refill key in a background thread, unless that's under way"""
+        with self._refreshing_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._fill(key, fill, ttl, tag)
+            except Exception as err:
+                log.warning("refreshing {} failed: {}".format(key, err))
+            finally:
+                with self._refreshing_lock:
+                    self._refreshing.discard(key)
+
+        log.debug("refreshing {} in the background".format(key))
+        thread = threading.Thread(target=refresh, name="pyattask-refresh")
+        thread.daemon = True
+        thread.start()
+
+    def _fill(self, key, fill, ttl, tag):
+        with self._fill_lock(key):
+            # Someone else may have filled it while we waited for the lock
+            entry = self._lookup(key)
+            if entry is not None and entry.fresh:
+                return entry.value
+            value = fill()
+            self.set(key, value, ttl, tag)
+            return value
+
+
+class MemoryCache(_Cache):
+    """A cache private to this process
+
+    Entries past their grace period are dropped when they are next read;
+    beyond max_entries, the least recently used ones are dropped.
+    """
+
+    def __init__(self, ttl=60, grace=0, max_entries=10000):
+        """Initialize the MemoryCache object
+
+        Args:
+          ttl (float, optional): default seconds entries stay fresh
+          grace (float, optional): seconds past their TTL entries may still
+            be served, flagged as stale. Defaults to 0
+          max_entries (int, optional): the most entries to keep
+        """
+        super(MemoryCache, self).__init__(ttl, grace)
+        self.max_entries = max_entries
+        # key -> (Entry, tag), least recently used first
+        self._entries = collections.OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    def __repr__(self):
+        return "<MemoryCache {} entries>".format(len(self._entries))
+
+    def _lookup(self, key):
+        with self._lock:
+            item = self._entries.pop(key, None)
+            if item is None:
+                return None
+            entry = item[0]
+            if not self._servable(entry):
+                self._untag(key, item[1])
+                return None
+            self._entries[key] = item
+            return entry
+
+    def _store(self, key, value, stored, expires, tag):
+        with self._lock:
+            item = self._entries.pop(key, None)
+            if item is not None:
+                self._untag(key, item[1])
+            self._entries[key] = (Entry(value, stored, expires), tag)
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest, (_, oldest_tag) = self._entries.popitem(last=False)
+                self._untag(oldest, oldest_tag)
+
+    def _untag(self, key, tag):
+        """Remove key from tag's keys, and tag once it has none left"""
+        keys = self._tags.get(tag)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+    def _delete(self, key):
+        with self._lock:
+            item = self._entries.pop(key, None)
+            if item is not None:
+                self._untag(key, item[1])
+
+    def _delete_tag(self, tag):
+        with self._lock:
+            for key in self._tags.pop(tag, ()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def _fill(self, key, fill, ttl, tag):
+        def fill_and_store():
+            value = fill()
+            self.set(key, value, ttl, tag)
+            return value
+        return self._flight.do(key, fill_and_store)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    tag TEXT,
+    value TEXT NOT NULL,
+    stored REAL NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_tag ON entries (tag);
+CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires);
+"""
+
+
+class SQLiteCache(_Cache):
+    """A cache shared by every process on the host that opens path
+
+    Each thread (and each process after a fork) gets its own connection.
+    Keys are filled under one of `stripes` file locks next to the
+    database, chosen by a hash of the key. Expired entries are purged every
+    purge_every writes, so the file doesn't grow without bound.
+    """
+
+    def __init__(self, path, ttl=60, grace=0, stripes=64, busy_timeout=30,
+                 purge_every=1000):
+        """Initialize the SQLiteCache object
+
+        Args:
+          path (str): the database file, created if need be
+          ttl (float, optional): default seconds entries stay fresh
+          grace (float, optional): seconds past their TTL entries may still
+            be served, flagged as stale. Defaults to 0
+          stripes (int, optional): number of fill locks
+          busy_timeout (float, optional): seconds to wait for another
+            process's write to finish
+          purge_every (int, optional): purge() entries past their grace
+            period after this many writes by this process, or None to leave
+            purging to the caller. Defaults to 1000
+        """
+        super(SQLiteCache, self).__init__(ttl, grace)
+        self._path = os.path.abspath(path)
+        self._stripes = stripes
+        self._busy_timeout = busy_timeout
+        self._purge_every = purge_every
+        self._writes = itertools.count(1)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def __repr__(self):
+        return "<SQLiteCache {}>".format(self._path)
+
+    def __getstate__(self):
+        # Connections can't be pickled; workers open their own
+        state = self.__dict__.copy()
+        for name in ('_local', '_refreshing', '_refreshing_lock'):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+
+    @property
+    def path(self):
+        """Return the database file
+
+        Returns:
+          str: the path
+        """
+        return self._path
+
+    def _connect(self):
+        # Imported here rather than at the top, as every import of pyattask
+        # imports this module, and most never open a SQLiteCache
+        import sqlite3
+
+        pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != pid:
+            conn = sqlite3.connect(self._path, timeout=self._busy_timeout)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = pid
+        return conn
+
+    def _lookup(self, key):
+        row = self._connect().execute(
+            'SELECT value, stored, expires FROM entries WHERE key = ?',
+            (key,)).fetchone()
+        if row is None:
+            return None
+        value, stored, expires = row
+        return Entry(json.loads(value), stored, expires)
+
+    def _store(self, key, value, stored, expires, tag):
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO entries '
+                         '(key, tag, value, stored, expires) '
+                         'VALUES (?, ?, ?, ?, ?)',
+                         (key, tag, json.dumps(value), stored, expires))
+        if self._purge_every and \
+                next(self._writes) % self._purge_every == 0:
+            self.purge()
+
+    def _delete(self, key):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def _delete_tag(self, tag):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM entries WHERE tag = ?', (tag,))
+
+    def clear(self):
+        """Drop every entry"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM entries')
+
+    def purge(self, older_than=0):
+        """Drop entries that expired more than older_than seconds ago
+
+        Entries within the grace period are kept whatever older_than is.
+
+        Args:
+          older_than (float, optional): seconds
+
+        Returns:
+          int: the number of entries dropped
+        """
+        with self._connect() as conn:
+            return conn.execute('DELETE FROM entries WHERE expires < ?',
+                                (_now() - max(older_than, self.grace),)
+                                ).rowcount
+
+    def _fill_lock(self, key):
+        stripe = (zlib.crc32(key.encode('utf-8')) & 0xffffffff) % \
+            self._stripes
+        return locked('{}.fill{}'.format(self._path, stripe))
+
+
+def object_tag(objcode, id_):
+    """Return the tag for entries holding an object
+
+    Args:
+      objcode (str): the object's objCode
+      id_ (str): its ID
+
+    Returns:
+      str: the tag
+    """
+    return '{}:{}'.format(objcode, id_)
+
+
+def object_key(objcode, id_, params):
+    """Return the cache key for fetching an object with params
+
+    Args:
+      objcode (str): the object's objCode
+      id_ (str): its ID
+      params (dict): the api request parameters
+
+    Returns:
+      str: the key
+    """
+    return '{}/{}?{}'.format(objcode, id_,
+                             json.dumps(params, sort_keys=True))
+
+
+def search_tag(objcode):
+    """Return the tag for entries holding search results
+
+    Args:
+      objcode (str): the objCode searched for
+
+    Returns:
+      str: the tag
+    """
+    return '{}:*'.format(objcode)
+
+
+def search_key(objcode, params):
+    """Return the cache key for a search
+
+    Args:
+      objcode (str): the objCode searched for
+      params (dict): the search terms and api request parameters
+
+    Returns:
+      str: the key
+    """
+    return '{}/search?{}'.format(objcode, json.dumps(params, sort_keys=True))
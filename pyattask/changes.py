@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""Change feeds: incremental polling for added and changed objects
+
+Rather than re-running a full search and diffing the results, a ChangeFeed
+asks only for objects whose lastUpdateDate is at or after a cursor, oldest
+first, and advances the cursor as it goes. The cursor can be saved to disk
+and handed to the next feed, so each poll costs O(changes).
+
+Deletions don't show up in such a search, so they're found separately with
+deleted_ids(), a sweep that fetches nothing but the IDs of what still exists.
+"""
+
+from collections import namedtuple
+import json
+
+import pyattask.locking
+
+import logging
+log = logging.getLogger(__name__)
+
+
+Change = namedtuple('Change', ('kind', 'obj'))
+"""A change reported by a ChangeFeed. kind is "added" or "changed"."""
+
+
+class ChangeCursor(object):
+    """The position of a change feed
+
+    A position is the lastUpdateDate of the last object seen, plus the IDs of
+    every object seen with exactly that lastUpdateDate, as the next feed
+    has to ask for that date again (more objects may share it) and skip
+    those.
+    """
+
+    def __init__(self, timestamp=None, seen=()):
+        """Initialize the ChangeCursor object
+
+        Args:
+          timestamp (str, optional): a lastUpdateDate, as returned by the API
+          seen (iterable, optional): IDs already seen at timestamp
+        """
+        self.timestamp = timestamp
+        self.seen = set(seen)
+
+    def __repr__(self):
+        return "<ChangeCursor ({}, {} seen)>".format(self.timestamp,
+                                                     len(self.seen))
+
+    def __eq__(self, other):
+        return (isinstance(other, ChangeCursor) and
+                self.timestamp == other.timestamp and self.seen == other.seen)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def advance(self, timestamp, id_):
+        """Move the cursor past an object
+
+        Args:
+          timestamp (str): the object's lastUpdateDate
+          id_ (str): the object's ID
+        """
+        if timestamp != self.timestamp:
+            self.timestamp = timestamp
+            self.seen = set()
+        self.seen.add(id_)
+
+    def to_json(self):
+        """Return a json-serializable form of the cursor
+
+        Returns:
+          dict
+        """
+        return {'timestamp': self.timestamp, 'seen': sorted(self.seen)}
+
+    @classmethod
+    def from_json(cls, json_):
+        """Return a cursor from the output of to_json()
+
+        Args:
+          json_ (dict): serialized cursor
+
+        Returns:
+          ChangeCursor
+        """
+        return cls(json_.get('timestamp'), json_.get('seen', ()))
+
+    def save(self, path):
+        """Atomically save the cursor to path
+
+        Args:
+          path (str): file name
+        """
+        def save(filename):
+            with open(filename, 'w') as cursorfile:
+                json.dump(self.to_json(), cursorfile)
+
+        with pyattask.locking.locked(path):
+            pyattask.locking.atomic_save(path, save, mode=0o644)
+
+    @classmethod
+    def load(cls, path):
+        """Load a cursor saved with save()
+
+        Args:
+          path (str): file name
+
+        Returns:
+          ChangeCursor: the saved cursor, or a new one if path doesn't exist
+        """
+        try:
+            with pyattask.locking.locked(path, exclusive=False):
+                with open(path) as cursorfile:
+                    return cls.from_json(json.load(cursorfile))
+        except IOError:
+            return cls()
+
+
+class ChangeFeed(object):
+    """The objects of a class added or changed since a cursor
+
+    Iterating the feed yields Change tuples, oldest change first, and moves
+    the feed's cursor along as it goes. Once it's exhausted (or at any point
+    in between) the cursor can be saved to resume from later.
+    """
+
+    def __init__(self, objclass, since=None, fields=None, searchfields=None,
+                 pagesize=None):
+        """Initialize the ChangeFeed object. Use AtTaskObject.changes()
+        rather than calling this directly.
+
+        Args:
+          objclass (type): the AtTaskObject subclass to watch
+          since (ChangeCursor or str, optional): where to start
+          fields (list, optional): fields to fetch. Defaults to all of
+            objclass.objattrs()
+          searchfields (dict or Query, optional): only watch matching objects
+          pagesize (int, optional): results per request
+        """
+        if since is None or isinstance(since, basestring):
+            since = ChangeCursor(since)
+        else:
+            since = ChangeCursor(since.timestamp, since.seen)
+
+        self._objclass = objclass
+        self._cursor = since
+        self._start = since.timestamp
+        self._fields = list(fields or objclass.objattrs())
+        for field in ('ID', 'entryDate', 'lastUpdateDate'):
+            if field not in self._fields:
+                self._fields.append(field)
+        self._query = objclass.query()
+        if searchfields is not None:
+            self._query = self._search_query(searchfields)
+        self._pagesize = pagesize or objclass._api_max_results
+
+    def __repr__(self):
+        return "<ChangeFeed {}: {}>".format(self._objclass.__name__,
+                                            self._cursor)
+
+    @property
+    def cursor(self):
+        """Return the feed's current position
+
+        Returns:
+          ChangeCursor
+        """
+        return self._cursor
+
+    def _search_query(self, searchfields):
+        """Return our base query, restricted by searchfields"""
+        if hasattr(searchfields, 'params'):
+            return searchfields
+        return self._query.where(**searchfields)
+
+    def _kind(self, result):
+        """Return "added" if result was created since the feed started"""
+        entry_date = result.get('entryDate')
+        # Dates for a tenant come back in one format and one UTC offset, so
+        # they compare correctly as strings
+        if self._start is None or (entry_date and entry_date > self._start):
+            return 'added'
+        return 'changed'
+
+    def _page(self, query):
+        """Fetch the first page of query, with our fields"""
+        query = query.fields(*self._fields).slice(0, self._pagesize)
+        return self._objclass._search(query, {}).get('data', [])
+
+    def __iter__(self):
+        cursor = self._cursor
+        # Set once a whole page shares one timestamp: that timestamp's
+        # objects are then paged through on their own, by ID, before moving
+        # on to later ones
+        pinned = None
+        last_id = None
+        after = None
+        while True:
+            if pinned is not None:
+                query = self._query.where(lastUpdateDate=pinned)
+                if last_id is not None:
+                    query = query.where(ID__gt=last_id)
+                query = query.order_by('ID')
+            else:
+                query = self._query
+                if after is not None:
+                    query = query.where(lastUpdateDate__gt=after)
+                elif cursor.timestamp is not None:
+                    query = query.where(lastUpdateDate__gte=cursor.timestamp)
+                query = query.order_by('lastUpdateDate', 'ID')
+            page = self._page(query)
+
+            for result in page:
+                timestamp = result['lastUpdateDate']
+                # Objects already delivered at the cursor's timestamp come
+                # back again; they're recognised by ID, not position
+                if timestamp == cursor.timestamp and \
+                        result['ID'] in cursor.seen:
+                    continue
+                cursor.advance(timestamp, result['ID'])
+                yield Change(self._kind(result),
+                             self._objclass.from_json(result))
+
+            full = len(page) == self._pagesize
+            if pinned is not None:
+                if full:
+                    # Carry on after the last ID, rather than at an offset
+                    # that objects updated meanwhile would shift
+                    last_id = page[-1]['ID']
+                else:
+                    pinned, last_id, after = None, None, pinned
+            elif not full:
+                return
+            elif page[0]['lastUpdateDate'] == page[-1]['lastUpdateDate']:
+                # Querying from the cursor again would return this very
+                # page
+                pinned = page[0]['lastUpdateDate']
+            else:
+                after = None
+
+
+def deleted_ids(objclass, known_ids, searchfields=None, pagesize=None):
+    """Return which of known_ids no longer exist
+
+    Only IDs are fetched, so this is cheap enough to run periodically
+    alongside a ChangeFeed.
+
+    Args:
+      objclass (type): the AtTaskObject subclass to check
+      known_ids (iterable): IDs held locally
+      searchfields (dict or Query, optional): restrict the sweep to matching
+        objects (which should be the same restriction the IDs were fetched
+        with)
+      pagesize (int, optional): results per request
+
+    Returns:
+      set: the IDs which were not found
+    """
+    if searchfields is None:
+        query = objclass.query()
+    elif hasattr(searchfields, 'params'):
+        query = searchfields
+    else:
+        query = objclass.query().where(**searchfields)
+    pagesize = pagesize or objclass._api_max_results
+    query = query.order_by('ID').fields('ID').slice(0, pagesize)
+
+    # Page by ID rather than by offset, so that objects deleted meanwhile
+    # don't shift others out of the sweep
+    missing = set(known_ids)
+    last_id = None
+    while missing:
+        page_query = query
+        if last_id is not None:
+            page_query = query.where(ID__gt=last_id)
+        page = objclass._search(page_query, {}).get('data', [])
+        missing.difference_update(result['ID'] for result in page)
+        if len(page) < pagesize:
+            break
+        last_id = page[-1]['ID']
+
+    log.info("{} {} objects deleted".format(len(missing), objclass.__name__))
+    return missing
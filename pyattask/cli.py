@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""The pyattask command line tool
+
+Connection details come from an ini file in the same format as
+examples/pyattask.ini: a section per AtTask instance, with url, username,
+password and domain settings (domain only for SAML logins) or an apikey.
+Optional timeout (seconds per request) and hedge (true/false) settings tune
+how slow requests are handled.
+"""
+
+import argparse
+import ConfigParser
+import sys
+
+import pyattask
+import pyattask.issue
+import pyattask.project
+import pyattask.session
+import pyattask.task
+import pyattask.user
+from pyattask.exceptions import AuthenticationError
+
+import logging
+log = logging.getLogger(__name__)
+
+
+# Object classes by the names used on the command line
+CLASSES = {
+    'task': pyattask.task.Task,
+    'issue': pyattask.issue.Issue,
+    'project': pyattask.project.Project,
+    'user': pyattask.user.User,
+}
+
+# Query conditions whose command line value is a comma-separated list
+_LIST_SUFFIXES = ('__in', '__notin', '__between')
+
+
+def connect(config_file, section):
+    """Create and authenticate the global session from an ini file
+
+    Args:
+      config_file (str): path to the ini file
+      section (str): the section to use
+
+    Raises:
+      AuthenticationError
+    """
+    config = ConfigParser.SafeConfigParser()
+    if not config.read(config_file):
+        raise IOError(2, 'No such file or directory', config_file)
+
+    def option(name):
+        if config.has_option(section, name):
+            return config.get(section, name)
+        return None
+
+    forcetlsone = (config.has_option(section, 'forcetlsone') and
+                   config.getboolean(section, 'forcetlsone'))
+    timeout = pyattask.session.DEFAULT_TIMEOUT
+    if config.has_option(section, 'timeout'):
+        timeout = config.getfloat(section, 'timeout')
+    hedge = (config.has_option(section, 'hedge') and
+             config.getboolean(section, 'hedge'))
+    pyattask.session.create_session(config.get(section, 'url'), forcetlsone,
+                                    timeout=timeout, hedge=hedge)
+    session = pyattask.session.get_session()
+    if session.is_authenticated():
+        return
+
+    if option('apikey'):
+        authenticated = session.login_apikey(option('apikey'))
+    else:
+        domain = option('domain')
+        authenticated = session.login(option('username'), option('password'),
+                                      saml=domain is not None, domain=domain)
+    if not authenticated:
+        raise AuthenticationError("login to {} failed".format(section))
+
+
+def parse_filters(objclass, filters):
+    """Turn command line filters into a query
+
+    Args:
+      objclass (type): the AtTaskObject subclass being queried
+      filters (list): strings of the form "field=value" or
+        "field__suffix=value", as accepted by Query.where()
+
+    Returns:
+      Query
+    """
+    conditions = {}
+    for filter_ in filters or ():
+        condition, sep, value = filter_.partition('=')
+        if not sep:
+            raise ValueError("filter {} is not of the form field=value".format(
+                filter_))
+        if condition.endswith(_LIST_SUFFIXES):
+            value = value.split(',')
+        conditions[condition] = value
+    return objclass.query().where(**conditions)
+
+
+def _split_fields(fields):
+    """Split a comma-separated field list, or return None"""
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(',')]
+
+
+def command_export(args):
+    """Stream objects to a file"""
+    from pyattask.export import export
+
+    objclass = CLASSES[args.objclass]
+    checkpoint = args.checkpoint
+    if checkpoint is None and args.output != '-':
+        checkpoint = args.output + '.checkpoint'
+
+    export(objclass, args.output, query=parse_filters(objclass, args.filter),
+           fields=_split_fields(args.fields), fmt=args.format,
+           concurrency=args.jobs, pagesize=args.pagesize,
+           checkpoint=checkpoint)
+    return 0
+
+
+def command_import(args):
+    """Create or update objects from a file"""
+    from pyattask.importer import import_rows, read_rows, result_writer
+
+    objclass = CLASSES[args.objclass]
+    fmt = args.format or ('csv' if args.input.endswith('.csv') else 'ndjson')
+    results = args.results or args.input + '.results'
+    results_fmt = 'csv' if results.endswith('.csv') else 'ndjson'
+
+    with open(args.input, 'rb') as infile, open(results, 'wb') as outfile:
+        succeeded, failed = import_rows(
+            objclass, read_rows(infile, fmt),
+            result_writer(outfile, results_fmt), batch_size=args.batch_size,
+            concurrency=args.jobs, rate=args.rate)
+
+    sys.stderr.write("{} rows imported, {} failed; see {}\n".format(
+        succeeded, failed, results))
+    return 1 if failed else 0
+
+
+def command_sync(args):
+    """Sync every object of a class using a pool of processes"""
+    from pyattask.sync import sharded_sync
+
+    sharded_sync(CLASSES[args.objclass], args.output,
+                 fields=_split_fields(args.fields), fmt=args.format,
+                 processes=args.processes, shard_size=args.shard_size)
+    return 0
+
+
+def command_schema(args):
+    """Discover and cache object schemas"""
+    import pyattask.schema
+
+    for objcode in args.objcode:
+        fields = pyattask.schema.discover(objcode.upper())
+        sys.stdout.write("{}: {} fields\n".format(objcode.upper(),
+                                                   len(fields)))
+    return 0
+
+
+def build_parser():
+    """Return the argument parser for the command line tool
+
+    Returns:
+      argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        prog='pyattask', description="Command line tools for the AtTask API")
+    parser.add_argument('--version', action='version',
+                        version=pyattask.__version__)
+    parser.add_argument('-c', '--config', default='pyattask.ini',
+                        help="ini file with connection details "
+                             "(default: %(default)s)")
+    parser.add_argument('-s', '--section', default='Production',
+                        help="section of the ini file to use "
+                             "(default: %(default)s)")
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help="log progress to stderr")
+    commands = parser.add_subparsers(title='commands')
+
+    export = commands.add_parser('export', help="export objects to a file")
+    export.set_defaults(command=command_export)
+    export.add_argument('objclass', choices=sorted(CLASSES))
+    export.add_argument('-o', '--output', default='-',
+                        help="output file (default: stdout)")
+    export.add_argument('-f', '--format', default='ndjson',
+                        choices=('ndjson', 'csv'))
+    export.add_argument('--fields',
+                        help="comma-separated fields to export "
+                             "(default: all known fields)")
+    export.add_argument('--filter', action='append',
+                        help="field=value or field__suffix=value, e.g. "
+                             "status__in=INP,NEW. May be repeated")
+    export.add_argument('-j', '--jobs', type=int, default=4,
+                        help="pages to fetch at once (default: %(default)s)")
+    export.add_argument('--pagesize', type=int,
+                        help="objects per request (default: API maximum)")
+    export.add_argument('--checkpoint',
+                        help="checkpoint file, for resuming an interrupted "
+                             "export (default: OUTPUT.checkpoint)")
+
+    import_ = commands.add_parser('import',
+                                  help="create or update objects from a file")
+    import_.set_defaults(command=command_import)
+    import_.add_argument('objclass', choices=sorted(CLASSES))
+    import_.add_argument('input', help="NDJSON or CSV file of objects. Rows "
+                                       "with an ID update that object")
+    import_.add_argument('-f', '--format', choices=('ndjson', 'csv'),
+                         help="input format (default: from the file name)")
+    import_.add_argument('-r', '--results',
+                         help="per-row results file, CSV if it ends in .csv "
+                              "(default: INPUT.results)")
+    import_.add_argument('-b', '--batch-size', type=int, default=100,
+                         help="rows per request (default: %(default)s)")
+    import_.add_argument('-j', '--jobs', type=int, default=4,
+                         help="requests in flight (default: %(default)s)")
+    import_.add_argument('--rate', type=float,
+                         help="maximum requests per second "
+                              "(default: unlimited)")
+
+    sync = commands.add_parser('sync', help="sync every object of a class "
+                                            "to a file, using all cores")
+    sync.set_defaults(command=command_sync)
+    sync.add_argument('objclass', choices=sorted(CLASSES))
+    sync.add_argument('-o', '--output', required=True, help="output file")
+    sync.add_argument('-f', '--format', default='ndjson',
+                      choices=('ndjson', 'csv'))
+    sync.add_argument('--fields',
+                      help="comma-separated fields to sync "
+                           "(default: all known fields)")
+    sync.add_argument('-p', '--processes', type=int,
+                      help="worker processes (default: one per core)")
+    sync.add_argument('--shard-size', type=int, default=50,
+                      help="projects (or IDs) per shard "
+                           "(default: %(default)s)")
+
+    schema = commands.add_parser('schema', help="discover and cache the "
+                                                "fields of objCodes")
+    schema.set_defaults(command=command_schema)
+    schema.add_argument('objcode', nargs='*',
+                        default=sorted(objclass.objcode()
+                                       for objclass in CLASSES.values()),
+                        help="objCodes to discover (default: %(default)s)")
+
+    return parser
+
+
+def main(argv=None):
+    """Entry point for the pyattask console script
+
+    Args:
+      argv (list, optional): arguments. Defaults to sys.argv[1:]
+
+    Returns:
+      int: exit status
+    """
+    args = build_parser().parse_args(argv)
+
+    if args.verbose:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(
+            "%(asctime)s level=%(levelname)s name=%(name)s %(message)s"))
+        logging.getLogger('pyattask').addHandler(handler)
+        logging.getLogger('pyattask').setLevel(logging.INFO)
+
+    connect(args.config, args.section)
+    return args.command(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""Indexed collections of AtTask objects
+
+An IndexedCollection holds a set of AtTaskObjects (typically search results)
+and answers equality queries on their fields from hash indexes. An index is
+built the first time a field, or combination of fields, is queried, and is
+kept up to date as objects are added, replaced or removed.
+"""
+
+from collections import defaultdict
+
+import logging
+log = logging.getLogger(__name__)
+
+
+def _value(obj, field):
+    """Return obj's value for field, or None if it doesn't have one"""
+    if field in obj:
+        return obj[field]
+    return None
+
+
+class IndexedCollection(object):
+    """A collection of AtTaskObjects with lazily built hash indexes
+
+    Objects are identified by their ID; adding an object with the ID of one
+    already in the collection replaces it.
+
+    >>> tasks = Task.search({'projectID': project_id}, indexed=True)
+    >>> tasks.find(status='INP', assignedToID=user_id)
+    """
+
+    def __init__(self, objs=()):
+        """Initialize the IndexedCollection object
+
+        Args:
+          objs (iterable, optional): AtTaskObjects to start with
+        """
+        self._slots = []
+        self._free = []
+        self._by_id = {}
+        # (field, ...) -> (value, ...) -> set of slots
+        self._indexes = {}
+        for obj in objs:
+            self.add(obj)
+
+    def __repr__(self):
+        return "<IndexedCollection: {} objects, indexes on {}>".format(
+            len(self), sorted(self._indexes))
+
+    def __len__(self):
+        return len(self._slots) - len(self._free)
+
+    def __iter__(self):
+        for obj in self._slots:
+            if obj is not None:
+                yield obj
+
+    def __contains__(self, obj):
+        if not isinstance(obj, basestring):
+            obj = _value(obj, 'id')
+        return obj in self._by_id
+
+    def get(self, id_, default=None):
+        """Return the object with the given ID
+
+        Args:
+          id_ (str): object ID
+          default (optional): returned if there is no such object
+
+        Returns:
+          AtTaskObject
+        """
+        slot = self._by_id.get(id_)
+        if slot is None:
+            return default
+        return self._slots[slot]
+
+    def add(self, obj):
+        """Add obj, replacing any object with the same ID
+
+        Args:
+          obj (AtTaskObject): the object to add
+        """
+        id_ = _value(obj, 'id')
+        slot = self._by_id.get(id_) if id_ is not None else None
+        if slot is not None:
+            self._unindex(slot)
+        elif self._free:
+            slot = self._free.pop()
+        else:
+            slot = len(self._slots)
+            self._slots.append(None)
+
+        self._slots[slot] = obj
+        if id_ is not None:
+            self._by_id[id_] = slot
+        self._index(slot)
+
+    def update(self, objs):
+        """Add (or replace) several objects
+
+        Args:
+          objs (iterable): AtTaskObjects
+        """
+        for obj in objs:
+            self.add(obj)
+
+    def remove(self, obj):
+        """Remove an object
+
+        Args:
+          obj (AtTaskObject or str): the object, or its ID
+
+        Raises:
+          KeyError
+        """
+        if not isinstance(obj, basestring):
+            obj = _value(obj, 'id')
+        slot = self._by_id.pop(obj)
+        self._unindex(slot)
+        self._slots[slot] = None
+        self._free.append(slot)
+
+    def apply(self, event):
+        """Bring the collection up to date with a change event
+
+        Suitable as a listener for AtTaskSession.subscribe() or
+        EventReceiver.subscribe(). Events for objects of other classes
+        should be filtered out by the caller.
+
+        Args:
+          event (ObjectEvent): the change
+        """
+        if event.obj is None:
+            if event.id in self._by_id:
+                self.remove(event.id)
+        else:
+            self.add(event.obj)
+
+    def index_on(self, *fields):
+        """Build the index for a combination of fields now, rather than on
+        first use
+
+        Args:
+          fields (str): field names
+        """
+        self._index_for(self._key(fields))
+
+    def find(self, **criteria):
+        """Return the objects whose fields equal all of criteria
+
+        Each distinct combination of field names gets its own index, so a
+        lookup costs the same however many fields it involves.
+
+        Args:
+          criteria: field=value pairs
+
+        Returns:
+          list: matching AtTaskObjects
+        """
+        criteria = dict((field.lower(), value)
+                        for field, value in criteria.iteritems())
+        key = self._key(criteria)
+        values = tuple(criteria[field] for field in key)
+        slots = self._index_for(key).get(values, ())
+        return [self._slots[slot] for slot in slots]
+
+    def find_one(self, **criteria):
+        """Return one object whose fields equal all of criteria
+
+        Returns:
+          AtTaskObject: a matching object, or None
+        """
+        for obj in self.find(**criteria):
+            return obj
+        return None
+
+    @staticmethod
+    def _key(fields):
+        """Return the index key for an iterable of field names
+
+        Names are lower-cased before sorting, as object attributes are, so
+        "ID" and "assignedToID" make the same key whichever way they're
+        cased.
+        """
+        return tuple(sorted(field.lower() for field in fields))
+
+    def _index_for(self, key):
+        """Return the index for key, building it if need be"""
+        index = self._indexes.get(key)
+        if index is None:
+            log.debug("building index on {}".format(key))
+            index = self._indexes[key] = defaultdict(set)
+            for slot, obj in enumerate(self._slots):
+                if obj is not None:
+                    index[tuple(_value(obj, field) for field in key)].add(slot)
+        return index
+
+    def _index(self, slot):
+        """Add the object in slot to every existing index"""
+        obj = self._slots[slot]
+        for key, index in self._indexes.iteritems():
+            index[tuple(_value(obj, field) for field in key)].add(slot)
+
+    def _unindex(self, slot):
+        """Remove the object in slot from every existing index"""
+        obj = self._slots[slot]
+        for key, index in self._indexes.iteritems():
+            values = tuple(_value(obj, field) for field in key)
+            slots = index[values]
+            slots.discard(slot)
+            if not slots:
+                del index[values]
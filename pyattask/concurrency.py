@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""Concurrency helpers shared by the session and object modules.
+"""
+
+from collections import deque
+from contextlib import contextmanager
+import itertools
+import threading
+import time
+
+from pyattask.exceptions import FlightTimeout
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class _Call(object):
+    """A single in-flight call tracked by SingleFlight"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Collapse concurrent calls with the same key into a single execution.
+
+    The first caller for a key runs the function; any caller arriving with the
+    same key while that is still running blocks and receives the very same
+    result (or exception) instead of running the function again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, function, *args, **kwargs):
+        """Run function(*args, **kwargs) unless a call for key is in flight.
+
+        Args:
+          key (hashable): identifies equivalent calls
+          function (callable): the function to run
+
+        Returns:
+          the return value of function, shared among all waiters
+
+        Raises:
+          whatever function raised, re-raised in every waiter
+        """
+        return self.do_within(key, None, function, *args, **kwargs)
+
+    def do_within(self, key, timeout, function, *args, **kwargs):
+        """Like do(), but wait at most timeout for a call already in flight
+
+        The limit only applies to waiting on another caller's call; a call
+        made by this caller runs for as long as function takes.
+
+        Args:
+          key (hashable): identifies equivalent calls
+          timeout (float): seconds to wait, or None for no limit
+          function (callable): the function to run
+
+        Returns:
+          the return value of function, shared among all waiters
+
+        Raises:
+          FlightTimeout: the call in flight didn't finish within timeout
+          whatever function raised, re-raised in every waiter
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            log.debug("waiting on in-flight call {}".format(key))
+            if not call.done.wait(timeout):
+                raise FlightTimeout("call {} still in flight after {}s".format(
+                    key, timeout))
+        else:
+            try:
+                call.result = function(*args, **kwargs)
+            except Exception as err:
+                call.error = err
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+@contextmanager
+def thread_pool(size, wait=True):
+    """Run a multiprocessing.pool.ThreadPool for the duration of a block
+
+    Args:
+      size (int): number of worker threads
+      wait (bool, optional): on leaving the block, wait for calls still
+        running to finish. If False, they're left to finish in the
+        background (the workers are daemon threads) and their results are
+        thrown away. Defaults to True
+
+    Yields:
+      ThreadPool
+    """
+    # multiprocessing is slow to import, and most scripts never need a pool
+    from multiprocessing.pool import ThreadPool
+
+    pool = ThreadPool(size)
+    try:
+        yield pool
+    finally:
+        pool.terminate()
+        if wait:
+            pool.join()
+
+
+def imap_bounded(pool, function, iterable, window):
+    """Like pool.imap(), but holding at most window results at a time
+
+    pool.imap() submits every item up front, so a slow consumer ends up with
+    every result in memory. Here a new item is only submitted when a result
+    is taken, so at most window calls are in flight or waiting to be
+    consumed. Results come back in order.
+
+    Args:
+      pool (ThreadPool): the pool to run function in
+      function (callable): called with each item
+      iterable (iterable): the items
+      window (int): maximum calls outstanding
+
+    Yields:
+      function(item) for each item, in order
+    """
+    items = iter(iterable)
+    pending = deque(pool.apply_async(function, (item,))
+                    for item in itertools.islice(items, window))
+    while pending:
+        result = pending.popleft().get()
+        for item in itertools.islice(items, 1):
+            pending.append(pool.apply_async(function, (item,)))
+        yield result
+
+
+class RateLimiter(object):
+    """A token bucket, shared between threads, limiting calls per second"""
+
+    def __init__(self, rate, burst=1):
+        """Initialize the RateLimiter object
+
+        Args:
+          rate (float): sustained calls per second
+          burst (int, optional): calls allowed back to back. Defaults to 1
+        """
+        self._rate = float(rate)
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a call is allowed"""
+        while True:
+            with self._lock:
+                now = time.time()
+                self._tokens = min(self._burst, self._tokens +
+                                   (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""Reconciling two pulls of the same objects
+
+diff() compares an old and a new set of AtTaskObjects (lists, an
+IndexedCollection, a Snapshot, iter_search(), ...) by ID in a single pass
+over each. The old side is reduced to the compared fields' values per ID,
+or, when field-level changes aren't wanted, to just a content hash of
+them; the new side is streamed against it.
+
+>>> for delta in diff(load_snapshot('monday.snap'), Task.iter_search({})):
+...     print delta.kind, delta.id, delta.changes
+"""
+
+from collections import namedtuple
+import itertools
+
+import pyattask.objects
+
+import logging
+log = logging.getLogger(__name__)
+
+
+ADDED = 'ADDED'
+REMOVED = 'REMOVED'
+CHANGED = 'CHANGED'
+
+
+Delta = namedtuple('Delta', ('kind', 'id', 'obj', 'changes'))
+"""A difference between the old and new sets.
+
+kind is ADDED, REMOVED or CHANGED, and obj the new object (None if
+REMOVED). changes maps each differing field to its (old, new) values, None
+standing for a missing field; an ADDED object has none, and a REMOVED one
+lists its old values. changes is None if diff() was asked for no changes.
+"""
+
+
+def content_hash(values):
+    """Return a hash of field values
+
+    The hash is only good for comparing within one process, which is all
+    diff() needs, and much cheaper than a cryptographic digest.
+
+    Args:
+      values (tuple): the values, in a fixed order of fields
+
+    Returns:
+      int: the hash
+    """
+    try:
+        return hash(values)
+    except TypeError:
+        # Lists or dicts (e.g. collection fields) among the values
+        return hash(repr(values))
+
+
+def _compared_fields(objs, fields):
+    """Return the fields to compare, and objs with any peeked item put back"""
+    if fields is not None:
+        return list(fields), objs
+    objs = iter(objs)
+    for first in objs:
+        return list(first.objattrs()), itertools.chain((first,), objs)
+    return [], objs
+
+
+def diff(old, new, fields=None, changes=True):
+    """Compare two sets of objects, keyed on their IDs
+
+    Runs in time linear in the size of both sets. new is streamed; old is
+    held as the compared fields' values per ID, which are compared
+    directly, or, if changes is False, as a hash of them. Two different
+    sets of values can hash alike, so with changes=False a change can (very
+    rarely) go unreported. ADDED and CHANGED deltas come out in the order
+    of new, then REMOVED ones.
+
+    Args:
+      old (iterable): the earlier AtTaskObjects
+      new (iterable): the later AtTaskObjects, of the same class
+      fields (list, optional): API field names to compare. Defaults to
+        every field of the class of the first old (or new) object. ID is
+        always used as the key, and never compared
+      changes (bool, optional): report the changed fields and their
+        values. False keeps only hashes of old, for the least memory.
+        Defaults to True
+
+    Yields:
+      Delta
+
+    Raises:
+      ValueError: an ID appears more than once in old, or in new
+    """
+    fields, old = _compared_fields(old, fields)
+    if not fields:
+        fields, new = _compared_fields(new, fields)
+    fields = [field for field in fields if field != 'ID']
+    keys = [pyattask.objects.AtTaskObject._attr_name(field)
+            for field in fields]
+
+    # With changes, old values are kept anyway, so compare them directly
+    # rather than trusting a hash
+    if changes:
+        summary = tuple
+    else:
+        def summary(values):
+            return content_hash(tuple(values))
+
+    # These are the hot loops for large sets, so they read attrs directly
+    before = {}
+    for obj in old:
+        attrs = obj._attrs
+        id_ = attrs['id']
+        if id_ in before:
+            raise ValueError("ID {} appears more than once in old".format(
+                id_))
+        before[id_] = summary(map(attrs.get, keys))
+    log.debug("read {} old objects".format(len(before)))
+
+    matched = set()
+    for obj in new:
+        attrs = obj._attrs
+        id_ = attrs['id']
+        if id_ in matched:
+            raise ValueError("ID {} appears more than once in new".format(
+                id_))
+        matched.add(id_)
+        known = before.pop(id_, None)
+        if known is None:
+            yield Delta(ADDED, id_, obj, {} if changes else None)
+            continue
+        values = summary(map(attrs.get, keys))
+        if known != values:
+            yield Delta(CHANGED, id_, obj, _changes(fields, known, values)
+                        if changes else None)
+
+    for id_, values in before.iteritems():
+        yield Delta(REMOVED, id_, None,
+                    _changes(fields, values, (None,) * len(fields))
+                    if changes else None)
+
+
+def _changes(fields, old_values, new_values):
+    """Return {field: (old, new)} for the fields whose values differ"""
+    return dict((field, (old_value, new_value))
+                for field, old_value, new_value
+                in zip(fields, old_values, new_values)
+                if old_value != new_value)
+
+
+def summarize(deltas):
+    """Count deltas by kind
+
+    Args:
+      deltas (iterable): Deltas, e.g. from diff()
+
+    Returns:
+      dict: the number of ADDED, REMOVED and CHANGED objects
+    """
+    counts = dict.fromkeys((ADDED, REMOVED, CHANGED), 0)
+    for delta in deltas:
+        counts[delta.kind] += 1
+    return counts
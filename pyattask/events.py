@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""Receiving AtTask event subscription callbacks
+
+AtTask can POST a message to a URL whenever an object is created, updated
+or deleted. An EventReceiver is a small embeddable HTTP server for those
+callbacks: it decodes each message into an ObjectEvent, carrying the
+matching Task/Issue/Project/... object, and publishes it to the session (see
+AtTaskSession.subscribe()) and to its own listeners, so caches and local
+stores can update or invalidate their copies within moments of the change.
+
+send_event() posts a message in the same format, for exercising a receiver
+without a live tenant.
+"""
+
+import BaseHTTPServer
+from collections import namedtuple
+import json
+import SocketServer
+import threading
+import urllib2
+
+import pyattask.schema
+import pyattask.session
+
+import logging
+log = logging.getLogger(__name__)
+
+
+CREATE = 'CREATE'
+UPDATE = 'UPDATE'
+DELETE = 'DELETE'
+
+EVENT_TYPES = (CREATE, UPDATE, DELETE)
+
+
+ObjectEvent = namedtuple('ObjectEvent',
+                         ('kind', 'objcode', 'id', 'obj', 'old'))
+"""A change to an AtTask object.
+
+kind is one of EVENT_TYPES. obj is the object as it is now (None once it's
+deleted) and old the object as it was (None if it was just created), both
+decoded with the class for objcode, or left as json if there is none.
+"""
+
+
+def _decode_state(objclass, state):
+    """Decode an object's json, if there is any"""
+    if not state:
+        return None
+    if objclass is None:
+        return state
+    return objclass.from_json(state)
+
+
+def decode_event(message):
+    """Turn an event subscription message into an ObjectEvent
+
+    Args:
+      message (dict): the decoded JSON body of the callback
+
+    Returns:
+      ObjectEvent
+
+    Raises:
+      ValueError: the message isn't an object event
+    """
+    kind = message.get('eventType')
+    if kind not in EVENT_TYPES:
+        raise ValueError("unknown eventType {}".format(kind))
+
+    new_state = message.get('newState') or {}
+    old_state = message.get('oldState') or {}
+    state = new_state or old_state
+    if 'objCode' not in state or 'ID' not in state:
+        raise ValueError("event without objCode and ID")
+
+    objcode = state['objCode']
+    objclass = pyattask.schema.get_class(objcode, generate=False)
+    return ObjectEvent(kind, objcode, state['ID'],
+                       _decode_state(objclass, new_state),
+                       _decode_state(objclass, old_state))
+
+
+class _EventHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Handles one callback for an EventReceiver"""
+
+    def do_POST(self):
+        receiver = self.server.receiver
+        if receiver.auth_token is not None and \
+                self.headers.get('Authorization') != receiver.auth_token:
+            self.send_error(401)
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            event = decode_event(json.loads(self.rfile.read(length)))
+        except ValueError as err:
+            log.warning("bad event from {}: {}".format(
+                self.client_address[0], err))
+            self.send_error(400, str(err))
+            return
+
+        receiver.dispatch(event)
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        log.debug("{} {}".format(self.client_address[0], format % args))
+
+
+class _Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class EventReceiver(object):
+    """An embeddable HTTP server for AtTask event subscription callbacks"""
+
+    def __init__(self, host='127.0.0.1', port=0, session=None,
+                 auth_token=None):
+        """Initialize the EventReceiver object
+
+        Args:
+          host (str, optional): address to listen on. Defaults to localhost
+          port (int, optional): port to listen on. Defaults to any free port
+          session (AtTaskSession, optional): the session to publish events
+            to. Defaults to the current session, if there is one
+          auth_token (str, optional): if given, callbacks must carry it in
+            their Authorization header, as set on the subscription
+        """
+        if session is None:
+            session = pyattask.session._CURRENT_SESSION
+        self._session = session
+        self._listeners = []
+        self._thread = None
+        self.auth_token = auth_token
+        self._server = _Server((host, port), _EventHandler)
+        self._server.receiver = self
+
+    def __repr__(self):
+        return "<EventReceiver {}>".format(self.url)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def url(self):
+        """Return the URL to register with the event subscription
+
+        Returns:
+          str: the receiver's URL
+        """
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}/".format(host, port)
+
+    def subscribe(self, listener):
+        """Register a listener for this receiver's events only
+
+        Args:
+          listener (callable): called with each ObjectEvent
+        """
+        self._listeners.append(listener)
+
+    def dispatch(self, event):
+        """Publish an event to the session and to our own listeners
+
+        Args:
+          event (ObjectEvent): the change
+        """
+        log.info("{} {} {}".format(event.kind, event.objcode, event.id))
+        if self._session is not None:
+            self._session.publish(event)
+        for listener in list(self._listeners):
+            try:
+                listener(event)
+            except Exception:
+                log.exception("listener {} failed on {}".format(listener,
+                                                                 event))
+
+    def start(self):
+        """Start serving in a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="pyattask-events")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving, if start() was called, and close the socket"""
+        # shutdown() waits for serve_forever() to notice, so it would wait
+        # forever if that was never started
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+
+def send_event(url, kind, new_state=None, old_state=None, auth_token=None):
+    """Post an event subscription callback, as AtTask would
+
+    Args:
+      url (str): the receiver's URL
+      kind (str): one of EVENT_TYPES
+      new_state (dict, optional): the object's json after the change
+      old_state (dict, optional): the object's json before the change
+      auth_token (str, optional): sent as the Authorization header
+
+    Returns:
+      int: the HTTP status of the response
+    """
+    message = {'eventType': kind, 'newState': new_state or {},
+               'oldState': old_state or {}}
+    request = urllib2.Request(url, json.dumps(message),
+                              {'Content-Type': 'application/json'})
+    if auth_token is not None:
+        request.add_header('Authorization', auth_token)
+    try:
+        return urllib2.urlopen(request).getcode()
+    except urllib2.HTTPError as err:
+        return err.code
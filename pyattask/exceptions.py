@@ -31,7 +31,29 @@ class NoSession(AtTaskException):
 
 
 class GetHTTPError(AtTaskException):
-    """A generic error HTTP error in an API transaction"""
+    """A generic error HTTP error in an API transaction
+
+    status_code is the HTTP status of the response, or None if there was
+    none.
+    """
+
+    def __init__(self, message, status_code=None):
+        super(GetHTTPError, self).__init__(message)
+        self.status_code = status_code
+
+
+class FlightTimeout(AtTaskException):
+    """Gave up waiting for a call in flight in another thread"""
+    pass
+
+
+class RequestTimeout(GetHTTPError):
+    """An API transaction did not complete within its deadline"""
+    pass
+
+
+class ReplayMissError(AtTaskException):
+    """A replayed request is not in the recording"""
     pass
 
 
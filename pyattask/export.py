@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""Bulk export of AtTask objects to NDJSON or CSV
+
+Results are written as they arrive: pages are fetched concurrently, but no
+more than a fixed number are ever held in memory, and they are written out
+in order. After each page, a checkpoint records the last object written (and
+where in the file it ended), so an interrupted export can be resumed rather
+than restarted. Objects are exported in ID order, and a resumed export asks
+for those after the last ID written, so it picks up at the right object
+whatever the page size, and whatever has been added or removed meanwhile.
+"""
+
+import csv
+import json
+import os
+import sys
+
+from pyattask.concurrency import imap_bounded, thread_pool
+import pyattask.locking
+
+import logging
+log = logging.getLogger(__name__)
+
+
+FORMATS = ('ndjson', 'csv')
+
+
+class NdjsonWriter(object):
+    """Write API results as newline-delimited JSON"""
+
+    def __init__(self, out, fields):
+        self._out = out
+        self._fields = fields
+
+    def header(self):
+        """Write anything that precedes the first record"""
+        pass
+
+    def write(self, result):
+        """Write one API result
+
+        Args:
+          result (dict): the object's json
+        """
+        record = dict((field, result.get(field)) for field in self._fields)
+        self._out.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+class CsvWriter(object):
+    """Write API results as CSV, one column per field"""
+
+    def __init__(self, out, fields):
+        self._writer = csv.writer(out)
+        self._fields = fields
+
+    def header(self):
+        """Write the column names"""
+        self._writer.writerow(self._fields)
+
+    def write(self, result):
+        """Write one API result
+
+        Args:
+          result (dict): the object's json
+        """
+        self._writer.writerow([_csv_value(result.get(field))
+                               for field in self._fields])
+
+
+def _csv_value(value):
+    """Render a json value for a CSV cell"""
+    if value is None:
+        return ''
+    elif isinstance(value, unicode):
+        return value.encode('utf-8')
+    elif isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+WRITERS = {
+    'ndjson': NdjsonWriter,
+    'csv': CsvWriter,
+}
+
+
+def _read_checkpoint(path):
+    """Return the saved checkpoint at path, or None"""
+    try:
+        with open(path) as checkpointfile:
+            return json.load(checkpointfile)
+    except IOError:
+        return None
+
+
+def _write_checkpoint(path, checkpoint):
+    """Atomically save checkpoint to path"""
+    def save(filename):
+        with open(filename, 'w') as checkpointfile:
+            json.dump(checkpoint, checkpointfile)
+
+    pyattask.locking.atomic_save(path, save, mode=0o644)
+
+
+def export(objclass, output, query=None, fields=None, fmt='ndjson',
+           concurrency=4, pagesize=None, checkpoint=None):
+    """Export every object matching query to output
+
+    Args:
+      objclass (type): the AtTaskObject subclass to export
+      output (str): the file to write to, or "-" for stdout
+      query (Query, optional): which objects to export. Defaults to all
+      fields (list, optional): fields to export. Defaults to objattrs()
+      fmt (str, optional): one of FORMATS. Defaults to 'ndjson'
+      concurrency (int, optional): maximum pages in flight (and in memory)
+      pagesize (int, optional): objects per request. Defaults to the API
+        maximum
+      checkpoint (str, optional): checkpoint file. If it exists, the export
+        resumes from it. Removed when the export completes
+
+    Returns:
+      int: the number of objects written
+    """
+    fields = list(fields or objclass.objattrs())
+    pagesize = pagesize or objclass._api_max_results
+    # Resuming depends on the ID order, and on fetching IDs even if they
+    # aren't exported
+    base_query = (query or objclass.query()).order_by('ID').fields(
+        *(fields + ['ID'] if 'ID' not in fields else fields))
+    state = {'query': repr(base_query), 'fmt': fmt, 'last_id': None,
+             'offset': 0, 'written': 0}
+
+    if output == '-':
+        checkpoint = None
+
+    saved = _read_checkpoint(checkpoint) if checkpoint else None
+    if output == '-':
+        out = sys.stdout
+    elif saved and os.path.exists(output):
+        if saved.get('query') != state['query'] or \
+                saved.get('fmt') != fmt or 'last_id' not in saved:
+            raise ValueError("checkpoint {} is for a different export".format(
+                checkpoint))
+        state = saved
+        log.info("resuming export after {} (ID {})".format(
+            state['written'], state['last_id']))
+        out = open(output, 'r+b')
+        # Drop anything written after the checkpoint was taken
+        out.truncate(state['offset'])
+        out.seek(state['offset'])
+    else:
+        out = open(output, 'wb')
+
+    query = base_query
+    if state['last_id'] is not None:
+        query = query.where(ID__gt=state['last_id'])
+    total = objclass.count(query)
+    pages = range(0, total, pagesize)
+
+    writer = WRITERS[fmt](out, fields)
+    if state['offset'] == 0:
+        writer.header()
+
+    def fetch_page(first):
+        params = {'$$FIRST': first, '$$LIMIT': pagesize}
+        return objclass._search(query, params).get('data', [])
+
+    try:
+        with thread_pool(concurrency) as pool:
+            for page in imap_bounded(pool, fetch_page, pages, concurrency):
+                for result in page:
+                    writer.write(result)
+                out.flush()
+
+                if page:
+                    state['last_id'] = page[-1]['ID']
+                state['written'] += len(page)
+                if checkpoint:
+                    state['offset'] = out.tell()
+                    _write_checkpoint(checkpoint, state)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if checkpoint and os.path.exists(checkpoint):
+        os.unlink(checkpoint)
+
+    log.info("exported {} {} objects to {}".format(
+        state['written'], objclass.__name__, output))
+    return state['written']
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""Parsing of typed field values
+
+The API returns dates as strings ("2014-06-02T17:00:00:000-0500") and numbers
+as JSON numbers or strings. These functions turn them into datetimes and
+numbers. Dates are parsed by slicing rather than with strptime, which is
+several times slower, and tzinfo objects are shared between dates with the
+same UTC offset.
+"""
+
+import datetime
+
+import logging
+log = logging.getLogger(__name__)
+
+
+DATE = 'date'
+NUMBER = 'number'
+BOOLEAN = 'boolean'
+
+
+class FixedOffset(datetime.tzinfo):
+    """A fixed offset from UTC, as found at the end of API dates"""
+
+    def __init__(self, minutes):
+        """Initialize the FixedOffset object
+
+        Args:
+          minutes (int): minutes east of UTC
+        """
+        self._offset = datetime.timedelta(minutes=minutes)
+        self._name = "{}{:02d}{:02d}".format('-' if minutes < 0 else '+',
+                                             abs(minutes) // 60,
+                                             abs(minutes) % 60)
+
+    def __repr__(self):
+        return "<FixedOffset {}>".format(self._name)
+
+    def __reduce__(self):
+        return FixedOffset, (self._offset.days * 1440 +
+                             self._offset.seconds // 60,)
+
+    def utcoffset(self, dt):
+        return self._offset
+
+    def tzname(self, dt):
+        return self._name
+
+    def dst(self, dt):
+        return datetime.timedelta(0)
+
+
+_offsets = {}
+
+
+def _tzinfo(offset):
+    """Return the (shared) FixedOffset for an offset string like "-0500" """
+    tzinfo = _offsets.get(offset)
+    if tzinfo is None:
+        minutes = int(offset[1:3]) * 60 + int(offset[3:5])
+        if offset[0] == '-':
+            minutes = -minutes
+        tzinfo = _offsets[offset] = FixedOffset(minutes)
+    return tzinfo
+
+
+def parse_date(value):
+    """Parse an API date
+
+    Args:
+      value (str): "YYYY-MM-DDTHH:MM:SS:mmm+hhmm", or just "YYYY-MM-DD"
+
+    Returns:
+      datetime.datetime (or datetime.date, for a bare date), or None if
+        value is None or empty
+
+    Raises:
+      ValueError
+    """
+    if not value:
+        return None
+    elif len(value) == 10:
+        return datetime.date(int(value[0:4]), int(value[5:7]),
+                             int(value[8:10]))
+
+    tzinfo = _tzinfo(value[23:28]) if len(value) >= 28 else None
+    return datetime.datetime(int(value[0:4]), int(value[5:7]),
+                             int(value[8:10]), int(value[11:13]),
+                             int(value[14:16]), int(value[17:19]),
+                             int(value[20:23] or 0) * 1000, tzinfo)
+
+
+def parse_number(value):
+    """Parse an API number
+
+    Args:
+      value (int, float or str): the value
+
+    Returns:
+      int or float, or None if value is None or empty
+
+    Raises:
+      ValueError
+    """
+    if value is None or value == '':
+        return None
+    elif isinstance(value, (int, long, float)):
+        return value
+    elif '.' in value or 'e' in value.lower():
+        return float(value)
+    return int(value)
+
+
+def parse_boolean(value):
+    """Parse an API boolean
+
+    Args:
+      value (bool or str): the value
+
+    Returns:
+      bool, or None if value is None
+    """
+    if value is None or isinstance(value, bool):
+        return value
+    return value.lower() == 'true'
+
+
+PARSERS = {
+    DATE: parse_date,
+    NUMBER: parse_number,
+    BOOLEAN: parse_boolean,
+}
+
+
+class InternTable(object):
+    """A bounded table of shared values
+
+    Decoding JSON creates a new string for every value, even though fields
+    like status or projectID only ever hold a few hundred distinct values
+    across hundreds of thousands of objects. Passing values through an
+    InternTable makes equal values share a single object. Once the table is
+    full, new values are passed through unshared, so a field that turns out
+    to have high cardinality can't grow it without bound.
+    """
+
+    def __init__(self, maxsize=4096):
+        """Initialize the InternTable object
+
+        Args:
+          maxsize (int, optional): most distinct values to keep
+        """
+        self._maxsize = maxsize
+        self._values = {}
+
+    def __len__(self):
+        return len(self._values)
+
+    def __call__(self, value):
+        """Return the shared copy of value
+
+        Args:
+          value: a hashable value
+
+        Returns:
+          an object equal to value
+        """
+        try:
+            return self._values[value]
+        except KeyError:
+            if len(self._values) < self._maxsize:
+                return self._values.setdefault(value, value)
+            return value
+        except TypeError:
+            # Unhashable, so it can't be shared
+            return value
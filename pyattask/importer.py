@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""Bulk import of AtTask objects from NDJSON or CSV
+
+Each row is validated against the class's API fields, then created (or, if it
+has an ID, updated) in bulk requests of up to batch_size rows. Batches are
+sent concurrently, subject to a rate limit. If a bulk update fails, or a
+bulk create is rejected with a 4xx status, its rows are retried one by one
+so that the failure can be pinned on the rows that caused it. Other failed
+creates aren't retried, as they may have been written. The outcome of
+every row is written to a results file.
+"""
+
+import csv
+import json
+
+from pyattask.concurrency import RateLimiter, imap_bounded, thread_pool
+from pyattask.exceptions import AtTaskException
+
+import logging
+log = logging.getLogger(__name__)
+
+
+FORMATS = ('ndjson', 'csv')
+
+RESULT_FIELDS = ('row', 'action', 'ID', 'status', 'error')
+
+# Fields present in exported data which can't be written back
+_READ_ONLY_FIELDS = frozenset(('objCode', 'entryDate', 'lastUpdateDate'))
+
+
+def read_rows(infile, fmt):
+    """Read rows to import
+
+    Empty CSV cells are treated as absent, rather than as empty strings.
+
+    Args:
+      infile (file): the open input file
+      fmt (str): one of FORMATS
+
+    Yields:
+      (int, dict): the 1-based row number and the row
+    """
+    if fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(infile), 1):
+            yield number, dict((key, value.decode('utf-8'))
+                               for key, value in row.iteritems() if value)
+    else:
+        for number, line in enumerate(infile, 1):
+            if line.strip():
+                yield number, json.loads(line)
+
+
+def validate(objclass, row):
+    """Check a row against objclass's fields
+
+    Args:
+      objclass (type): the AtTaskObject subclass being imported
+      row (dict): the row
+
+    Returns:
+      (dict, str): the record to write, and an error message (or None)
+    """
+    allowed = set(objclass.objattrs(discovered=True))
+    unknown = sorted(set(row) - allowed)
+    if unknown:
+        return None, "unknown fields: {}".format(", ".join(unknown))
+
+    record = dict((key, value) for key, value in row.iteritems()
+                  if key not in _READ_ONLY_FIELDS)
+    if not record or record.keys() == ['ID']:
+        return None, "nothing to write"
+    return record, None
+
+
+def _batches(objclass, rows, batch_size):
+    """Group rows into batches of up to batch_size
+
+    Yields:
+      list: [(number, action, record, error), ...]
+    """
+    batch = []
+    for number, row in rows:
+        record, error = validate(objclass, row)
+        action = 'update' if 'ID' in row else 'create'
+        batch.append((number, action, record, error))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _result(number, action, id_=None, error=None):
+    """Return the result record for a row"""
+    return {
+        'row': number,
+        'action': action,
+        'ID': id_,
+        'status': 'error' if error else 'ok',
+        'error': error,
+    }
+
+
+def _rejected(err):
+    """Return whether a write failed because the API refused it
+
+    A 4xx response means nothing was written. Anything else (a timeout, a
+    5xx) leaves it unknown whether the write happened.
+    """
+    status_code = getattr(err, 'status_code', None)
+    return status_code is not None and 400 <= status_code < 500
+
+
+class _BatchWriter(object):
+    """Writes batches of rows, one bulk request per action"""
+
+    def __init__(self, objclass, limiter):
+        self._objclass = objclass
+        self._limiter = limiter
+
+    def _write(self, action, records):
+        """Send one bulk request, returning the json of the objects"""
+        if self._limiter is not None:
+            self._limiter.acquire()
+        if action == 'update':
+            return self._objclass._write('put', records)
+        return self._objclass._write('post', records)
+
+    def __call__(self, batch):
+        """Write a batch, returning its results in row order"""
+        results = {}
+        for action in ('create', 'update'):
+            rows = [(number, record) for number, act, record, error in batch
+                    if act == action and error is None]
+            if not rows:
+                continue
+
+            try:
+                written = self._write(action, [record for _, record in rows])
+            except AtTaskException as err:
+                if len(rows) == 1 or not (action == 'update' or
+                                          _rejected(err)):
+                    # Without a definite rejection, a create may have
+                    # happened; don't risk a duplicate
+                    for number, record in rows:
+                        results[number] = _result(number, action,
+                                                  record.get('ID'), str(err))
+                    continue
+                log.info("bulk {} of {} rows failed, retrying singly: "
+                         "{}".format(action, len(rows), err))
+                for number, record in rows:
+                    results[number] = self([(number, action, record,
+                                             None)])[0]
+                continue
+
+            if len(written) != len(rows):
+                # Objects can't be matched to rows by position any more
+                log.warning("bulk {} of {} rows returned {} objects".format(
+                    action, len(rows), len(written)))
+                if action == 'update' and len(rows) > 1:
+                    # Updates are safe to repeat
+                    for number, record in rows:
+                        results[number] = self([(number, action, record,
+                                                 None)])[0]
+                else:
+                    # A create may or may not have happened; don't risk a
+                    # duplicate
+                    for number, record in rows:
+                        results[number] = _result(
+                            number, action, record.get('ID'),
+                            "bulk {} returned {} objects for {} rows".format(
+                                action, len(written), len(rows)))
+                continue
+
+            for (number, _), obj in zip(rows, written):
+                results[number] = _result(number, action, obj.get('ID'))
+
+        return [results[number] if number in results else
+                _result(number, action, None, error or "not written")
+                for number, action, _, error in batch]
+
+
+def import_rows(objclass, rows, results, batch_size=100, concurrency=4,
+                rate=None):
+    """Create or update objects from rows
+
+    Args:
+      objclass (type): the AtTaskObject subclass to import
+      rows (iterable): (row number, dict) pairs, as from read_rows()
+      results (callable): called with the result dict of each row, in order
+      batch_size (int, optional): rows per bulk request
+      concurrency (int, optional): requests in flight
+      rate (float, optional): maximum requests per second. Defaults to
+        unlimited
+
+    Returns:
+      (int, int): the number of rows written, and the number which failed
+    """
+    limiter = RateLimiter(rate, burst=concurrency) if rate else None
+    write_batch = _BatchWriter(objclass, limiter)
+
+    succeeded = failed = 0
+    with thread_pool(concurrency) as pool:
+        for batch_results in imap_bounded(
+                pool, write_batch, _batches(objclass, rows, batch_size),
+                concurrency):
+            for result in batch_results:
+                results(result)
+                if result['status'] == 'ok':
+                    succeeded += 1
+                else:
+                    failed += 1
+
+    log.info("imported {} {} rows, {} failed".format(
+        succeeded, objclass.__name__, failed))
+    return succeeded, failed
+
+
+def result_writer(outfile, fmt):
+    """Return a function writing result dicts to outfile
+
+    Args:
+      outfile (file): the open results file
+      fmt (str): one of FORMATS
+
+    Returns:
+      callable
+    """
+    if fmt == 'ndjson':
+        def write(result):
+            outfile.write(json.dumps(result, sort_keys=True) + '\n')
+        return write
+
+    writer = csv.writer(outfile)
+    writer.writerow(RESULT_FIELDS)
+
+    def write(result):
+        writer.writerow([unicode(result[field]).encode('utf-8')
+                         if result[field] is not None else ''
+                         for field in RESULT_FIELDS])
+    return write
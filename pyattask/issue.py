@@ -21,6 +21,7 @@
 """
 
 import pyattask.objects
+from pyattask.fields import BOOLEAN, DATE, NUMBER
 
 import logging
 log = logging.getLogger(__name__)
@@ -30,11 +31,23 @@ class Issue(pyattask.objects.AtTaskObject):
     """AtTask issues"""
 
     _api_endpoint = "issue"
-    _api_objcode = "ISSUE"
+    # The API calls issues OPTASKs, whichever endpoint they come from
+    _api_objcode = "OPTASK"
     _api_objattrs = ["ID", "name", "objCode", "isComplete", "assignedToID",
-                     "owenerID", "description", "priority", "projectID",
+                     "ownerID", "description", "priority", "projectID",
                      "teamID", "status", "statusUpdate", "submittedByID",
-                     "workRequired", "severity"]
+                     "workRequired", "severity", "entryDate",
+                     "lastUpdateDate"]
+    _api_internfields = ("objCode", "status", "priority", "severity",
+                         "projectID", "assignedToID", "ownerID", "teamID",
+                         "submittedByID", "isComplete")
+    _api_fieldtypes = {
+        "entryDate": DATE,
+        "isComplete": BOOLEAN,
+        "lastUpdateDate": DATE,
+        "priority": NUMBER,
+        "workRequired": NUMBER,
+    }
 
     def __init__(self, **kwargs):
         self._attrs = kwargs['attrs']
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""Cross-process file locking and atomic file replacement.
+
+State shared between processes through $HOME (the cookie jar, for example)
+is read under a shared lock and rewritten under an exclusive lock. Writes go
+to a temporary file in the same directory which is then renamed over the
+original, so readers never see a partially written file.
+"""
+
+from contextlib import contextmanager
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows. Locking degrades to a no-op there, but the
+    # rename in atomic_save() still keeps readers from seeing partial writes.
+    fcntl = None
+
+import logging
+log = logging.getLogger(__name__)
+
+
+@contextmanager
+def locked(path, exclusive=True):
+    """Hold an advisory lock associated with path.
+
+    The lock is taken on a separate "<path>.lock" file so that path itself
+    can be replaced with os.rename() while the lock is held.
+
+    Args:
+      path (str): the file to be protected
+      exclusive (bool, optional): take an exclusive (write) lock if True,
+        otherwise a shared (read) lock. Defaults to True
+
+    Yields:
+      None
+    """
+    if fcntl is None:
+        yield
+        return
+
+    lockfile = open(path + '.lock', 'a')
+    try:
+        fcntl.flock(lockfile, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+    finally:
+        # Closing the file releases the lock
+        lockfile.close()
+
+
+def atomic_save(path, save, mode=0o600):
+    """Atomically replace path with the output of save.
+
+    Args:
+      path (str): the file to replace
+      save (callable): called with the name of a temporary file, which it
+        must write the new contents to
+      mode (int, optional): permissions for the new file. Defaults to 0600,
+        as most of what we persist are credentials
+
+    Returns:
+      None
+    """
+    dirname, basename = os.path.split(path)
+    fd, tmpname = tempfile.mkstemp(prefix=basename + '.', dir=dirname or '.')
+    os.close(fd)
+    try:
+        save(tmpname)
+        os.chmod(tmpname, mode)
+        os.rename(tmpname, path)
+    except Exception:
+        if os.path.exists(tmpname):
+            os.unlink(tmpname)
+        raise
+    log.debug("saved {}".format(path))
+
+
+def mtime(path):
+    """Return the modification time of path, or None if it does not exist.
+
+    Args:
+      path (str): file name
+
+    Returns:
+      float: modification time, or None
+    """
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
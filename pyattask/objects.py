@@ -20,8 +20,19 @@
 """Common AtTask objects
 """
 
+import itertools
+import json
+import threading
+
+import pyattask.cache
 import pyattask.session
+from pyattask.collection import IndexedCollection
+from pyattask.concurrency import imap_bounded, thread_pool
 from pyattask.decorators import authenticated
+from pyattask.fields import PARSERS, InternTable
+import pyattask.schema
+import pyattask.transport
+from pyattask.query import Query
 from pyattask.exceptions import (
     GetHTTPError,
     GenericAPIError,
@@ -33,17 +44,38 @@ import logging
 log = logging.getLogger(__name__)
 
 
+# API field name -> attrs key, shared by every class
+_attr_names = {}
+
+
 class AtTaskObject(object):
     """Generic AtTask objects class"""
 
     _api_endpoint = None
     _api_objcode = None
     _api_objattrs = {}
+    # Fields with a type other than string, mapped to one of the types in
+    # pyattask.fields
+    _api_fieldtypes = {}
+    # Low-cardinality fields whose values are shared between objects when
+    # decoding, rather than each object holding its own copy
+    _api_internfields = ("objCode",)
+    # Most distinct values shared per field
+    _api_intern_maxsize = 4096
     _attrs = {}
+    _typed = None
     _dirty = False
+    _stale = False
 
     _allowed_rest_request_types = ('get', 'post', 'put', 'delete')
 
+    # The most results the API will return for a single search request
+    _api_max_results = 2000
+
+    # Seconds a fetched object stays fresh in the session's cache, if any.
+    # None for the cache's own default
+    _api_cache_ttl = None
+
     def __init__(self):
         """Initialize the AtTaskSession object"""
 
@@ -76,6 +108,8 @@ class AtTaskObject(object):
             raise TypeError("string")
 
         self._attrs[key] = value
+        if self._typed:
+            self._typed.pop(key, None)
 
         # Make a note that the object is dirty (i.e. we have made changes that
         # have not been flushed to AtTask
@@ -90,6 +124,126 @@ class AtTaskObject(object):
         else:
             return ""
 
+    @property
+    def stale(self):
+        """Return whether the object was served from cache past its TTL
+
+        See AtTaskSession.set_cache() and pyattask.cache.
+
+        Returns:
+          bool: True if the object may be out of date
+        """
+        return self._stale
+
+    def typed(self, key):
+        """Return the value of a field converted to its python type
+
+        Dates become datetimes, numbers become ints or floats (see
+        pyattask.fields). The conversion is done once, on first access, and
+        the result kept on the object.
+
+        Args:
+          key (str): the field name
+
+        Returns:
+          the converted value, or None if the object has no value for key
+
+        Raises:
+          ValueError
+        """
+        key = key.lower()
+        if self._typed is None:
+            self._typed = {}
+        elif key in self._typed:
+            return self._typed[key]
+
+        value = self._attrs.get(key)
+        parser = self._parsers().get(key)
+        if parser is not None:
+            value = parser(value)
+        self._typed[key] = value
+        return value
+
+    @classmethod
+    def _parsers(cls):
+        """Return the parser for each typed field, keyed by lower-case name
+
+        Returns:
+          dict: {field: parser, ...}
+        """
+        parsers = cls.__dict__.get('_parsers_by_field')
+        if parsers is None:
+            parsers = dict((field.lower(), PARSERS[fieldtype])
+                           for field, fieldtype in cls.fieldtypes().items())
+            cls._parsers_by_field = parsers
+        return parsers
+
+    @classmethod
+    def parse_typed(cls, objs, fields=None):
+        """Convert typed fields for a whole set of objects at once
+
+        Values repeat a great deal across a result set (a few hundred
+        distinct dates across thousands of tasks, say), so each distinct
+        value is parsed only once. Afterwards typed() returns the converted
+        values straight away.
+
+        Args:
+          objs (iterable): objects of cls
+          fields (list, optional): the fields to convert. Defaults to all of
+            _api_fieldtypes
+        """
+        parsers = cls._parsers()
+        if fields is None:
+            fields = parsers.keys()
+        fields = [field.lower() for field in fields]
+
+        objs = list(objs)
+        for field in fields:
+            parser = parsers.get(field)
+            parsed = {}
+            for obj in objs:
+                value = obj._attrs.get(field)
+                if parser is not None:
+                    try:
+                        value = parsed[value]
+                    except KeyError:
+                        value = parsed[value] = parser(value)
+                if obj._typed is None:
+                    obj._typed = {}
+                obj._typed[field] = value
+
+    @classmethod
+    def save_snapshot(cls, path, objs, fields=None):
+        """Write objects of cls to a binary snapshot file
+
+        Args:
+          path (str): the file to write
+          objs (iterable): objects of cls
+          fields (list, optional): fields to store. Defaults to objattrs()
+
+        Returns:
+          int: the number of objects written
+        """
+        import pyattask.snapshot
+        return pyattask.snapshot.save_snapshot(path, objs, cls, fields)
+
+    @classmethod
+    def load_snapshot(cls, path):
+        """Open a snapshot written by save_snapshot()
+
+        Args:
+          path (str): the snapshot file
+
+        Returns:
+          Snapshot: a lazily decoded, read-only sequence of objects
+
+        Raises:
+          ValueError: the snapshot is not of cls
+        """
+        import pyattask.snapshot
+        objclass = cls if cls.objcode() is not None else None
+        return pyattask.snapshot.load_snapshot(path, objclass)
+
     @classmethod
     def endpoint(cls):
         """Returns the AtTask API endpoint for cls.
@@ -109,14 +263,37 @@ class AtTaskObject(object):
         return cls._api_objcode
 
     @classmethod
-    def objattrs(cls):
+    def objattrs(cls, discovered=False):
         """Returns a list of the supported AtTask API field names for cls.
 
+        By default these are _api_objattrs, the fields requested for cls.
+
+        Args:
+          discovered (bool, optional): return every field in the schema
+            cache instead, if the class's objCode has been discovered (see
+            pyattask.schema)
+
         Returns:
           list: API field names for cls
         """
+        if discovered:
+            fields = pyattask.schema.fields(cls.objcode())
+            if fields is not None:
+                return fields
         return cls._api_objattrs
 
+    @classmethod
+    def fieldtypes(cls):
+        """Returns the types of cls's non-string fields.
+
+        Returns:
+          dict: {field: type, ...}, types being those in pyattask.fields
+        """
+        fieldtypes = pyattask.schema.fieldtypes(cls.objcode())
+        if fieldtypes is not None:
+            return fieldtypes
+        return cls._api_fieldtypes
+
     @classmethod
     def from_json(cls, json):
         """Return initialized object from json.
@@ -130,11 +307,18 @@ class AtTaskObject(object):
         if json['objCode'] != cls.objcode():
             log.error("is proper {}".format(cls))
 
-        objattrs = cls.objattrs()
+        objattrs = pyattask.schema.fieldset(cls.objcode())
+        if objattrs is None:
+            objattrs = cls._api_objattrs
+        interners = cls._interners()
         init_attrs = {}
         for key in json:
             if key in objattrs:
-                init_attrs[key.lower()] = json[key]
+                value = json[key]
+                interner = interners.get(key)
+                if interner is not None:
+                    value = interner(value)
+                init_attrs[cls._attr_name(key)] = value
             else:
                 log.warning("attribute {}: {} found in JSON, not in _api_objattrs".format(
                     key, json[key]))
@@ -142,13 +326,58 @@ class AtTaskObject(object):
         return cls(attrs=init_attrs)
 
     @classmethod
-    def search(cls, searchfields, params=None):
+    def query(cls):
+        """Return a new query on cls.
+
+        Returns:
+          Query: a query matching every cls, to be narrowed with where() etc.
+        """
+        return Query(cls)
+
+    @classmethod
+    def _interners(cls):
+        """Return the InternTable for each of _api_internfields
+
+        Returns:
+          dict: {field: InternTable, ...}
+        """
+        interners = cls.__dict__.get('_interners_by_field')
+        if interners is None:
+            interners = dict((field, InternTable(cls._api_intern_maxsize))
+                             for field in cls._api_internfields)
+            cls._interners_by_field = interners
+        return interners
+
+    @staticmethod
+    def _attr_name(key):
+        """Return the attrs key for an API field name
+
+        Attribute names are the lower-cased field names. The lower-cased
+        strings are kept and re-used, so that every object's attrs share
+        the same key objects rather than each holding its own copies.
+
+        Args:
+          key (str): API field name
+
+        Returns:
+          str: lower-cased key
+        """
+        try:
+            return _attr_names[key]
+        except KeyError:
+            return _attr_names.setdefault(key, key.lower())
+
+    @classmethod
+    def search(cls, searchfields, params=None, indexed=False):
         """Perform a search on a given class and return matching instances of
         the class.
 
         Args:
-          searchfields (dict): dictionary of search terms
+          searchfields (dict or Query): dictionary of search terms, or a query
+            built with cls.query()
           params (dict, optional): api request parameters
+          indexed (bool, optional): return an IndexedCollection rather than a
+            list. Defaults to False
 
         Returns:
           [ cls,
@@ -159,12 +388,237 @@ class AtTaskObject(object):
         if not params:
             params = {}
 
-        json_resp = cls._search(searchfields, params)
+        session = pyattask.session.get_session()
+        stale = False
+        if session.cache_searches:
+            terms = searchfields
+            if isinstance(terms, Query):
+                terms = terms.params()
+            data, stale = session.cache.read(
+                pyattask.cache.search_key(cls.objcode(), dict(terms, **params)),
+                lambda: cls._search(searchfields, params).get('data', []),
+                ttl=cls._api_cache_ttl,
+                tag=pyattask.cache.search_tag(cls.objcode()))
+            json_resp = {'data': data}
+        else:
+            json_resp = cls._search(searchfields, params)
         found_objs = list(cls._convert_from_json(json_resp))
+        if stale:
+            for obj in found_objs:
+                obj._stale = True
 
         log.info("returning {}".format(found_objs))
+        if indexed:
+            return IndexedCollection(found_objs)
         return found_objs
 
+    @classmethod
+    def iter_search(cls, searchfields, params=None, pagesize=None,
+                    prefetch=0):
+        """Perform a search, fetching results a page at a time
+
+        Unlike search(), this isn't limited to a single request's worth of
+        results, and only holds one page in memory at a time (or, with
+        prefetch, 1 + prefetch pages).
+
+        Args:
+          searchfields (dict or Query): dictionary of search terms, or a query
+          params (dict, optional): api request parameters
+          pagesize (int, optional): results per request. Defaults to the
+            API maximum
+          prefetch (int, optional): fetch up to this many pages ahead in
+            the background, while earlier ones are being consumed. Closing
+            the iterator early cancels those not yet sent. Defaults to 0
+
+        Yields:
+          cls
+        """
+        if prefetch:
+            pages = cls._prefetch_pages(searchfields, params, pagesize,
+                                        prefetch)
+        else:
+            pages = cls._search_pages(searchfields, params, pagesize)
+        try:
+            for page in pages:
+                for result in page:
+                    yield cls.from_json(result)
+        finally:
+            pages.close()
+
+    @classmethod
+    def _prefetch_pages(cls, searchfields, params, pagesize, prefetch):
+        """Perform a search, keeping requests for the next pages in flight
+
+        Page requests go out `prefetch` ahead of the page being consumed, in
+        parallel, and each new one only when a page is taken, so a slow
+        consumer holds back the requests rather than piling up pages. As
+        the number of pages isn't known up front, up to `prefetch` requests
+        past the last page are wasted.
+
+        Args:
+          see iter_search()
+
+        Yields:
+          list: the json 'data' of each page
+        """
+        pagesize = pagesize or cls._api_max_results
+        cancelled = threading.Event()
+
+        def fetch_page(first):
+            if cancelled.is_set():
+                return None
+            page_params = dict(params or {})
+            page_params['$$FIRST'] = first
+            page_params['$$LIMIT'] = pagesize
+            page = cls._search(searchfields, page_params).get('data', [])
+            log.debug("page at {} has {} results".format(first, len(page)))
+            return page
+
+        fetch_page = pyattask.session.get_session().carry_deadline(fetch_page)
+        # Don't wait for requests in flight when the search is abandoned, or
+        # for the ones past the last page
+        with thread_pool(prefetch, wait=False) as pool:
+            try:
+                for page in imap_bounded(pool, fetch_page,
+                                         itertools.count(0, pagesize),
+                                         prefetch):
+                    if page:
+                        yield page
+                    if len(page) < pagesize:
+                        return
+            finally:
+                # Requests already sent can't be recalled, but anything
+                # still queued is dropped without being sent
+                cancelled.set()
+
+    @classmethod
+    def _search_pages(cls, searchfields, params=None, pagesize=None):
+        """Perform a search, one request per page of results
+
+        Args:
+          searchfields (dict or Query): dictionary of search terms, or a query
+          params (dict, optional): api request parameters
+          pagesize (int, optional): results per request. Defaults to the
+            API maximum
+
+        Yields:
+          list: the json 'data' of each page
+        """
+        pagesize = pagesize or cls._api_max_results
+        first = 0
+        while True:
+            page_params = dict(params or {})
+            page_params['$$FIRST'] = first
+            page_params['$$LIMIT'] = pagesize
+
+            page = cls._search(searchfields, page_params).get('data', [])
+            log.debug("page at {} has {} results".format(first, len(page)))
+            if page:
+                yield page
+            if len(page) < pagesize:
+                return
+            first += pagesize
+
+    @classmethod
+    def count(cls, searchfields=None):
+        """Return the number of objects matching a search
+
+        Args:
+          searchfields (dict or Query, optional): dictionary of search terms,
+            or a query. Defaults to counting everything
+
+        Returns:
+          int: number of matching objects
+        """
+        return cls._count(searchfields or {})['data']['count']
+
+    @classmethod
+    def search_all(cls, searchfields, params=None, concurrency=4):
+        """Perform a search, fetching every page of results concurrently
+
+        If the first page is full, the matching objects are counted, so
+        that all the other pages can be requested at once. Results are
+        sorted by ID (after any sort the search has), so that pages neither
+        skip nor repeat objects.
+
+        Args:
+          searchfields (dict or Query): dictionary of search terms, or a query
+          params (dict, optional): api request parameters
+          concurrency (int, optional): maximum requests in flight
+
+        Returns:
+          [ cls, ... ]
+        """
+        return [cls.from_json(result)
+                for result in cls._search_all(searchfields, params,
+                                              concurrency)]
+
+    @classmethod
+    def _search_all(cls, searchfields, params=None, concurrency=4):
+        """Return the json of every result of a search, fetching pages
+        concurrently
+
+        Returns:
+          list: the json 'data' of every matching object
+        """
+        searchfields, params = cls._in_stable_order(searchfields, params)
+        pagesize = cls._api_max_results
+
+        def fetch_page(first):
+            page_params = dict(params or {})
+            page_params['$$FIRST'] = first
+            page_params['$$LIMIT'] = pagesize
+            return cls._search(searchfields, page_params).get('data', [])
+
+        first_page = fetch_page(0)
+        if len(first_page) < pagesize:
+            return first_page
+
+        firsts = range(pagesize, cls.count(searchfields), pagesize)
+        if not firsts:
+            return first_page
+        with thread_pool(min(concurrency, len(firsts))) as pool:
+            pages = pool.map(fetch_page, firsts)
+
+        return first_page + [result for page in pages for result in page]
+
+    @staticmethod
+    def _in_stable_order(searchfields, params):
+        """Return searchfields and params, sorted by ID after any other sort
+
+        Offset pages of a search in no set order can skip or repeat objects.
+        A dict search already sorted with _Sort parameters is left as it is.
+
+        Returns:
+          (dict or Query, dict): the searchfields and params
+        """
+        if isinstance(searchfields, Query):
+            return searchfields.then_by('ID'), params
+        if any(name.endswith('_Sort')
+               for name in itertools.chain(searchfields, params or ())):
+            return searchfields, params
+        return searchfields, dict(params or {}, ID_Sort='asc')
+
+    @classmethod
+    def changes(cls, since=None, fields=None, searchfields=None,
+                pagesize=None):
+        """Return a feed of the objects added or changed since a cursor
+
+        Args:
+          since (ChangeCursor or str, optional): where the last feed left off,
+            or a lastUpdateDate. Defaults to the beginning of time
+          fields (list, optional): fields to fetch. Defaults to objattrs()
+          searchfields (dict or Query, optional): restrict the feed to
+            matching objects
+          pagesize (int, optional): results per request
+
+        Returns:
+          ChangeFeed: iterate it for changes, then save its cursor
+        """
+        import pyattask.changes
+        return pyattask.changes.ChangeFeed(cls, since, fields, searchfields,
+                                           pagesize)
+
     @classmethod
     def get(cls, id_, allfields=None, params=None):
         """Fetch the data identified by object + id and return the initialized
@@ -186,13 +640,112 @@ class AtTaskObject(object):
             field_names = ",".join(cls.objattrs())
             params['fields'] = field_names
 
-        json_resp = cls._get(id_, params)
-        print params
-        obj = cls.from_json(json_resp.get('data', []))
+        cache = pyattask.session.get_session().cache
+        stale = False
+        if cache is None:
+            data = cls._get(id_, params).get('data', [])
+        else:
+            data, stale = cache.read(
+                pyattask.cache.object_key(cls.objcode(), id_, params),
+                lambda: cls._get(id_, params).get('data', []),
+                ttl=cls._api_cache_ttl,
+                tag=pyattask.cache.object_tag(cls.objcode(), id_))
+        obj = cls.from_json(data)
+        obj._stale = stale
 
         log.info("returning {}".format(obj))
         return obj
 
+    @classmethod
+    def create(cls, fields):
+        """Create a new object
+
+        Args:
+          fields (dict): API field names and values for the new object
+
+        Returns:
+          cls: the object as created
+        """
+        return cls.from_json(cls._write('post', [fields])[0])
+
+    @classmethod
+    def update(cls, id_, fields):
+        """Change fields of an existing object
+
+        Args:
+          id_ (str): the ID of the object
+          fields (dict): API field names and their new values
+
+        Returns:
+          cls: the object as updated
+        """
+        fields = dict(fields, ID=id_)
+        return cls.from_json(cls._write('put', [fields])[0])
+
+    @classmethod
+    def bulk_create(cls, records):
+        """Create several objects in a single request
+
+        Args:
+          records (list): dicts of API field names and values
+
+        Returns:
+          [ cls, ... ]: the objects as created, in order
+        """
+        return [cls.from_json(result)
+                for result in cls._write('post', records)]
+
+    @classmethod
+    def bulk_update(cls, records):
+        """Change several objects in a single request
+
+        Args:
+          records (list): dicts of API field names and values, each including
+            the ID of the object to change
+
+        Returns:
+          [ cls, ... ]: the objects as updated, in order
+        """
+        return [cls.from_json(result)
+                for result in cls._write('put', records)]
+
+    @classmethod
+    @authenticated
+    def _write(cls, method, records):
+        """Create (post) or update (put) objects
+
+        A single record goes to the object's own url; several are sent as a
+        bulk request, a JSON list in the updates parameter.
+
+        Args:
+          method (str): post or put
+          records (list): dicts of API field names and values
+
+        Returns:
+          list: the json of the objects written
+        """
+        url = pyattask.session.get_session()._url + '/' + cls.endpoint()
+        if len(records) == 1:
+            updates = dict(records[0])
+            if method == 'put':
+                url += '/' + updates.pop('ID')
+        else:
+            updates = records
+
+        json_rsp = cls._rest_transaction(method, url, {},
+                                         data={'updates': json.dumps(updates)})
+        data = json_rsp['data']
+        if isinstance(data, dict):
+            data = [data]
+
+        cache = pyattask.session.get_session().cache
+        if cache is not None:
+            for record in data:
+                cache.invalidate(pyattask.cache.object_tag(cls.objcode(),
+                                                           record['ID']))
+            cache.invalidate(pyattask.cache.search_tag(cls.objcode()))
+        return data
+
     @classmethod
     def _convert_from_json(cls, json_resp):
         """Take a json object and turn it into an array of searchclass objects.
@@ -210,7 +763,7 @@ class AtTaskObject(object):
         """Perform an API search on the given class
 
         Args:
-          searchfields (dict): dictionary of search terms
+          searchfields (dict or Query): dictionary of search terms, or a query
           params (dict): api request parameters
 
         Returns:
@@ -218,12 +771,13 @@ class AtTaskObject(object):
         """
 
         # Via HTTP, we don't draw a distinction between the search paramaters
-        # and the rest of the api request paramaters. Just "add" the dicts
-        # together.
-        #
-        # TODO(davidr): this is pretty stupid. the behavior exhibited by duped
-        #   keys would be "undefined" from the end user's perspective.
-        params = dict(searchfields.items() + params.items())
+        # and the rest of the api request paramaters. Merge them, with params
+        # taking precedence.
+        if isinstance(searchfields, Query):
+            searchfields = searchfields.params()
+        merged = dict(searchfields)
+        merged.update(params)
+        params = merged
 
         url = pyattask.session.get_session()._url
         search_url = url + '/' + cls.endpoint() + '/search'
@@ -235,13 +789,14 @@ class AtTaskObject(object):
         return json_rsp
 
     @classmethod
-    def _rest_transaction(cls, method, url, params):
+    def _rest_transaction(cls, method, url, params, data=None):
         """Perform the nuts and bolts of the REST transaction
 
         Args:
           url (str): the transaction url
           method (str): get, post, put delete
           params (dict, optional) request parameters
+          data (dict, optional) form-encoded request body
 
         Returns:
           response (json): json response of query
@@ -257,20 +812,29 @@ class AtTaskObject(object):
             raise MethodNotImplemented(method)
 
         session = pyattask.session.get_session()
-        search_rsp = session._session.get(url, verify=False, params=params)
-        log.info("GET {} returned {}".format(search_rsp.url,
-                                             search_rsp.status_code))
+        search_rsp, response = session._fetch(method, url, params=params,
+                                              data=data)
+        # Keep any credential in the url out of logs and exceptions
+        rsp_url = pyattask.transport.scrub_url(search_rsp.url)
+        log.info("{} {} returned {}".format(method.upper(), rsp_url,
+                                            search_rsp.status_code))
+
+        if search_rsp.status_code == 401:
+            session.auth_failed()
 
         if search_rsp.status_code not in (200, 302):
             # TODO(davidr): must be other response codes?
             # TODO(davidr): any more specific error checking? Raising an
             #   exception might not be what we want here
-            raise GetHTTPError("GET {} returned error {}: {}".format(
-                search_rsp.url, search_rsp.status_code, search_rsp.reason))
+            raise GetHTTPError("{} {} returned error {}: {}".format(
+                method.upper(), rsp_url, search_rsp.status_code,
+                search_rsp.reason), search_rsp.status_code)
 
-        response = search_rsp.json()
         log.debug("search returned json: {}".format(response))
 
+        if response is None:
+            raise GenericAPIError("response from {} is not json".format(
+                rsp_url))
         if 'error' in response:
             raise AtTaskReturnError(response['error'])
         elif 'data' not in response:
@@ -303,3 +867,23 @@ class AtTaskObject(object):
 
         json_rsp = cls._rest_transaction("get", get_url, params=params)
         return json_rsp
+
+    @classmethod
+    @authenticated
+    def _count(cls, searchfields):
+        """Perform an API count on the given class
+
+        Args:
+          searchfields (dict or Query): dictionary of search terms, or a query
+
+        Returns:
+          json: JSON-encoded response from the API
+        """
+        if isinstance(searchfields, Query):
+            searchfields = searchfields.params()
+
+        url = pyattask.session.get_session()._url
+        count_url = url + '/' + cls.endpoint() + '/count'
+
+        json_rsp = cls._rest_transaction("get", count_url, dict(searchfields))
+        return json_rsp
@@ -21,6 +21,7 @@
 """
 
 import pyattask.objects
+from pyattask.fields import DATE, NUMBER
 
 import logging
 log = logging.getLogger(__name__)
@@ -33,7 +34,36 @@ class Project(pyattask.objects.AtTaskObject):
     _api_objcode = "PROJ"
     _api_objattrs = ["ID", "name", "objCode", "ownerID", "priority",
                      "status", "groupID", "description", "condition",
-                     "percentComplete", "projectedCompletionDate"]
+                     "percentComplete", "projectedCompletionDate",
+                     "entryDate", "lastUpdateDate"]
+    # Changes rarely, and is looked up over and over
+    _api_cache_ttl = 300
+    _api_internfields = ("objCode", "status", "priority", "condition",
+                         "ownerID", "groupID")
+    _api_fieldtypes = {
+        "entryDate": DATE,
+        "lastUpdateDate": DATE,
+        "percentComplete": NUMBER,
+        "priority": NUMBER,
+        "projectedCompletionDate": DATE,
+    }
 
     def __init__(self, **kwargs):
         self._attrs = kwargs['attrs']
+
+    @classmethod
+    def load_tree(cls, id_, fields=None, task_fields=None, issue_fields=None):
+        """Fetch a project together with all of its tasks and issues
+
+        Args:
+          id_ (str): the project ID
+          fields (list, optional): project fields to fetch. Defaults to all
+          task_fields (list, optional): task fields to fetch. Defaults to all
+          issue_fields (list, optional): issue fields to fetch. Defaults to all
+
+        Returns:
+          ProjectTree: the project, tasks and issues, indexed
+        """
+        import pyattask.tree
+        return pyattask.tree.load_tree(cls, id_, fields, task_fields,
+                                       issue_fields)
@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""Query builder for AtTask searches
+
+Queries are built up from keyword conditions, in the style of
+``Task.query().where(status__in=['INP', 'NEW'], priority__gte=3)``, and
+compiled to the API's search parameters, with ``_Mod`` modifiers and ``OR:n:``
+groups, so that all filtering happens on the server.
+
+Queries are immutable: every method returns a new Query, so a partially
+built query can be kept and extended. A query is compiled only once, and can
+be used as a dict key.
+"""
+
+import datetime
+
+import logging
+log = logging.getLogger(__name__)
+
+
+# The comparison suffixes we accept, mapped to the API's _Mod values
+MODIFIERS = {
+    'eq': 'eq',
+    'ne': 'ne',
+    'lt': 'lt',
+    'lte': 'lte',
+    'gt': 'gt',
+    'gte': 'gte',
+    'in': 'in',
+    'notin': 'notin',
+    'contains': 'contains',
+    'notcontains': 'notcontains',
+    'icontains': 'cicontains',
+    'like': 'like',
+    'ilike': 'cilike',
+    'between': 'between',
+    'isnull': 'isnull',
+    'notnull': 'notnull',
+    'isblank': 'isblank',
+    'notblank': 'notblank',
+}
+
+# Modifiers that take no value
+_UNARY_MODIFIERS = frozenset(('isnull', 'notnull', 'isblank', 'notblank'))
+
+
+def _format_value(value):
+    """Render a python value the way the API expects it in a query string
+
+    Args:
+      value: str, number, bool, datetime.date or datetime.datetime
+
+    Returns:
+      str: the value as a query parameter
+
+    Raises:
+      ValueError: value is None, which the API would read as the string
+        "None"
+    """
+    if value is None:
+        raise ValueError("can't compare with None: use __isnull or "
+                         "__notnull")
+    elif isinstance(value, bool):
+        return 'true' if value else 'false'
+    elif isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%dT%H:%M:%S')
+    elif isinstance(value, datetime.date):
+        return value.strftime('%Y-%m-%d')
+    elif isinstance(value, basestring):
+        return value
+    return str(value)
+
+
+def _parse_condition(condition, value):
+    """Split a keyword condition into field, modifier and formatted value(s)
+
+    Args:
+      condition (str): "field" or "field__suffix"
+      value: the value being compared against
+
+    Returns:
+      (field, modifier, values): modifier is None for plain equality, values
+        is a tuple of formatted values
+
+    Raises:
+      ValueError
+    """
+    field, _, suffix = condition.partition('__')
+    if suffix and suffix not in MODIFIERS:
+        raise ValueError("unknown condition {}".format(condition))
+
+    modifier = MODIFIERS.get(suffix)
+    if value is None and modifier in (None, 'eq', 'ne'):
+        # field=None means the field is empty, not that it equals "None"
+        return field, 'notnull' if modifier == 'ne' else 'isnull', ()
+    elif modifier is None:
+        return field, None, (_format_value(value),)
+    elif modifier in _UNARY_MODIFIERS:
+        return field, modifier, ()
+    elif modifier == 'between':
+        low, high = value
+        return field, modifier, (_format_value(low), _format_value(high))
+    elif modifier in ('in', 'notin'):
+        if isinstance(value, basestring):
+            value = (value,)
+        values = tuple(_format_value(item) for item in value)
+        if not values:
+            # The API would get a bare _Mod=in, and ignore the condition
+            raise ValueError("empty list for {}".format(condition))
+        return field, modifier, values
+    return field, modifier, (_format_value(value),)
+
+
+def _merge_conditions(conditions):
+    """Check that each field has at most one condition in an AND group
+
+    The API takes a single value (or list) and modifier per field, so a
+    second condition on a field would send two modifiers, of which the
+    server quietly uses one. A __gte and __lte pair on a field makes an
+    inclusive range, and is merged into a single between condition.
+
+    Args:
+      conditions (tuple): parsed conditions which must all match
+
+    Returns:
+      tuple: the conditions, one per field, sorted by field so that the
+        order of where() calls doesn't matter
+
+    Raises:
+      ValueError: a field has conditions which can't be combined
+    """
+    by_field = {}
+    for condition in conditions:
+        by_field.setdefault(condition[0], []).append(condition)
+
+    merged = []
+    for condition in conditions:
+        field = condition[0]
+        same_field = by_field.pop(field, None)
+        if same_field is None:
+            # Already dealt with, at the field's first condition
+            continue
+        unique = list(set(same_field))
+        if len(unique) == 1:
+            merged.append(unique[0])
+            continue
+
+        bounds = dict((modifier, values) for _, modifier, values in unique)
+        if len(unique) == 2 and set(bounds) == set(('gte', 'lte')):
+            merged.append((field, 'between',
+                           bounds['gte'] + bounds['lte']))
+            continue
+        raise ValueError(
+            "more than one condition on {}: only a __gte and __lte pair "
+            "(or __between) can be combined".format(field))
+    return tuple(sorted(merged, key=lambda condition: condition[0]))
+
+
+def _compile_conditions(conditions, prefix=''):
+    """Compile parsed conditions to (name, value) parameter pairs
+
+    Args:
+      conditions (iterable): (field, modifier, values) tuples
+      prefix (str, optional): prepended to each name, e.g. "OR:1:"
+
+    Returns:
+      list: [(name, value), ...]
+    """
+    params = []
+    for field, modifier, values in conditions:
+        if modifier == 'between':
+            params.append((prefix + field, values[0]))
+            params.append((prefix + field + '_Range', values[1]))
+        else:
+            params.extend((prefix + field, value) for value in values)
+        if modifier is not None:
+            params.append((prefix + field + '_Mod', modifier))
+    return params
+
+
+class Query(object):
+    """A reusable, server-side filtered search on an AtTaskObject class"""
+
+    def __init__(self, objclass, conditions=(), or_groups=(), order=(),
+                 fields=None, first=None, limit=None):
+        """Initialize the Query. Use AtTaskObject.query() rather than calling
+        this directly.
+
+        Args:
+          objclass (type): the AtTaskObject subclass being searched
+          conditions (tuple): parsed conditions which must all match
+          or_groups (tuple): tuples of parsed conditions, at least one of
+            which must match
+          order (tuple): (field, direction) pairs
+          fields (tuple, optional): field names to return
+          first (int, optional): index of the first result to return
+          limit (int, optional): maximum number of results to return
+        """
+        self._objclass = objclass
+        self._conditions = conditions
+        self._or_groups = or_groups
+        self._order = order
+        self._fields = fields
+        self._first = first
+        self._limit = limit
+        self._compiled = None
+
+    def __repr__(self):
+        return "<Query {}: {}>".format(self._objclass.__name__,
+                                        self._compile())
+
+    def __eq__(self, other):
+        return (isinstance(other, Query) and
+                self._objclass is other._objclass and
+                self._compile() == other._compile())
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self._objclass, self._compile()))
+
+    def _replace(self, **changes):
+        """Return a copy of this query with some attributes changed"""
+        attrs = {
+            'conditions': self._conditions,
+            'or_groups': self._or_groups,
+            'order': self._order,
+            'fields': self._fields,
+            'first': self._first,
+            'limit': self._limit,
+        }
+        attrs.update(changes)
+        return Query(self._objclass, **attrs)
+
+    @property
+    def objclass(self):
+        """Return the class this query searches
+
+        Returns:
+          type: AtTaskObject subclass
+        """
+        return self._objclass
+
+    def where(self, **conditions):
+        """Return a query that also requires all of conditions to match
+
+        Conditions are keyword arguments of the form field=value, for
+        equality, or field__suffix=value, where suffix is one of MODIFIERS.
+        For example, status__in=['INP', 'NEW'] or priority__gte=3.
+
+        Each field can only have one condition, except that a __gte and a
+        __lte condition on a field are combined into an inclusive range.
+        field=None (or field__ne=None) tests whether the field is empty.
+
+        Returns:
+          Query
+
+        Raises:
+          ValueError: an unknown suffix, conditions on a field that can't
+            be combined, an empty __in list or a comparison with None
+        """
+        parsed = tuple(_parse_condition(condition, value)
+                       for condition, value in sorted(conditions.items()))
+        return self._replace(conditions=_merge_conditions(
+            self._conditions + parsed))
+
+    def any_of(self, *groups):
+        """Return a query that also requires one of groups to match
+
+        Args:
+          groups (dict): each group is a dict of conditions, as passed to
+            where(), which must all match for the group to match
+
+        Returns:
+          Query
+
+        Raises:
+          ValueError: as for where()
+        """
+        parsed = tuple(
+            _merge_conditions(tuple(_parse_condition(condition, value)
+                                    for condition, value
+                                    in sorted(group.items())))
+            for group in groups)
+        return self._replace(or_groups=self._or_groups + parsed)
+
+    def order_by(self, *fields):
+        """Return a query sorted by fields
+
+        Args:
+          fields (str): field names, prefixed with "-" for descending order
+
+        Returns:
+          Query
+        """
+        order = tuple((field.lstrip('-'),
+                       'desc' if field.startswith('-') else 'asc')
+                      for field in fields)
+        return self._replace(order=order)
+
+    def then_by(self, *fields):
+        """Return a query sorted as this one is, then by fields
+
+        Fields the query is already sorted by are left where they are.
+
+        Args:
+          fields (str): field names, prefixed with "-" for descending order
+
+        Returns:
+          Query
+        """
+        sorted_by = set(field for field, _ in self._order)
+        order = self._order + tuple(
+            (field.lstrip('-'), 'desc' if field.startswith('-') else 'asc')
+            for field in fields if field.lstrip('-') not in sorted_by)
+        return self._replace(order=order)
+
+    def fields(self, *names):
+        """Return a query that only fetches the named fields
+
+        Returns:
+          Query
+        """
+        return self._replace(fields=names)
+
+    def slice(self, first=None, limit=None):
+        """Return a query for a window of the results
+
+        Args:
+          first (int, optional): index of the first result
+          limit (int, optional): maximum number of results
+
+        Returns:
+          Query
+        """
+        return self._replace(first=first, limit=limit)
+
+    def _compile(self):
+        """Compile this query to a tuple of (name, value) pairs
+
+        Conditions come out in field order, then the sort order, fields and
+        slice, so queries built up in a different order compile the same.
+        """
+        if self._compiled is not None:
+            return self._compiled
+
+        params = _compile_conditions(self._conditions)
+        for number, group in enumerate(self._or_groups, 1):
+            params.extend(_compile_conditions(group,
+                                              'OR:{}:'.format(number)))
+
+        if len(self._order) == 1:
+            field, direction = self._order[0]
+            params.append((field + '_Sort', direction))
+        else:
+            for number, (field, direction) in enumerate(self._order, 1):
+                params.append(('{}_{}_Sort'.format(field, number), direction))
+
+        if self._fields:
+            params.append(('fields', ','.join(self._fields)))
+        if self._first is not None:
+            params.append(('$$FIRST', str(self._first)))
+        if self._limit is not None:
+            params.append(('$$LIMIT', str(self._limit)))
+
+        self._compiled = tuple(params)
+        log.debug("compiled {}".format(self._compiled))
+        return self._compiled
+
+    def params(self):
+        """Return the API request parameters for this query
+
+        Repeated names (from __in conditions, for example) are collected
+        into lists, which requests sends as repeated parameters.
+
+        Returns:
+          dict: request parameters
+        """
+        params = {}
+        for name, value in self._compile():
+            if name in params:
+                if not isinstance(params[name], list):
+                    params[name] = [params[name]]
+                params[name].append(value)
+            else:
+                params[name] = value
+        return params
+
+    def search(self, params=None):
+        """Run the query
+
+        Args:
+          params (dict, optional): additional api request parameters
+
+        Returns:
+          [ objclass, ... ]
+        """
+        return self._objclass.search(self, params)
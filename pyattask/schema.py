@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""Object schemas, discovered from the API's metadata endpoints
+
+The field lists hard-coded on each AtTaskObject class are a starting point,
+but the API knows exactly which fields each objCode has, and of what type.
+discover() asks it (via /<objCode>/metadata) and caches the answer on disk,
+per API url, stamped with the schema format version. From then on, every
+process on the host reads the cache instead: the typed field accessors and
+from_json() use the discovered fields, objattrs(discovered=True) lists them,
+and get_class() can build classes for objCodes this package has no module
+for. Requests still ask for the hard-coded fields by default, as every
+discovered field would make for very long urls.
+
+Schemas are per API url: creating a session for another url drops the
+schemas, generated classes and field parsers of the last one.
+"""
+
+import json
+import os
+import time
+
+import pyattask.locking
+import pyattask.session
+from pyattask.fields import BOOLEAN, DATE, NUMBER
+
+import logging
+log = logging.getLogger(__name__)
+
+
+# Bump this when the layout of the cache file changes
+SCHEMA_FORMAT = 1
+
+cache_dirname = ".pyattask_schema"
+
+# API fieldType values, mapped to the types in pyattask.fields. Anything
+# else is left as a string.
+FIELD_TYPES = {
+    'date': DATE,
+    'dateTime': DATE,
+    'int': NUMBER,
+    'long': NUMBER,
+    'double': NUMBER,
+    'float': NUMBER,
+    'boolean': BOOLEAN,
+}
+
+# objCode -> {'fields': [...], 'fieldtypes': {...}, 'fieldset': frozenset},
+# for the current session's url
+_schemas = {}
+_schemas_url = None
+
+# objCode -> generated class
+_generated = {}
+
+
+def _cache_path(url):
+    """Return the cache file for an API url"""
+    name = url.split('://', 1)[-1].strip('/').replace('/', '_')
+    return os.path.join(os.getenv('HOME'), cache_dirname, name + '.json')
+
+
+def _current_url():
+    """Return the current session's url, or None if there isn't a session"""
+    session = pyattask.session._CURRENT_SESSION
+    return session.url if session is not None else None
+
+
+def _read_cache(url):
+    """Return the cached schemas for url, or {} if the cache is missing or
+    stale"""
+    path = _cache_path(url)
+    if not os.path.exists(path):
+        return {}
+    with pyattask.locking.locked(path, exclusive=False):
+        return _read_cache_locked(url)
+
+
+def _read_cache_locked(url):
+    """_read_cache(), for callers already holding the cache's lock"""
+    path = _cache_path(url)
+    try:
+        with open(path) as cachefile:
+            cache = json.load(cachefile)
+    except (IOError, ValueError):
+        return {}
+
+    if cache.get('format') != SCHEMA_FORMAT or cache.get('url') != url:
+        log.info("ignoring stale schema cache {}".format(path))
+        return {}
+    return cache.get('objects', {})
+
+
+def _write_cache(url, objcode, schema):
+    """Add (or replace) objcode's schema in url's cache"""
+    path = _cache_path(url)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+
+    with pyattask.locking.locked(path):
+        objects = _read_cache_locked(url)
+        objects[objcode] = schema
+        cache = {'format': SCHEMA_FORMAT, 'url': url,
+                 'updated': time.time(), 'objects': objects}
+
+        def save(filename):
+            with open(filename, 'w') as cachefile:
+                json.dump(cache, cachefile)
+
+        pyattask.locking.atomic_save(path, save, mode=0o644)
+
+
+def _prepare(schema):
+    """Add the derived members we keep in memory to a cached schema"""
+    schema = dict(schema)
+    schema['fieldset'] = frozenset(schema['fields'])
+    return schema
+
+
+def reset():
+    """Forget the schemas loaded for the last session's url
+
+    Drops the in-memory schemas and generated classes, and makes every class
+    rebuild its field parsers. Called when a session is created; the disk
+    cache is left alone.
+    """
+    global _schemas, _schemas_url
+
+    _schemas = {}
+    _schemas_url = None
+    _generated.clear()
+    _reset_parsers()
+
+
+def _reset_parsers():
+    """Make every class rebuild its cached field parsers"""
+    for objclass in _classes().values():
+        objclass._parsers_by_field = None
+
+
+def _load(objcode):
+    """Return objcode's schema from memory or the disk cache, or None"""
+    global _schemas, _schemas_url
+
+    url = _current_url()
+    if url is None:
+        return None
+    if url != _schemas_url:
+        reset()
+        _schemas = dict((code, _prepare(schema))
+                        for code, schema in _read_cache(url).items())
+        _schemas_url = url
+    return _schemas.get(objcode)
+
+
+def fields(objcode):
+    """Return the discovered field names for objcode
+
+    Args:
+      objcode (str): the objCode
+
+    Returns:
+      list: field names, or None if objcode hasn't been discovered
+    """
+    schema = _load(objcode)
+    return schema['fields'] if schema is not None else None
+
+
+def fieldset(objcode):
+    """Return the discovered field names for objcode, as a frozenset
+
+    Returns:
+      frozenset: field names, or None if objcode hasn't been discovered
+    """
+    schema = _load(objcode)
+    return schema['fieldset'] if schema is not None else None
+
+
+def fieldtypes(objcode):
+    """Return the discovered non-string field types for objcode
+
+    Returns:
+      dict: {field: type, ...}, or None if objcode hasn't been discovered
+    """
+    schema = _load(objcode)
+    return schema['fieldtypes'] if schema is not None else None
+
+
+def discover(objcode):
+    """Fetch objcode's schema from the API and cache it
+
+    Args:
+      objcode (str): the objCode, e.g. "TASK"
+
+    Returns:
+      list: the field names
+    """
+    from pyattask.objects import AtTaskObject
+
+    url = pyattask.session.get_session().url
+    metadata = AtTaskObject._rest_transaction(
+        "get", url + '/' + objcode.lower() + '/metadata', {})['data']
+
+    fieldtypes_ = {}
+    for name, field in metadata.get('fields', {}).items():
+        fieldtype = FIELD_TYPES.get(field.get('fieldType'))
+        if fieldtype is not None:
+            fieldtypes_[name] = fieldtype
+
+    schema = {
+        'name': metadata.get('name', objcode.title()),
+        'fields': sorted(metadata.get('fields', {})),
+        'fieldtypes': fieldtypes_,
+    }
+    _write_cache(url, objcode, schema)
+    if url == _schemas_url:
+        _schemas[objcode] = _prepare(schema)
+
+    # Classes cache their field parsers; make them rebuild them
+    _reset_parsers()
+
+    log.info("discovered {} fields for {}".format(len(schema['fields']),
+                                                  objcode))
+    return schema['fields']
+
+
+def _classes():
+    """Return every AtTaskObject class we have, keyed by objCode
+
+    Classes generated for another url are left out.
+    """
+    # Make sure the classes we ship have been defined
+    import pyattask.issue
+    import pyattask.project
+    import pyattask.task
+    import pyattask.user
+    from pyattask.objects import AtTaskObject
+
+    classes = {}
+    pending = [AtTaskObject]
+    while pending:
+        objclass = pending.pop()
+        pending.extend(objclass.__subclasses__())
+        if ('_schema_url' in objclass.__dict__
+                and _generated.get(objclass.objcode()) is not objclass):
+            continue
+        if objclass.objcode() is not None:
+            classes.setdefault(objclass.objcode(), objclass)
+    return classes
+
+
+def _init_generated(self, **kwargs):
+    self._attrs = kwargs['attrs']
+
+
+def get_class(objcode, generate=True, schema=None):
+    """Return the class for objcode, generating one if need be
+
+    Classes are generated from the cached schema (which is discovered first
+    if it isn't cached yet), or from the one given.
+
+    Args:
+      objcode (str): the objCode, e.g. "OPTASK" or "HOUR"
+      generate (bool, optional): if False, only return classes that already
+        exist (shipped or generated), rather than going to the API
+      schema (dict, optional): {'fields': [...], 'fieldtypes': {...}} to
+        generate the class from if objcode's schema isn't cached, rather
+        than going to the API. The class is not kept for later calls
+
+    Returns:
+      type: an AtTaskObject subclass, or None if generate is False and there
+        is no class yet
+    """
+    objclass = _classes().get(objcode)
+    if objclass is not None or not generate:
+        return objclass
+
+    if _load(objcode) is None:
+        if schema is not None:
+            return _generate(objcode, dict(schema, name=objcode.title()))
+        discover(objcode)
+    objclass = _generate(objcode, _load(objcode))
+    _generated[objcode] = objclass
+    return objclass
+
+
+def _generate(objcode, schema):
+    """Return a new class for objcode, with schema's fields"""
+    from pyattask.objects import AtTaskObject
+    name = str(schema['name'].replace(' ', ''))
+    return type(name, (AtTaskObject,), {
+        '__doc__': "AtTask {} objects (generated)".format(schema['name']),
+        '__init__': _init_generated,
+        '_api_endpoint': objcode.lower(),
+        '_api_objcode': objcode,
+        '_api_objattrs': schema['fields'],
+        '_api_fieldtypes': schema['fieldtypes'],
+        '_schema_url': _schemas_url,
+    })
@@ -18,19 +18,33 @@
 #    Boston, MA  02110-1301, USA.
 
 """Session management for Python AtTask API module.
+
+requests, cookielib and the SAML/NTLM dependencies are imported where they
+are first needed rather than at module level: every object module imports
+this one, and scripts that never create a session (or that already hold a
+valid cookie and never log in) shouldn't pay for them at startup.
 """
 
-from requests_ntlm import HttpNtlmAuth
-import ssl
-import requests
+from contextlib import contextmanager
+import HTMLParser
+import json
 import os
-import cookielib
-from bs4 import BeautifulSoup as bs
+import Queue
+import sys
+import threading
+import time
+
+import pyattask.cache
+import pyattask.locking
+import pyattask.transport
 
+from pyattask.concurrency import SingleFlight, thread_pool
 from pyattask.exceptions import (
     NoSession,
     GetHTTPError,
     AuthenticationError,
+    FlightTimeout,
+    RequestTimeout,
 )
 
 import logging
@@ -40,22 +54,48 @@ log = logging.getLogger(__name__)
 # Pick a generic endpoint to test the API. This is something that is guaranteed
 # to return a 200
 authtest_endpoint = "/project/count?status=CUR"
+cookiejar_filename = ".pyattask_cookiejar"
+
+# API endpoint describing the session making the request. Used to validate
+# sessionID and apiKey credentials, which don't get the userid header.
+session_endpoint = "/session"
+
+# sessionIDs (and API keys) are kept here, keyed by API url, so every process
+# on the host can re-use one validated credential
+token_filename = ".pyattask_session"
+
+# The form inputs carrying SAML state from one hop of the login to the next
+saml_fields = ("SAMLRequest", "SAMLResponse", "RelayState")
 _CURRENT_SESSION = None
 
+# Seconds a request may take unless the session says otherwise
+DEFAULT_TIMEOUT = 60
+
 
-def create_session(url, forcetlsone=False):
+def create_session(url, forcetlsone=False, strip_empty=False,
+                   timeout=DEFAULT_TIMEOUT, hedge=False):
     """Initialize the global AtTask API session.
 
     Args:
       url (text): URL for the API (with version strings)
       forcetlsone (bool): Force the session to TLS1 (default: False)
+      strip_empty (bool): Drop null and empty fields from returned objects
+        (default: False)
+      timeout (float): Seconds any one API request may take
+        (default: DEFAULT_TIMEOUT)
+      hedge (bool): Hedge slow GETs with a second request (default: False)
 
     Returns:
       None
     """
 
     global _CURRENT_SESSION
-    _CURRENT_SESSION = AtTaskSession(url, forcetlsone)
+    _CURRENT_SESSION = AtTaskSession(url, forcetlsone, strip_empty, timeout,
+                                     hedge)
+
+    # Schemas belong to one url; don't carry the last session's over
+    import pyattask.schema
+    pyattask.schema.reset()
 
 
 def get_session():
@@ -70,6 +110,218 @@ def get_session():
         return _CURRENT_SESSION
 
 
+class _SamlFormParser(HTMLParser.HTMLParser):
+    """Pull the action and hidden inputs out of the first form in a page
+
+    This is all we need from the pages in the login flow, so rather than
+    building a document tree we just watch the tags go by, and bail out (by
+    raising Done) at the end of the form.
+
+    Every hidden input is kept, not just the SAML ones: identity providers
+    add their own (RelayState, CSRF nonces, ...) and expect them back.
+    """
+
+    class Done(Exception):
+        """Raised to stop parsing early"""
+        pass
+
+    def __init__(self):
+        HTMLParser.HTMLParser.__init__(self)
+        self.action = None
+        self.values = {}
+        self._in_form = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'form' and self.action is None:
+            self.action = dict(attrs).get('action')
+            self._in_form = self.action is not None
+        elif tag == 'input' and self._in_form:
+            attrs = dict(attrs)
+            name = attrs.get('name')
+            if name is not None and (name in saml_fields or
+                                     attrs.get('type', '').lower() ==
+                                     'hidden'):
+                self.values[name] = attrs.get('value', '')
+
+    def handle_endtag(self, tag):
+        if tag == 'form' and self._in_form:
+            raise self.Done()
+
+
+class TransferStats(object):
+    """Counters for the bytes moved by a session's API requests"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __repr__(self):
+        return ("<TransferStats ({} responses, {} bytes on the wire, "
+                "{} decoded, ratio {:.2f})>".format(
+                    self.responses, self.wire_bytes, self.decoded_bytes,
+                    self.ratio))
+
+    def reset(self):
+        """Zero all counters"""
+        with self._lock:
+            self.responses = 0
+            self.compressed_responses = 0
+            self.wire_bytes = 0
+            self.decoded_bytes = 0
+
+    def record(self, wire_bytes, decoded_bytes, encoding=None):
+        """Account for one response body
+
+        Args:
+          wire_bytes (int): size of the body as transferred
+          decoded_bytes (int): size of the body after decompression
+          encoding (str, optional): the Content-Encoding of the response
+        """
+        with self._lock:
+            self.responses += 1
+            self.wire_bytes += wire_bytes
+            self.decoded_bytes += decoded_bytes
+            if encoding:
+                self.compressed_responses += 1
+
+    @property
+    def ratio(self):
+        """Return decoded bytes per byte transferred (1.0 if uncompressed)
+
+        Returns:
+          float: compression ratio
+        """
+        if not self.wire_bytes:
+            return 1.0
+        return float(self.decoded_bytes) / self.wire_bytes
+
+
+class LatencyTracker(object):
+    """Latencies of a session's recent GETs, for choosing when to hedge"""
+
+    def __init__(self, size=200, min_samples=20):
+        """Initialize the LatencyTracker object
+
+        Args:
+          size (int, optional): how many recent latencies to keep
+          min_samples (int, optional): how many are needed before
+            percentile() gives an answer
+        """
+        self._lock = threading.Lock()
+        self._samples = []
+        self._next = 0
+        self._size = size
+        self._min_samples = min_samples
+
+    def __repr__(self):
+        return "<LatencyTracker ({} samples, p95 {})>".format(
+            len(self._samples), self.percentile(95))
+
+    def record(self, seconds):
+        """Account for one request
+
+        Args:
+          seconds (float): how long it took
+        """
+        with self._lock:
+            if len(self._samples) < self._size:
+                self._samples.append(seconds)
+            else:
+                self._samples[self._next] = seconds
+                self._next = (self._next + 1) % self._size
+
+    def percentile(self, pct):
+        """Return the latency pct% of recent requests came in under
+
+        Args:
+          pct (float): the percentile, e.g. 95
+
+        Returns:
+          float: seconds, or None if there aren't enough samples yet
+        """
+        with self._lock:
+            if len(self._samples) < self._min_samples:
+                return None
+            samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100.0))]
+
+
+class Gathered(object):
+    """The outcome of AtTaskSession.gather(): a result or error per call
+
+    Iterating (or unpacking) gives the results in the order the calls were
+    made, raising the error of the first call that failed, if any. Use
+    get(), errors and failed to deal with partial failure instead.
+    """
+
+    def __init__(self, outcomes):
+        """Initialize the Gathered object
+
+        Args:
+          outcomes (list): (succeeded, result or exception) per call
+        """
+        self._outcomes = outcomes
+
+    def __repr__(self):
+        return "<Gathered ({} calls, {} failed)>".format(len(self),
+                                                         len(self.failed))
+
+    def __len__(self):
+        return len(self._outcomes)
+
+    def __getitem__(self, index):
+        succeeded, outcome = self._outcomes[index]
+        if not succeeded:
+            raise outcome
+        return outcome
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def ok(self):
+        """Return whether every call succeeded
+
+        Returns:
+          bool: True if nothing failed
+        """
+        return not self.failed
+
+    @property
+    def failed(self):
+        """Return the positions of the calls that failed
+
+        Returns:
+          [ int, ... ]: indexes into the calls given to gather()
+        """
+        return [index for index, (succeeded, _) in enumerate(self._outcomes)
+                if not succeeded]
+
+    @property
+    def errors(self):
+        """Return the exceptions raised by the calls that failed
+
+        Returns:
+          dict: exception by call index
+        """
+        return dict((index, self._outcomes[index][1])
+                    for index in self.failed)
+
+    def get(self, index, default=None):
+        """Return the result of a call, or default if it failed
+
+        Args:
+          index (int): the position of the call
+          default (optional): returned if the call failed
+
+        Returns:
+          the call's result, or default
+        """
+        succeeded, outcome = self._outcomes[index]
+        return outcome if succeeded else default
+
+
 class AtTaskSession(object):
     """An object representing an AtTask session"""
 
@@ -77,17 +329,47 @@ class AtTaskSession(object):
     _url = None
     _session = None
 
-    def __init__(self, url, forcetlsone=False):
+    def __init__(self, url, forcetlsone=False, strip_empty=False,
+                 timeout=DEFAULT_TIMEOUT, hedge=False):
         """Initialize the AtTaskSession object
 
         Args:
           url (str): The URL to the AtTask API instance
           forcetlsone (bool, optional): force a TLS1 session. Defaults to False
+          strip_empty (bool, optional): drop fields whose value is null or
+            empty from the objects in API responses, before they are turned
+            into AtTaskObjects. Defaults to False
+          timeout (float, optional): seconds any one API request may take,
+            or None to wait forever. Defaults to DEFAULT_TIMEOUT
+          hedge (bool, optional): if a GET hasn't answered by the p95 of
+            recent GET latencies, send an identical second one and take
+            whichever answers first. Defaults to False
         """
 
         self._url = url
+        self._forcetlsone = forcetlsone
+        self._strip_empty = strip_empty
+        self._stats = TransferStats()
+        self._timeout = timeout
+        self._hedge = hedge
+        self._latency = LatencyTracker()
+        self._deadlines = threading.local()
         self._baseurl = url.split('attask/api')[0]
+        self._login_flight = SingleFlight()
+        self._read_flight = SingleFlight()
+        self._listeners = []
+        self._cache = None
+        self._cache_searches = False
+        self._token = None
+        self._token_validated = False
+        self._token_mtime = None
+
+        # Note the jar's mtime *before* loading it. If another process
+        # rewrites it in between, we'll just reload it again later.
+        self._cookiejar_mtime = pyattask.locking.mtime(_cookiejar_path())
         self._session = self._get_new_requestsession(forcetlsone)
+        self._transport = pyattask.transport.RequestsTransport(self._session)
+        self._refresh_token()
         log.debug(self._session)
 
     def __repr__(self):
@@ -106,6 +388,203 @@ class AtTaskSession(object):
         """
         return self._url
 
+    @property
+    def settings(self):
+        """Return the arguments needed to create an equivalent session
+
+        Used to set up sessions in worker processes, which then share this
+        session's saved cookie or sessionID.
+
+        Returns:
+          dict: keyword arguments for create_session()
+        """
+        return {'url': self._url, 'forcetlsone': self._forcetlsone,
+                'strip_empty': self._strip_empty, 'timeout': self._timeout,
+                'hedge': self._hedge}
+
+    @property
+    def stats(self):
+        """Return transfer statistics for API requests
+
+        Returns:
+          stats (TransferStats): byte counts for this session
+        """
+        return self._stats
+
+    @property
+    def transport(self):
+        """Return the transport API requests are sent with
+
+        Returns:
+          transport: see pyattask.transport
+        """
+        return self._transport
+
+    def set_transport(self, transport):
+        """Send API requests, and authentication checks, another way
+
+        Used to record and replay API traffic (see pyattask.transport).
+        Logging in always goes straight to the server.
+
+        Args:
+          transport: an object with a send() method like
+            RequestsTransport's
+        """
+        log.debug("transport {}".format(transport))
+        self._transport = transport
+        # Let the new transport show whether we're authenticated
+        self._token_validated = False
+
+    @property
+    def latency(self):
+        """Return the latencies of recent GETs
+
+        Returns:
+          latency (LatencyTracker): recent GET latencies
+        """
+        return self._latency
+
+    @contextmanager
+    def deadline(self, seconds):
+        """Bound how long the API requests made in the block may take
+
+        Applies to requests made by this thread. Every request in the block
+        must complete within `seconds` of entering it, or RequestTimeout is
+        raised. That includes time spent waiting on an identical request
+        already in flight in another thread, and authentication checks.
+        Nested deadlines can only shorten the outer one.
+
+        Args:
+          seconds (float): the budget for the whole block
+
+        Yields:
+          None
+        """
+        outer = getattr(self._deadlines, 'at', None)
+        at = time.time() + seconds
+        self._deadlines.at = at if outer is None else min(at, outer)
+        try:
+            yield
+        finally:
+            self._deadlines.at = outer
+
+    def gather(self, *calls, **kwargs):
+        """Make several API calls at once, over the shared connection pool
+
+        Each call is a Query, which is searched, or a callable taking no
+        arguments, e.g. ``functools.partial(Task.search, {...})`` or
+        ``User.current_user``. A deadline in force around gather() applies
+        to every call.
+
+        Args:
+          *calls: Query objects or callables
+          concurrency (int, optional): most calls in flight at once.
+            Defaults to all of them, up to 8
+
+        Returns:
+          Gathered: the results, in the order of calls, and any errors
+        """
+        concurrency = kwargs.pop('concurrency', None) or min(len(calls), 8)
+        if kwargs:
+            raise TypeError("unexpected arguments {}".format(sorted(kwargs)))
+        if not calls:
+            return Gathered([])
+
+        def run(call):
+            if not callable(call):
+                call = call.search
+            try:
+                return True, call()
+            except Exception as err:
+                log.warning("gathered call {} failed: {}".format(call, err))
+                return False, err
+
+        with thread_pool(concurrency) as pool:
+            return Gathered(pool.map(self.carry_deadline(run), calls))
+
+    def carry_deadline(self, function):
+        """Wrap function to run under this thread's current deadline
+
+        Deadlines are per thread, so work handed to a pool would otherwise
+        escape them.
+
+        Args:
+          function (callable): the function to wrap
+
+        Returns:
+          callable: function, or a wrapper setting the deadline in force
+            now (if there is one) around it
+        """
+        at = getattr(self._deadlines, 'at', None)
+        if at is None:
+            return function
+
+        def with_deadline(*args, **kwargs):
+            with self.deadline(at - time.time()):
+                return function(*args, **kwargs)
+        return with_deadline
+
+    def _remaining(self):
+        """Return the seconds left for a request, or None for no limit
+
+        Raises:
+          RequestTimeout: the deadline has already passed
+        """
+        remaining = self._timeout
+        at = getattr(self._deadlines, 'at', None)
+        if at is not None:
+            left = at - time.time()
+            if left <= 0:
+                raise RequestTimeout("deadline exceeded")
+            remaining = left if remaining is None else min(left, remaining)
+        return remaining
+
+    @property
+    def cache(self):
+        """Return the object cache, if one has been set
+
+        Returns:
+          cache (SQLiteCache or MemoryCache): the cache, or None
+        """
+        return self._cache
+
+    @property
+    def cache_searches(self):
+        """Return whether AtTaskObject.search() results are cached too
+
+        Returns:
+          bool: True if searches go through the cache
+        """
+        return self._cache is not None and self._cache_searches
+
+    def set_cache(self, cache, searches=False):
+        """Cache objects fetched with AtTaskObject.get()
+
+        The cache is subscribed to this session's events, so entries are
+        dropped as soon as the objects change. Give the cache a grace
+        period to have reads served stale while the upstream is slow or
+        failing (see pyattask.cache).
+
+        Args:
+          cache (SQLiteCache or MemoryCache): see pyattask.cache, or None to
+            stop caching
+          searches (bool, optional): cache the results of
+            AtTaskObject.search() as well. A change to any object of a class
+            drops every cached search of that class. Defaults to False
+        """
+        if self._cache is not None:
+            self.unsubscribe(self._invalidate_cached)
+        self._cache = cache
+        self._cache_searches = searches
+        if cache is not None:
+            self.subscribe(self._invalidate_cached)
+
+    def _invalidate_cached(self, event):
+        """Drop cached copies of the object an event is about"""
+        self._cache.invalidate(pyattask.cache.object_tag(event.objcode,
+                                                         event.id))
+        self._cache.invalidate(pyattask.cache.search_tag(event.objcode))
+
     @property
     def userid(self):
         """Return pyattask userid
@@ -116,7 +595,7 @@ class AtTaskSession(object):
         return self._userid
 
     @staticmethod
-    def _get_new_requestsession(forcetlsone=True, filename='.pyattask_cookiejar'):
+    def _get_new_requestsession(forcetlsone=True, filename=cookiejar_filename):
         """Return properly prepared requests.Session() object
 
         Args:
@@ -133,8 +612,12 @@ class AtTaskSession(object):
         TODO(davidr): probably change forcetlsone to default to False
         """
 
+        import cookielib
+        import requests
+
         session = requests.Session()
         if forcetlsone:
+            import ssl
             from requests.adapters import HTTPAdapter
             from requests.packages.urllib3.poolmanager import PoolManager
 
@@ -154,34 +637,162 @@ class AtTaskSession(object):
             session.mount('https://', TLS1Adapter())
 
         # Attach a cookielib.LWPCookieJar object to the requests.Session.
-        homedir = os.getenv('HOME')
-        if not os.path.isdir(homedir):
-            raise IOError(2, 'No such file or directory', homedir)
-
-        cookiejar_file = os.path.join(homedir, filename)
-        cookiejar = cookielib.LWPCookieJar(cookiejar_file)
-
-        try:
-            cookiejar.load()
-        except IOError as err:
-            # It's not actually a problem if the cookiefile isn't there. We'll
-            # create it later on when we save the cookies in the Session object
-            #
-            # If it's not a "No such file" error, we need to re-raise it.
-            if not err.strerror.startswith("No such file"):
-                raise err
-
+        cookiejar = cookielib.LWPCookieJar(_cookiejar_path(filename))
+        _load_cookiejar(cookiejar)
         session.cookies = cookiejar
 
         headers = {
             'User-Agent': 'Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:28.0) ' +
                           'PyAtTask/0.0a',
             'Accept': 'application/json',
+            # Search results are large and very repetitive JSON
+            'Accept-Encoding': 'gzip, deflate',
         }
 
-        session.headers.update(headers=headers)
+        session.headers.update(headers)
         return session
 
+    def _fetch(self, method, url, params=None, data=None):
+        """Perform an API request, returning the response and its JSON
+
+        Identical GETs (same url and params) issued while one is already in
+        flight don't go to the network: they wait for, and return, the
+        result of the one in flight. That result is shared, not copied, so
+        callers must treat it as read-only.
+
+        Args:
+          method (str): get, post, put, delete
+          url (str): the request url
+          params (dict, optional): request parameters
+          data (dict, optional): form-encoded request body
+
+        Returns:
+          (Response, json): the response (see pyattask.transport), and its
+            decoded body (or None if the body was not JSON)
+        """
+
+        timeout = self._remaining()
+        if method != 'get':
+            return self._fetch_uncoalesced(method, url, params, data,
+                                           timeout)
+
+        # Coalesced GETs run under the deadline of whoever sent them first
+        return self._flight_within(self._read_flight,
+                                   ('get', url, _freeze_params(params)),
+                                   timeout, self._fetch_get, url, params,
+                                   timeout)
+
+    @staticmethod
+    def _flight_within(flight, key, timeout, function, *args):
+        """Share a call through flight, waiting on others at most timeout
+
+        Raises:
+          RequestTimeout: another thread's call didn't finish in time
+        """
+        try:
+            return flight.do_within(key, timeout, function, *args)
+        except FlightTimeout as err:
+            raise RequestTimeout(str(err))
+
+    def _fetch_get(self, url, params, timeout):
+        """Perform a GET on behalf of _fetch(), hedging it if we can
+
+        The request runs in its own thread so that we can stop waiting for
+        it at the deadline, or send a second one when it is slow. A request
+        that's given up on is left to finish (or time out) in the
+        background, and its response is thrown away.
+
+        Returns:
+          (Response, json): as _fetch()
+
+        Raises:
+          RequestTimeout: no response arrived in time
+        """
+        hedge_after = self._latency.percentile(95) if self._hedge else None
+        if hedge_after is None and getattr(self._deadlines, 'at', None) is \
+                None:
+            # Nothing to do but wait, which requests' timeout handles
+            return self._fetch_uncoalesced('get', url, params, None, timeout)
+
+        results = Queue.Queue()
+
+        def attempt():
+            try:
+                results.put((True, self._fetch_uncoalesced(
+                    'get', url, params, None, timeout)))
+            except Exception:
+                results.put((False, sys.exc_info()))
+
+        def start():
+            thread = threading.Thread(target=attempt, name="pyattask-get")
+            thread.daemon = True
+            thread.start()
+
+        expires = None if timeout is None else time.time() + timeout
+        attempts = 1
+        start()
+        if hedge_after is not None and (timeout is None or
+                                        hedge_after < timeout):
+            try:
+                outcome = results.get(timeout=hedge_after)
+            except Queue.Empty:
+                log.debug("hedging GET {} after {:.3f}s".format(
+                    url, hedge_after))
+                attempts += 1
+                start()
+            else:
+                results.put(outcome)
+
+        failure = None
+        while attempts:
+            wait = None if expires is None else expires - time.time()
+            try:
+                if wait is not None and wait <= 0:
+                    raise Queue.Empty
+                succeeded, outcome = results.get(
+                    timeout=wait)
+            except Queue.Empty:
+                raise RequestTimeout("GET {} timed out after {}s".format(
+                    url, timeout))
+            attempts -= 1
+            if succeeded:
+                return outcome
+            failure = outcome
+        raise failure[0], failure[1], failure[2]
+
+    def _fetch_uncoalesced(self, method, url, params=None, data=None,
+                           timeout=None):
+        """Perform an API request on behalf of _fetch()
+
+        The transport hands back the body as transferred and it is
+        decompressed here, so that we can count what crossed the wire.
+
+        Returns:
+          (Response, json): as _fetch()
+
+        Raises:
+          RequestTimeout: the server took longer than timeout to connect or
+            to send any part of the response
+        """
+        started = time.time()
+        response = self._transport.send(method, url, params, data, timeout)
+        if method == 'get' and response.status_code == 200:
+            self._latency.record(time.time() - started)
+
+        wire_body = response.body
+        body = response.content
+        self._stats.record(len(wire_body), len(body), response.encoding)
+
+        try:
+            decoded = json.loads(body)
+        except ValueError:
+            return response, None
+
+        if self._strip_empty and isinstance(decoded, dict) and \
+                'data' in decoded:
+            decoded['data'] = _strip_empty(decoded['data'])
+        return response, decoded
+
     @staticmethod
     def _extract_saml_form(html_text):
         """Take HTML text and extract SAML forms from it.
@@ -203,55 +814,79 @@ class AtTaskSession(object):
           AuthenticationError
         """
 
-        soup = bs(html_text)
+        parser = _SamlFormParser()
+        try:
+            parser.feed(html_text)
+            parser.close()
+        except _SamlFormParser.Done:
+            pass
+        except HTMLParser.HTMLParseError as err:
+            raise AuthenticationError(
+                "unparseable saml response: {}".format(err))
 
         # TODO(davidr): we're making the assumption that the first (only) form
         #   returned will be our SAML request form, which is obviously stupid
-        try:
-            first_form = soup.findAll('form')[0]
-        except IndexError:
+        if parser.action is None:
             raise AuthenticationError("no saml form in response")
 
-        saml_post = {
-            'url': first_form['action'],
-            'values': {}
-        }
-
-        # TODO(davidr): bs4 puts the "name" field in the dict, but using that
-        #   name, will generate keyerrors. Do some ugliness to figure out what
-        #   damn form fields they want
-        for field in ("SAMLRequest", "SAMLResponse", "RelayState"):
-            try:
-                value = first_form.findAll('input', {'name': field})[0]['value']
-                saml_post['values'][field] = value
-            except IndexError:
-                # The key didn't exist, so there's no point in assigning
-                log.debug("key {} DNE".format(field))
+        for field in set(saml_fields) - set(parser.values):
+            # The key didn't exist, so there's no point in assigning
+            log.debug("key {} DNE".format(field))
 
-        return saml_post
+        return {
+            'url': parser.action,
+            'values': parser.values,
+        }
 
     def is_authenticated(self):
         """Check session authentication status
 
+        Sessions authenticated with a sessionID or API key are only checked
+        against the API once; after that they're trusted until a request is
+        refused (see auth_failed()).
+
         Returns:
             rc (bool): True if authenticated, else False
         """
 
-        pyattask_authresponse = self._session.get(self._baseurl.format(
-            req=authtest_endpoint), verify=False)
+        if self._token is not None:
+            return self._is_token_authenticated()
+
+        # Every @authenticated call lands here, so under load many threads
+        # probe at once. They can all share one request.
+        return self._flight_within(self._read_flight, ('auth',),
+                                   self._remaining(),
+                                   self._check_cookie_authenticated)
+
+    def _check_cookie_authenticated(self):
+        """Probe the site to see if our cookie is (still) accepted
+
+        Returns:
+            rc (bool): True if authenticated, else False
+        """
+
+        pyattask_authresponse = self._transport.send(
+            'get', self._baseurl.format(req=authtest_endpoint),
+            timeout=self._remaining())
 
         if pyattask_authresponse.status_code == 401:
+            # Another process may have logged in and saved a fresh cookie
+            if self._refresh_cookies():
+                return self._check_cookie_authenticated()
             return False
         elif pyattask_authresponse.status_code != 200:
             # TODO(davidr): do proper exceptions. shame on you
             raise GetHTTPError("{} returned status code {}: {}".format(
-                pyattask_authresponse.url, pyattask_authresponse.status_code,
+                pyattask.transport.scrub_url(pyattask_authresponse.url),
+                pyattask_authresponse.status_code,
                 pyattask_authresponse.reason))
 
         try:
             userid = self._check_authresponse(pyattask_authresponse)
         except AuthenticationError as err:
             log.debug("Not authenticated: {}".format(err))
+            if self._refresh_cookies():
+                return self._check_cookie_authenticated()
             return False
 
         log.info("Authenticated with userid: {}".format(userid))
@@ -268,6 +903,12 @@ class AtTaskSession(object):
         If the cookie is current and works, the session is returned. If not, a
         new SAML request is done, and the resulting cookie is saved to the jar
 
+        Concurrent logins are collapsed: threads calling login() while another
+        thread is already logging in wait for, and share, that attempt. Across
+        processes, logins are serialized on a lock next to the cookie jar, and
+        a process that acquires it after another one has finished simply
+        picks up the cookie that was saved.
+
         TODO(davidr): Change saml to default to False
         TODO(davidr): fix domain
 
@@ -275,7 +916,9 @@ class AtTaskSession(object):
           username (str): string containing username
           password (str): string containing password
           domain (str): string containing the windows domain
-          saml (bool, optional): Authenticate via a SAML session. Defaults True
+          saml (bool, optional): Authenticate via a SAML session. Defaults
+            True. If False, a sessionID is requested from the API's /login
+            endpoint instead, and saved for re-use by other processes
 
         Returns:
           bool: True if successful, else False
@@ -284,10 +927,46 @@ class AtTaskSession(object):
         if self.is_authenticated():
             return True
 
+        return self._login_flight.do((username, domain, saml), self._login,
+                                     username, password, saml, domain)
+
+    def _login(self, username, password, saml, domain):
+        """Perform a single login attempt on behalf of login()
+
+        Args:
+          username (str): string containing username
+          password (str): string containing password
+          saml (bool): Authenticate via a SAML session
+          domain (str): string containing the windows domain
+
+        Returns:
+          bool: True if successful, else False
+        """
+
+        with pyattask.locking.locked(_cookiejar_path() + '.login'):
+            # Whoever held the lock before us may well have just logged in
+            if self._refresh_cookies() and self.is_authenticated():
+                log.info("picked up cookie saved by another session")
+                return True
+
+            return self._login_locked(username, password, saml, domain)
+
+    def _login_locked(self, username, password, saml, domain):
+        """Authenticate, with the cross-process login lock held
+
+        Returns:
+          bool: True if successful, else False
+        """
+
+        if self._refresh_token() and self.is_authenticated():
+            log.info("picked up sessionID saved by another session")
+            return True
+
         if saml:
             log.debug("session.get({})".format(self._baseurl.format(req="/")))
             pyattask_authrequest = self._session.get(self._baseurl.format(req="/"),
-                                                   verify=False)
+                                                   verify=False,
+                                                   timeout=self._timeout)
             log.debug("Auth Request: {}".format(pyattask_authrequest))
             if self._authenticate_saml(domain + '\\' + username,
                                        password, pyattask_authrequest):
@@ -298,8 +977,30 @@ class AtTaskSession(object):
 
         return False
 
+    def login_apikey(self, apikey):
+        """Authenticate with an AtTask API key
+
+        The key is validated against the API once, and saved alongside any
+        sessionIDs so that other processes can use it without validating it
+        again.
+
+        Args:
+          apikey (str): the API key
+
+        Returns:
+          bool: True if successful, else False
+        """
+
+        self._set_token({'apiKey': apikey})
+        if not self._is_token_authenticated():
+            self._set_token(None)
+            return False
+
+        self._save_token()
+        return True
+
     def _authenticate_basic(self, username, password):
-        """Authenticate a session via basic HTTP auth
+        """Authenticate a session with a sessionID from the /login endpoint
 
         Args:
           username (str): string containing username
@@ -307,21 +1008,175 @@ class AtTaskSession(object):
 
         Returns:
           bool: True if properly authenticated, else False
+        """
+
+        login_rsp = self._session.post(self._url + '/login', verify=False,
+                                       timeout=self._timeout,
+                                       data={'username': username,
+                                             'password': password})
+        if login_rsp.status_code != 200:
+            log.warning("login returned {}: {}".format(login_rsp.status_code,
+                                                       login_rsp.reason))
+            return False
+
+        data = login_rsp.json().get('data', {})
+        if 'sessionID' not in data:
+            log.warning("no sessionID in login response")
+            return False
+
+        # /login has just vouched for this sessionID, so there's no need to
+        # check it again
+        self._set_token({'sessionID': data['sessionID']})
+        self._userid = data.get('userID')
+        self._token_validated = True
+        self._save_token()
+        return True
+
+    def subscribe(self, listener):
+        """Register a listener for changes to AtTask objects
+
+        Listeners are how caches and local stores hear about changes made
+        elsewhere, e.g. from an EventReceiver (see pyattask.events).
+
+        Args:
+          listener (callable): called with each ObjectEvent published
+        """
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        """Remove a listener registered with subscribe()
+
+        Args:
+          listener (callable): the listener
+        """
+        self._listeners.remove(listener)
+
+    def publish(self, event):
+        """Pass an event to every listener
+
+        A listener raising an exception is logged, and doesn't stop the
+        others from hearing about the event.
+
+        Args:
+          event (ObjectEvent): the change
+        """
+        for listener in list(self._listeners):
+            try:
+                listener(event)
+            except Exception:
+                log.exception("listener {} failed on {}".format(listener,
+                                                                 event))
+
+    def auth_failed(self):
+        """Note that a request was refused as unauthenticated
+
+        Called when the API answers 401, so that the next is_authenticated()
+        actually checks, rather than trusting a sessionID or API key that was
+        validated earlier.
+        """
+
+        self._token_validated = False
+
+    def _is_token_authenticated(self):
+        """Check (at most once) that our sessionID or API key is accepted
+
+        Returns:
+          bool: True if authenticated, else False
+        """
+
+        if self._token_validated:
+            return True
+
+        session_rsp = self._transport.send('get', self._url + session_endpoint,
+                                           timeout=self._remaining())
+        if session_rsp.status_code == 401:
+            if self._refresh_token():
+                return self.is_authenticated()
+            return False
+        elif session_rsp.status_code != 200:
+            raise GetHTTPError("{} returned status code {}: {}".format(
+                pyattask.transport.scrub_url(session_rsp.url),
+                session_rsp.status_code, session_rsp.reason))
+
+        self._userid = session_rsp.json().get('data', {}).get('userID')
+        self._token_validated = True
+        log.info("Authenticated with userid: {}".format(self._userid))
+        return True
+
+    def _set_token(self, token):
+        """Attach a sessionID or apiKey credential to our requests.Session
+
+        Both go in headers, not parameters, so that they never appear in
+        request urls, which end up in logs and exceptions.
+
+        Args:
+          token (dict): {'sessionID': sessionid} or {'apiKey': apikey}, or None
+            to remove the current one
+        """
+
+        self._session.headers.pop('sessionID', None)
+        self._session.headers.pop('apiKey', None)
+        self._token = token
+        self._token_validated = False
+
+        if token is None:
+            return
+        elif 'sessionID' in token:
+            self._session.headers['sessionID'] = token['sessionID']
+        else:
+            self._session.headers['apiKey'] = token['apiKey']
 
-        TODO(davidr): implement this
+    def _save_token(self):
+        """Save our credential, and the userid it maps to, for this url"""
+
+        path = _home_path(token_filename)
+        with pyattask.locking.locked(path):
+            tokens = _read_tokens(path)
+            tokens[self._url] = dict(self._token, userID=self._userid)
+
+            def save(filename):
+                with open(filename, 'w') as tokenfile:
+                    json.dump(tokens, tokenfile)
+
+            pyattask.locking.atomic_save(path, save)
+            self._token_mtime = pyattask.locking.mtime(path)
+
+    def _refresh_token(self):
+        """Pick up a credential for this url saved by another process
+
+        Returns:
+          bool: True if a new credential was loaded, else False
         """
 
-        raise NotImplementedError("Basic Auth")
+        path = _home_path(token_filename)
+        current_mtime = pyattask.locking.mtime(path)
+        if current_mtime is None or current_mtime == self._token_mtime:
+            return False
+
+        self._token_mtime = current_mtime
+        with pyattask.locking.locked(path, exclusive=False):
+            saved = _read_tokens(path).get(self._url)
+
+        if saved is None or saved == dict(self._token or {},
+                                          userID=self._userid):
+            return False
+
+        log.debug("loaded saved credential for {}".format(self._url))
+        self._userid = saved.pop('userID', None)
+        self._set_token(saved)
+        # It was validated by whoever saved it
+        self._token_validated = True
+        return True
 
     @staticmethod
     def _check_authresponse(response):
         """Check if auth request was successful.
 
-        Examine the headers of a requests.Response object to determine if the
+        Examine the headers of a response to determine if the
         request was properly authenticated.
 
         Args:
-          response (requests.Response): http response
+          response (Response): http response
 
         Returns:
           userid (string): The AtTask userId
@@ -354,12 +1209,21 @@ class AtTaskSession(object):
           rc (bool): True if properly authenticated, else False
 
         """
+        from requests_ntlm import HttpNtlmAuth
+
+        # Every hop goes through self._session, so the connection pool (and
+        # its TLS connections to both AtTask and the IdP) is shared between
+        # hops and kept for the next login, and the auth cookie ends up in
+        # the jar we already have.
+        session = self._session
+
         log.debug("extracting saml form from: {}".format(pyattask_authrequest.text))
         pyattask_samlform = self._extract_saml_form(pyattask_authrequest.text)
 
-        sso_samlresponse = self._get_new_requestsession().post(
+        sso_samlresponse = session.post(
             pyattask_samlform['url'], data=pyattask_samlform['values'],
-            auth=HttpNtlmAuth(username, password), verify=False)
+            auth=HttpNtlmAuth(username, password), verify=False,
+            timeout=self._timeout)
 
         status_code = sso_samlresponse.status_code
         if status_code != 200:
@@ -369,14 +1233,13 @@ class AtTaskSession(object):
         log.debug("Response from samlrequest: {}".format(status_code))
 
         sso_samlform = self._extract_saml_form(sso_samlresponse.text)
-        # Create the session object we intend to return
-        session = self._get_new_requestsession()
         pyattask_samlresponse = session.post(sso_samlform['url'],
-                                           data=sso_samlform['values'],
-                                           verify=False)
+                                             data=sso_samlform['values'],
+                                             verify=False,
+                                             timeout=self._timeout)
 
-        if status_code != 200:
-            log.error("{}".format(sso_samlresponse))
+        if pyattask_samlresponse.status_code != 200:
+            log.error("{}".format(pyattask_samlresponse))
             raise AuthenticationError("Authentication Failed")
 
         try:
@@ -385,9 +1248,142 @@ class AtTaskSession(object):
             log.warning("AuthenticationError: {}".format(err))
             return False
 
-        # We have a newly-acquired session complete with auth cookie, so
-        # save it to self._session, save the cookie, and return success
+        # We have a newly-acquired auth cookie, so save it and return success
         self._userid = userid
-        self._session = session
-        self._session.cookies.save()
+        self._save_cookies()
         return True
+
+    def _save_cookies(self):
+        """Atomically write our cookies to the jar, under an exclusive lock"""
+
+        cookiejar = self._session.cookies
+        with pyattask.locking.locked(cookiejar.filename):
+            pyattask.locking.atomic_save(cookiejar.filename, cookiejar.save)
+            self._cookiejar_mtime = pyattask.locking.mtime(cookiejar.filename)
+
+    def _refresh_cookies(self):
+        """Reload the cookie jar if another process has rewritten it
+
+        Returns:
+          bool: True if the cookies were reloaded, else False
+        """
+
+        cookiejar = self._session.cookies
+        current_mtime = pyattask.locking.mtime(cookiejar.filename)
+        if current_mtime is None or current_mtime == self._cookiejar_mtime:
+            return False
+
+        log.debug("cookie jar {} changed on disk, reloading".format(
+            cookiejar.filename))
+        self._cookiejar_mtime = current_mtime
+        _load_cookiejar(cookiejar)
+        return True
+
+
+def _cookiejar_path(filename=cookiejar_filename):
+    """Return the path to the cookie jar in $HOME
+
+    Args:
+      filename (str, optional): The filename relative to $HOME
+
+    Returns:
+      str: absolute path of the cookie jar
+
+    Raises:
+      IOError
+    """
+    return _home_path(filename)
+
+
+def _home_path(filename):
+    """Return the path to filename in $HOME
+
+    Args:
+      filename (str): The filename relative to $HOME
+
+    Returns:
+      str: absolute path of filename
+
+    Raises:
+      IOError
+    """
+    homedir = os.getenv('HOME')
+    if not os.path.isdir(homedir):
+        raise IOError(2, 'No such file or directory', homedir)
+
+    return os.path.join(homedir, filename)
+
+
+def _load_cookiejar(cookiejar):
+    """Load cookiejar from its file, under a shared lock
+
+    Args:
+      cookiejar (cookielib.FileCookieJar): the jar to (re)load
+
+    Returns:
+      None
+    """
+    with pyattask.locking.locked(cookiejar.filename, exclusive=False):
+        try:
+            cookiejar.load()
+        except IOError as err:
+            # It's not actually a problem if the cookiefile isn't there. We'll
+            # create it later on when we save the cookies in the Session object
+            #
+            # If it's not a "No such file" error, we need to re-raise it.
+            if not err.strerror or not err.strerror.startswith("No such file"):
+                raise err
+
+
+def _read_tokens(path):
+    """Read the saved credentials file
+
+    Args:
+      path (str): path to the credentials file
+
+    Returns:
+      dict: {url: {'sessionID' or 'apiKey': ..., 'userID': ...}, ...}
+    """
+    try:
+        with open(path) as tokenfile:
+            return json.load(tokenfile)
+    except IOError:
+        return {}
+    except ValueError:
+        log.warning("ignoring corrupt credentials file {}".format(path))
+        return {}
+
+
+def _freeze_params(params):
+    """Return a hashable equivalent of a request parameter dict
+
+    Args:
+      params (dict): request parameters, possibly with list values
+
+    Returns:
+      tuple: sorted (name, value) pairs, list values turned into tuples
+    """
+    if not params:
+        return ()
+    return tuple(sorted(
+        (name, tuple(value) if isinstance(value, list) else value)
+        for name, value in params.iteritems()))
+
+
+
+def _strip_empty(data):
+    """Drop null and empty fields from the object(s) in an API response
+
+    Args:
+      data (dict or list): the 'data' member of an API response
+
+    Returns:
+      dict or list: data, minus the empty fields
+    """
+    if isinstance(data, list):
+        return [_strip_empty(item) for item in data]
+    elif isinstance(data, dict):
+        return dict((key, value) for key, value in data.iteritems()
+                    if value is not None and value != '' and
+                    value != [] and value != {})
+    return data
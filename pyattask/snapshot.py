@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""Binary snapshots of object sets
+
+A snapshot stores a set of objects of one class column by column, laid out
+by the class's fields, with every distinct value stored once in a value
+table. Loading a snapshot memory-maps the file and reads nothing else up
+front: objects (and column values) are decoded only when accessed, so even
+a snapshot of millions of objects opens in milliseconds.
+
+File layout (all integers little-endian)::
+
+    magic        8 bytes, "PATSNAP1"
+    header size  uint32
+    header       JSON: objCode, fields, fieldtypes, count, values, and the
+                 offsets of the sections below
+    columns      for each field, count uint32 value numbers; 0 = no value
+    offsets      values + 1 uint64 offsets into the blob; value n runs
+                 from offsets[n - 1] to offsets[n]
+    blob         the JSON encoding of each distinct value, concatenated
+"""
+
+from array import array
+import json
+import mmap
+import struct
+import sys
+
+import pyattask.locking
+from pyattask.objects import AtTaskObject
+
+import logging
+log = logging.getLogger(__name__)
+
+
+MAGIC = 'PATSNAP1'
+
+# Most values are strings, and this is much quicker than json.dumps for them
+_encode_string = json.encoder.encode_basestring_ascii
+
+_UINT32 = struct.Struct('<I')
+_UINT64 = struct.Struct('<Q')
+
+
+def _little_endian(values):
+    """Return the bytes of an array('I') as little-endian uint32s"""
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tostring()
+
+
+def save_snapshot(path, objs, objclass=None, fields=None):
+    """Write objs to a snapshot file
+
+    Args:
+      path (str): the file to write
+      objs (iterable): AtTaskObjects, all of one class
+      objclass (type, optional): their class. Defaults to the class of the
+        first object
+      fields (list, optional): API field names to store. Defaults to
+        objclass.objattrs()
+
+    Returns:
+      int: the number of objects written
+    """
+    objs = iter(objs)
+    first = None
+    if objclass is None:
+        first = next(objs, None)
+        if first is None:
+            raise ValueError("can't tell the class of an empty snapshot")
+        objclass = type(first)
+
+    fields = list(fields or objclass.objattrs())
+    keys = [AtTaskObject._attr_name(field) for field in fields]
+    columns = [array('I') for _ in fields]
+    numbers = {}
+    blob = []
+    ends = [0]
+
+    def number(value):
+        # Look values up by type as well, so that 1, 1.0 and True stay
+        # distinct. Only unhashable values need encoding just to look up.
+        try:
+            key = (type(value), value)
+            hash(key)
+        except TypeError:
+            key = json.dumps(value, sort_keys=True)
+        try:
+            return numbers[key]
+        except KeyError:
+            if isinstance(value, basestring):
+                encoded = _encode_string(value)
+            else:
+                encoded = json.dumps(value, separators=(',', ':'))
+            blob.append(encoded)
+            ends.append(ends[-1] + len(encoded))
+            numbers[key] = len(ends) - 1
+            return numbers[key]
+
+    count = 0
+    for obj in _chain(first, objs):
+        attrs = obj._attrs
+        for key, column in zip(keys, columns):
+            column.append(number(attrs[key]) if key in attrs else 0)
+        count += 1
+
+    columns_offset = 0
+    offsets_offset = columns_offset + 4 * count * len(fields)
+    blob_offset = offsets_offset + 8 * len(ends)
+    header = json.dumps({
+        'objCode': objclass.objcode(),
+        'fields': fields,
+        'fieldtypes': dict((field, fieldtype) for field, fieldtype
+                           in objclass.fieldtypes().items()
+                           if field in fields),
+        'count': count,
+        'values': len(ends) - 1,
+        'columns': columns_offset,
+        'offsets': offsets_offset,
+        'blob': blob_offset,
+    })
+
+    def save(filename):
+        with open(filename, 'wb') as snapfile:
+            snapfile.write(MAGIC)
+            snapfile.write(_UINT32.pack(len(header)))
+            snapfile.write(header)
+            for column in columns:
+                snapfile.write(_little_endian(column))
+            snapfile.write(struct.pack('<{}Q'.format(len(ends)), *ends))
+            for encoded in blob:
+                snapfile.write(encoded)
+
+    pyattask.locking.atomic_save(path, save, mode=0o644)
+    log.info("saved {} {} objects ({} distinct values) to {}".format(
+        count, objclass.__name__, len(ends) - 1, path))
+    return count
+
+
+def _chain(first, rest):
+    """Yield first (unless None), then everything in rest"""
+    if first is not None:
+        yield first
+    for item in rest:
+        yield item
+
+
+class Snapshot(object):
+    """A memory-mapped snapshot, behaving as a read-only sequence of objects
+
+    Objects are built on access; each distinct value is decoded once and
+    then shared by every object holding it.
+    """
+
+    def __init__(self, path, objclass=None):
+        """Open a snapshot file
+
+        Nothing is fetched from the API: without objclass, the class is one
+        this package has (or has generated), else one generated from the
+        fields recorded in the snapshot.
+
+        Args:
+          path (str): the file written by save_snapshot()
+          objclass (type, optional): the class the objects should be
+
+        Raises:
+          ValueError: the file is not a snapshot, or is not of objclass
+        """
+        with open(path, 'rb') as snapfile:
+            self._map = mmap.mmap(snapfile.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+
+        if self._map[:len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError("{} is not a snapshot".format(path))
+
+        header_size, = _UINT32.unpack_from(self._map, len(MAGIC))
+        header_start = len(MAGIC) + _UINT32.size
+        header = json.loads(self._map[header_start:header_start +
+                                      header_size])
+        base = header_start + header_size
+
+        if objclass is None:
+            import pyattask.schema
+            objclass = pyattask.schema.get_class(header['objCode'], schema={
+                'fields': header['fields'],
+                'fieldtypes': header.get('fieldtypes', {})})
+        elif objclass.objcode() != header['objCode']:
+            self._map.close()
+            raise ValueError("{} holds {} objects, not {}".format(
+                path, header['objCode'], objclass.objcode()))
+
+        self._path = path
+        self._fields = header['fields']
+        self._keys = [AtTaskObject._attr_name(field)
+                      for field in self._fields]
+        self._count = header['count']
+        self._columns = base + header['columns']
+        self._offsets = base + header['offsets']
+        self._blob = base + header['blob']
+        self._values = {0: None}
+        self._objclass = objclass
+
+    def __repr__(self):
+        return "<Snapshot {}: {} {} objects>".format(
+            self._path, self._count, self._objclass.__name__)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+
+        attrs = {}
+        for column, key in enumerate(self._keys):
+            number = self._number(column, index)
+            if number:
+                attrs[key] = self._value(number)
+        return self._objclass(attrs=attrs)
+
+    def __iter__(self):
+        for index in xrange(self._count):
+            yield self[index]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def objclass(self):
+        """Return the class of the objects in the snapshot
+
+        Returns:
+          type: AtTaskObject subclass
+        """
+        return self._objclass
+
+    @property
+    def fields(self):
+        """Return the API field names stored in the snapshot
+
+        Returns:
+          list: field names
+        """
+        return self._fields
+
+    def column(self, field):
+        """Iterate over one field's values, without building objects
+
+        Args:
+          field (str): the API field name
+
+        Yields:
+          each object's value for field, or None
+        """
+        column = self._fields.index(field)
+        for index in xrange(self._count):
+            yield self._value(self._number(column, index))
+
+    def close(self):
+        """Unmap the file"""
+        self._map.close()
+
+    def _number(self, column, index):
+        """Return the value number stored for an object and field"""
+        return _UINT32.unpack_from(
+            self._map, self._columns + 4 * (column * self._count + index))[0]
+
+    def _value(self, number):
+        """Return (decoding the first time) value number"""
+        try:
+            return self._values[number]
+        except KeyError:
+            start, = _UINT64.unpack_from(self._map,
+                                         self._offsets + 8 * (number - 1))
+            end, = _UINT64.unpack_from(self._map, self._offsets + 8 * number)
+            value = json.loads(self._map[self._blob + start:self._blob + end])
+            return self._values.setdefault(number, value)
+
+
+def load_snapshot(path, objclass=None):
+    """Open a snapshot written by save_snapshot()
+
+    Args:
+      path (str): the snapshot file
+      objclass (type, optional): the class the objects should be. Defaults
+        to the class for the snapshot's objCode
+
+    Returns:
+      Snapshot
+
+    Raises:
+      ValueError: the snapshot is not of objclass
+    """
+    return Snapshot(path, objclass)
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""Sharded, multi-process sync of a whole tenant
+
+Decoding search results is CPU-bound, so past a point more network
+concurrency doesn't help a single process. A sharded sync splits the objects
+into shards by projectID (or by ID, for classes without one), plus a shard
+for the objects without a project, and syncs the shards in a pool of
+processes. Each worker has its own session, created from the parent's
+settings, which picks up the cookie or sessionID the parent saved rather
+than logging in again. Workers write their shards to part files,
+which the parent appends to the output, in shard order, as they finish.
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from pyattask.export import WRITERS
+import pyattask.project
+import pyattask.session
+
+import logging
+log = logging.getLogger(__name__)
+
+
+def shard_field(objclass):
+    """Return the field to shard objclass on
+
+    Args:
+      objclass (type): the AtTaskObject subclass being synced
+
+    Returns:
+      str: "projectID" if objclass has one, else "ID"
+    """
+    if 'projectID' in objclass.objattrs(discovered=True):
+        return 'projectID'
+    return 'ID'
+
+
+def shard_values(objclass, shard_size):
+    """Split the values of objclass's shard field into shards
+
+    Args:
+      objclass (type): the AtTaskObject subclass being synced
+      shard_size (int): values per shard. This ends up as an __in condition
+        in the query string, so it shouldn't be too large
+
+    Returns:
+      list: lists of IDs. When sharding on projectID, the last shard is
+        None, standing for the objects that aren't on a project
+    """
+    by_project = shard_field(objclass) == 'projectID'
+    if by_project:
+        source = pyattask.project.Project
+    else:
+        source = objclass
+
+    # Pages are only consistent with each other if the order is fixed
+    query = source.query().order_by('ID').fields('ID')
+    ids = [result['ID'] for page in source._search_pages(query)
+           for result in page]
+    shards = [ids[start:start + shard_size]
+              for start in range(0, len(ids), shard_size)]
+    if by_project:
+        shards.append(None)
+    return shards
+
+
+def _init_worker(settings):
+    """Pool initializer: create this process's session"""
+    pyattask.session.create_session(**settings)
+
+
+def _sync_shard(args):
+    """Sync one shard to a part file
+
+    Args:
+      args (tuple): (objclass, field, values, fields, fmt, part_path).
+        values None selects the objects whose field is null
+
+    Returns:
+      (str, int): the part file, and the number of objects written to it
+    """
+    objclass, field, values, fields, fmt, part_path = args
+    if values is None:
+        condition = {field + '__isnull': True}
+    else:
+        condition = {field + '__in': values}
+    query = objclass.query().where(**condition).order_by('ID').fields(*fields)
+
+    written = 0
+    with open(part_path, 'wb') as part:
+        writer = WRITERS[fmt](part, fields)
+        for page in objclass._search_pages(query):
+            for result in page:
+                writer.write(result)
+            written += len(page)
+    return part_path, written
+
+
+def sharded_sync(objclass, output, fields=None, fmt='ndjson', processes=None,
+                 shard_size=50):
+    """Sync every objclass object to output, using a pool of processes
+
+    Args:
+      objclass (type): the AtTaskObject subclass to sync
+      output (str): the file to write
+      fields (list, optional): fields to fetch. Defaults to objattrs()
+      fmt (str, optional): 'ndjson' or 'csv'. Defaults to 'ndjson'
+      processes (int, optional): worker processes. Defaults to the number of
+        cores
+      shard_size (int, optional): projects (or IDs) per shard
+
+    Returns:
+      int: the number of objects written
+    """
+    fields = list(fields or objclass.objattrs())
+    field = shard_field(objclass)
+    shards = shard_values(objclass, shard_size)
+    log.info("syncing {} by {} in {} shards".format(objclass.__name__, field,
+                                                   len(shards)))
+
+    settings = pyattask.session.get_session().settings
+    partdir = tempfile.mkdtemp(prefix='pyattask-sync.',
+                               dir=os.path.dirname(os.path.abspath(output)))
+    tasks = [(objclass, field, values, fields, fmt,
+              os.path.join(partdir, '{:06d}'.format(index)))
+             for index, values in enumerate(shards)]
+
+    written = 0
+    pool = multiprocessing.Pool(processes, _init_worker, (settings,))
+    try:
+        with open(output, 'wb') as out:
+            WRITERS[fmt](out, fields).header()
+            for part_path, count in pool.imap(_sync_shard, tasks):
+                with open(part_path, 'rb') as part:
+                    shutil.copyfileobj(part, out)
+                os.unlink(part_path)
+                written += count
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        shutil.rmtree(partdir, ignore_errors=True)
+
+    log.info("synced {} {} objects to {}".format(written, objclass.__name__,
+                                                 output))
+    return written
@@ -21,6 +21,7 @@
 """
 
 import pyattask.objects
+from pyattask.fields import DATE, NUMBER
 
 import logging
 log = logging.getLogger(__name__)
@@ -35,7 +36,22 @@ class Task(pyattask.objects.AtTaskObject):
                      "plannedCompletionDate", "plannedStartDate", "priority",
                      "progressStatus", "projectedCompletionDate",
                      "projectedStartDate", "status", "taskNumber", "wbs",
-                     "workRequired"]
+                     "workRequired", "entryDate", "lastUpdateDate",
+                     "projectID", "parentID", "assignedToID"]
+    _api_internfields = ("objCode", "status", "progressStatus", "priority",
+                         "projectID", "parentID", "assignedToID")
+    _api_fieldtypes = {
+        "entryDate": DATE,
+        "lastUpdateDate": DATE,
+        "percentComplete": NUMBER,
+        "plannedCompletionDate": DATE,
+        "plannedStartDate": DATE,
+        "priority": NUMBER,
+        "projectedCompletionDate": DATE,
+        "projectedStartDate": DATE,
+        "taskNumber": NUMBER,
+        "workRequired": NUMBER,
+    }
 
     def __init__(self, **kwargs):
         self._attrs = kwargs['attrs']
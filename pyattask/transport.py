@@ -0,0 +1,451 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""Transports: how an AtTaskSession's API requests reach the server
+
+API requests and authentication probes go through the session's
+transport. By default that's RequestsTransport, which sends them with the
+session's requests.Session. A RecordingTransport wraps another transport
+and writes every request/response pair to a file, with credentials
+scrubbed. A ReplayTransport serves a recording back, optionally with the
+recorded (or a simulated) latency.
+
+Together they let decoding, pagination and caching be benchmarked and
+profiled offline and repeatably:
+
+    session = pyattask.session.get_session()
+    session.set_transport(RecordingTransport(session.transport, 'tasks.rec'))
+    ... run the workload against the live tenant ...
+
+    session.set_transport(ReplayTransport('tasks.rec', latency='recorded'))
+    ... run it again, as often as needed, without a tenant ...
+
+Logging in isn't recorded, as that would capture passwords, so replay
+sessions skip it. They need the same kind of credentials (a cookie, a
+sessionID or an API key) as the recording, because each checks its
+authentication against a different endpoint.
+"""
+
+import base64
+from collections import deque
+import json
+import threading
+import time
+import zlib
+
+from pyattask.exceptions import ReplayMissError, RequestTimeout
+
+import logging
+log = logging.getLogger(__name__)
+
+
+# Request parameters, form fields and headers never written to recordings
+SECRET_NAMES = frozenset(('apikey', 'password', 'username', 'sessionid',
+                          'samlresponse', 'samlrequest', 'authorization',
+                          'cookie', 'set-cookie'))
+
+SCRUBBED = 'SCRUBBED'
+
+
+def decompress(body, encoding):
+    """Undo a response's Content-Encoding
+
+    Args:
+      body (str): the body as transferred
+      encoding (str): the Content-Encoding header, or None
+
+    Returns:
+      str: the decompressed body
+    """
+    if not encoding or not body:
+        return body
+
+    encoding = encoding.lower()
+    if encoding == 'gzip':
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    elif encoding == 'deflate':
+        # "deflate" is supposed to be zlib-wrapped, but plenty of servers
+        # send a raw deflate stream
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+
+    log.warning("unknown content-encoding {}".format(encoding))
+    return body
+
+
+class Headers(dict):
+    """Response headers, looked up regardless of case"""
+
+    def __init__(self, headers=()):
+        super(Headers, self).__init__(
+            (name.lower(), value) for name, value in dict(headers).items())
+
+    def __contains__(self, name):
+        return super(Headers, self).__contains__(name.lower())
+
+    def __getitem__(self, name):
+        return super(Headers, self).__getitem__(name.lower())
+
+    def get(self, name, default=None):
+        return super(Headers, self).get(name.lower(), default)
+
+
+class Response(object):
+    """An HTTP response, as returned by a transport"""
+
+    def __init__(self, url, status_code, reason, headers, body, elapsed=0.0):
+        """Initialize the Response object
+
+        Args:
+          url (str): the url requested, with its query string
+          status_code (int): the HTTP status
+          reason (str): the HTTP reason phrase
+          headers (dict): the response headers
+          body (str): the body as transferred, i.e. still compressed if it
+            has a Content-Encoding
+          elapsed (float, optional): seconds the request took
+        """
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = Headers(headers)
+        self.body = body
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return "<Response [{}] {}>".format(self.status_code,
+                                           scrub_url(self.url))
+
+    @property
+    def encoding(self):
+        """Return the Content-Encoding of the body
+
+        Returns:
+          str: the encoding, or None
+        """
+        return self.headers.get('content-encoding')
+
+    @property
+    def content(self):
+        """Return the decompressed body
+
+        Returns:
+          str: the body
+        """
+        return decompress(self.body, self.encoding)
+
+    def json(self):
+        """Return the body decoded from JSON
+
+        Returns:
+          json: the decoded body
+
+        Raises:
+          ValueError: the body isn't JSON
+        """
+        return json.loads(self.content)
+
+
+class RequestsTransport(object):
+    """Sends requests with a requests.Session"""
+
+    def __init__(self, session):
+        """Initialize the RequestsTransport object
+
+        Args:
+          session (requests.Session): carries the cookies, headers and
+            parameters that authenticate requests
+        """
+        self._session = session
+
+    def __repr__(self):
+        return "<RequestsTransport>"
+
+    def send(self, method, url, params=None, data=None, timeout=None):
+        """Perform a request
+
+        Args:
+          method (str): get, post, put, delete
+          url (str): the request url
+          params (dict, optional): request parameters
+          data (dict, optional): form-encoded request body
+          timeout (float, optional): seconds to wait to connect, and for
+            each part of the response
+
+        Returns:
+          Response
+
+        Raises:
+          RequestTimeout
+        """
+        import requests
+
+        started = time.time()
+        try:
+            response = self._session.request(method, url, params=params,
+                                             data=data, verify=False,
+                                             stream=True, timeout=timeout)
+            try:
+                # Read undecoded, so that callers can see what actually
+                # crossed the wire
+                body = response.raw.read(decode_content=False)
+            finally:
+                response.close()
+        except (requests.exceptions.Timeout,
+                requests.packages.urllib3.exceptions.ReadTimeoutError) as err:
+            raise RequestTimeout("{} {} timed out after {}s: {}".format(
+                method.upper(), url, timeout, err))
+
+        return Response(response.url, response.status_code, response.reason,
+                        response.headers, body, time.time() - started)
+
+
+def _scrub_pairs(pairs):
+    """Return name/value pairs with the values of secrets replaced"""
+    return [(name, SCRUBBED if name.lower() in SECRET_NAMES else value)
+            for name, value in pairs]
+
+
+def _scrub_dict(values):
+    if not values:
+        return {}
+    return dict(_scrub_pairs(values.items()))
+
+
+def _scrub_json(value):
+    """Return decoded JSON with the values of secret keys replaced
+
+    Returns:
+      (json, bool): the scrubbed value, and whether anything was replaced
+    """
+    if isinstance(value, dict):
+        scrubbed, changed = {}, False
+        for key, item in value.iteritems():
+            if key.lower() in SECRET_NAMES:
+                scrubbed[key], changed = SCRUBBED, True
+            else:
+                scrubbed[key], item_changed = _scrub_json(item)
+                changed = changed or item_changed
+        return scrubbed, changed
+    elif isinstance(value, list):
+        items = [_scrub_json(item) for item in value]
+        return ([item for item, _ in items],
+                any(changed for _, changed in items))
+    return value, False
+
+
+def _compress(body, encoding):
+    """Apply a Content-Encoding to body, the reverse of decompress()"""
+    if not encoding:
+        return body
+    encoding = encoding.lower()
+    if encoding == 'gzip':
+        gzip = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return gzip.compress(body) + gzip.flush()
+    elif encoding == 'deflate':
+        return zlib.compress(body)
+    return body
+
+
+def _scrub_body(response):
+    """Return the body of response, with secrets in JSON replaced
+
+    The /session response and login responses carry the sessionID in
+    their bodies. Bodies with nothing to scrub are kept byte for byte, and
+    scrubbed ones are re-encoded as they came, so transfer sizes still
+    replay (near enough) as recorded.
+    """
+    try:
+        decoded = response.json()
+    except ValueError:
+        return response.body
+    scrubbed, changed = _scrub_json(decoded)
+    if not changed:
+        return response.body
+    return _compress(json.dumps(scrubbed), response.encoding)
+
+
+def scrub_url(url):
+    """Return url with the values of secret query parameters replaced
+
+    For recordings, and for urls going into logs and exceptions.
+
+    Args:
+      url (str): the url
+
+    Returns:
+      str: the url, without credentials
+    """
+    # urllib loads ssl, which importing pyattask mustn't (see
+    # benchmarks/import_time.py)
+    import urllib
+    import urlparse
+
+    parts = urlparse.urlsplit(url)
+    if not parts.query:
+        return url
+    query = urllib.urlencode(_scrub_pairs(urlparse.parse_qsl(
+        parts.query, keep_blank_values=True)))
+    return urlparse.urlunsplit(parts._replace(query=query))
+
+
+def _request_key(method, url, params, data):
+    """Return how a request is matched against a recording
+
+    Everything is scrubbed first, so a replay matches whatever credentials
+    the recording was made with.
+    """
+    def freeze(values):
+        return json.dumps(_scrub_dict(values), sort_keys=True)
+    return (method.lower(), scrub_url(url), freeze(params), freeze(data))
+
+
+class RecordingTransport(object):
+    """Writes the requests sent through another transport to a file
+
+    The recording holds one JSON object per line. Credentials are scrubbed
+    from urls, parameters, form fields, headers and JSON response bodies
+    before anything is written.
+    """
+
+    def __init__(self, transport, path, mode='a'):
+        """Initialize the RecordingTransport object
+
+        Args:
+          transport: the transport to record, e.g. session.transport
+          path (str): the file to write the recording to
+          mode (str, optional): 'a' to add to an existing recording, 'w' to
+            start afresh. Defaults to 'a'
+        """
+        self._transport = transport
+        self._path = path
+        self._lock = threading.Lock()
+        self._file = open(path, mode)
+
+    def __repr__(self):
+        return "<RecordingTransport {} to {}>".format(self._transport,
+                                                      self._path)
+
+    def send(self, method, url, params=None, data=None, timeout=None):
+        """Perform a request through the wrapped transport, and record it
+
+        See RequestsTransport.send().
+        """
+        response = self._transport.send(method, url, params, data, timeout)
+        headers = dict((name, value) for name, value
+                       in _scrub_pairs(response.headers.items())
+                       if value != SCRUBBED)
+        record = {
+            'method': method.lower(),
+            'url': scrub_url(url),
+            'params': _scrub_dict(params),
+            'data': _scrub_dict(data),
+            'response_url': scrub_url(response.url),
+            'status_code': response.status_code,
+            'reason': response.reason,
+            'headers': headers,
+            'body': base64.b64encode(_scrub_body(response)),
+            'elapsed': response.elapsed,
+        }
+        line = json.dumps(record, sort_keys=True) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+        return response
+
+    def close(self):
+        """Close the recording"""
+        with self._lock:
+            self._file.close()
+
+
+class ReplayTransport(object):
+    """Serves the responses in a recording instead of going to the server
+
+    Requests are matched on method, url, parameters and form fields. When
+    the same request was recorded more than once, the responses are served
+    in the order they were recorded, the last one repeating.
+    """
+
+    def __init__(self, path, latency=None):
+        """Initialize the ReplayTransport object
+
+        Args:
+          path (str): a recording written by RecordingTransport
+          latency (optional): None to respond at once, 'recorded' to take as
+            long as the recorded request did, or seconds to take for every
+            request
+        """
+        self._path = path
+        self._latency = latency
+        self._lock = threading.Lock()
+        self._responses = {}
+        with open(path) as recording:
+            for line in recording:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                key = _request_key(record['method'], record['url'],
+                                   record['params'], record['data'])
+                self._responses.setdefault(key, deque()).append(record)
+        log.debug("loaded {} requests from {}".format(len(self._responses),
+                                                      path))
+
+    def __repr__(self):
+        return "<ReplayTransport {}>".format(self._path)
+
+    def _next_record(self, key):
+        with self._lock:
+            records = self._responses.get(key)
+            if not records:
+                return None
+            if len(records) > 1:
+                return records.popleft()
+            return records[0]
+
+    def send(self, method, url, params=None, data=None, timeout=None):
+        """Serve the recorded response to a request
+
+        See RequestsTransport.send().
+
+        Raises:
+          ReplayMissError: the request isn't in the recording
+          RequestTimeout: the latency to simulate is longer than timeout
+        """
+        record = self._next_record(_request_key(method, url, params, data))
+        if record is None:
+            raise ReplayMissError("{} {} {} not recorded in {}".format(
+                method.upper(), url, params, self._path))
+
+        if self._latency == 'recorded':
+            delay = record['elapsed']
+        else:
+            delay = self._latency or 0
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise RequestTimeout("{} {} timed out after {}s".format(
+                method.upper(), url, timeout))
+        if delay:
+            time.sleep(delay)
+
+        return Response(record['response_url'], record['status_code'],
+                        record['reason'], record['headers'],
+                        base64.b64decode(record['body']), delay)
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+"""Whole-project trees
+
+A ProjectTree holds a project together with all of its tasks and issues,
+indexed for constant-time lookup by ID, wbs, task number, parent and status.
+"""
+
+from collections import defaultdict
+
+from pyattask.concurrency import thread_pool
+import pyattask.issue
+import pyattask.task
+
+import logging
+log = logging.getLogger(__name__)
+
+
+# Task fields the indexes are built on, always fetched
+TASK_INDEX_FIELDS = ("ID", "wbs", "taskNumber", "parentID", "status")
+ISSUE_INDEX_FIELDS = ("ID", "status")
+
+
+def _with_fields(fields, required):
+    """Return fields (a list of field names) plus any of required it lacks"""
+    fields = list(fields)
+    return fields + [field for field in required if field not in fields]
+
+
+class ProjectTree(object):
+    """A project, its tasks and its issues, with in-memory indexes"""
+
+    def __init__(self, project, tasks, issues):
+        """Initialize the ProjectTree object
+
+        Args:
+          project (Project): the project
+          tasks (list): the project's Tasks
+          issues (list): the project's Issues
+        """
+        self._project = project
+        self._tasks = tasks
+        self._issues = issues
+
+        self._tasks_by_id = {}
+        self._tasks_by_wbs = {}
+        self._tasks_by_number = {}
+        self._children = defaultdict(list)
+        self._tasks_by_status = defaultdict(list)
+        # Fields can be missing: null ones are dropped by strip_empty, and
+        # others may not have been fetched. Top-level tasks, whose parentID
+        # is null, go under the None bucket of _children.
+        for task in tasks:
+            attrs = task._attrs
+            self._tasks_by_id[attrs['id']] = task
+            if attrs.get('wbs') is not None:
+                self._tasks_by_wbs[attrs['wbs']] = task
+            if attrs.get('tasknumber') is not None:
+                self._tasks_by_number[attrs['tasknumber']] = task
+            self._children[attrs.get('parentid')].append(task)
+            self._tasks_by_status[attrs.get('status')].append(task)
+
+        self._issues_by_id = {}
+        self._issues_by_status = defaultdict(list)
+        for issue in issues:
+            attrs = issue._attrs
+            self._issues_by_id[attrs['id']] = issue
+            self._issues_by_status[attrs.get('status')].append(issue)
+
+    def __repr__(self):
+        return "<ProjectTree {!r}: {} tasks, {} issues>".format(
+            self._project, len(self._tasks), len(self._issues))
+
+    @property
+    def project(self):
+        """Return the project
+
+        Returns:
+          Project
+        """
+        return self._project
+
+    @property
+    def tasks(self):
+        """Return all of the project's tasks
+
+        Returns:
+          list: Tasks
+        """
+        return self._tasks
+
+    @property
+    def issues(self):
+        """Return all of the project's issues
+
+        Returns:
+          list: Issues
+        """
+        return self._issues
+
+    def task(self, id_):
+        """Return the task with the given ID
+
+        Raises:
+          KeyError
+        """
+        return self._tasks_by_id[id_]
+
+    def task_by_wbs(self, wbs):
+        """Return the task with the given work breakdown structure number
+
+        Raises:
+          KeyError
+        """
+        return self._tasks_by_wbs[wbs]
+
+    def task_by_number(self, number):
+        """Return the task with the given taskNumber
+
+        Raises:
+          KeyError
+        """
+        return self._tasks_by_number[number]
+
+    def issue(self, id_):
+        """Return the issue with the given ID
+
+        Raises:
+          KeyError
+        """
+        return self._issues_by_id[id_]
+
+    def roots(self):
+        """Return the top-level tasks
+
+        Returns:
+          list: Tasks without a parent
+        """
+        return self._children.get(None, [])
+
+    def children(self, task):
+        """Return the immediate subtasks of a task
+
+        Args:
+          task (Task or str): the task, or its ID
+
+        Returns:
+          list: Tasks
+        """
+        if not isinstance(task, basestring):
+            task = task['id']
+        return self._children.get(task, [])
+
+    def parent(self, task):
+        """Return the parent of a task
+
+        Args:
+          task (Task or str): the task, or its ID
+
+        Returns:
+          Task: the parent, or None for a top-level task
+        """
+        if isinstance(task, basestring):
+            task = self.task(task)
+        parent_id = task._attrs.get('parentid')
+        if parent_id is None:
+            return None
+        return self._tasks_by_id.get(parent_id)
+
+    def tasks_with_status(self, status):
+        """Return the tasks with the given status
+
+        Returns:
+          list: Tasks
+        """
+        return self._tasks_by_status.get(status, [])
+
+    def issues_with_status(self, status):
+        """Return the issues with the given status
+
+        Returns:
+          list: Issues
+        """
+        return self._issues_by_status.get(status, [])
+
+
+def load_tree(project_class, id_, fields=None, task_fields=None,
+              issue_fields=None, concurrency=4):
+    """Fetch a project with all of its tasks and issues
+
+    The project, its tasks and its issues are fetched at the same time, each
+    search with as few (full-size) pages as possible, those pages fetched
+    concurrently too.
+
+    Args:
+      project_class (type): the Project class
+      id_ (str): the project ID
+      fields (list, optional): project fields to fetch. Defaults to all
+      task_fields (list, optional): task fields to fetch. Defaults to all
+      issue_fields (list, optional): issue fields to fetch. Defaults to all
+      concurrency (int, optional): maximum requests in flight per search
+
+    Returns:
+      ProjectTree
+    """
+    task_class = pyattask.task.Task
+    issue_class = pyattask.issue.Issue
+
+    project_params = {'fields': ','.join(fields or project_class.objattrs())}
+    task_params = {'fields': ','.join(_with_fields(
+        task_fields or task_class.objattrs(), TASK_INDEX_FIELDS))}
+    issue_params = {'fields': ','.join(_with_fields(
+        issue_fields or issue_class.objattrs(), ISSUE_INDEX_FIELDS))}
+    searchfields = {'projectID': id_}
+
+    with thread_pool(3) as pool:
+        project = pool.apply_async(project_class.get, (id_,),
+                                   {'params': project_params})
+        tasks = pool.apply_async(task_class.search_all,
+                                 (searchfields, task_params, concurrency))
+        issues = pool.apply_async(issue_class.search_all,
+                                  (searchfields, issue_params, concurrency))
+        tree = ProjectTree(project.get(), tasks.get(), issues.get())
+
+    log.info("loaded {!r}".format(tree))
+    return tree
@@ -21,6 +21,7 @@
 """
 
 import pyattask.objects
+from pyattask.fields import DATE
 import pyattask.session
 
 from pyattask.decorators import authenticated
@@ -35,7 +36,14 @@ class User(pyattask.objects.AtTaskObject):
     _api_endpoint = "user"
     _api_objcode = "USER"
     _api_objattrs = ["ID", "name", "objCode", "homeGroupID", "homeTeamID",
-                     "username"]
+                     "username", "entryDate", "lastUpdateDate"]
+    # Changes rarely, and is looked up over and over
+    _api_cache_ttl = 300
+    _api_internfields = ("objCode", "homeGroupID", "homeTeamID")
+    _api_fieldtypes = {
+        "entryDate": DATE,
+        "lastUpdateDate": DATE,
+    }
 
     def __init__(self, **kwargs):
         self._attrs = kwargs['attrs']
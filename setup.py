@@ -20,21 +20,26 @@
 import os
 from setuptools import setup
 
-import attask
+import pyattask
 
 def read(fname):
     return open(os.path.join(os.path.dirname(__file__), fname)).read()
 
 setup(
     name = "pyattask",
-    version = attask.__version__,
+    version = pyattask.__version__,
     author = "David Ressman",
     author_email = "davidr@ressman.org",
     description = ("Python bindings for the AtTask API"),
     license = "GPLv2",
     keywords = "attask api bindings",
-    packages=['attask'],
-    long_description=read('README.md'),
+    packages=['pyattask'],
+    long_description=read('README'),
+    entry_points={
+        'console_scripts': [
+            'pyattask = pyattask.cli:main',
+        ],
+    },
     classifiers=[
         "Development Status :: 3 - Alpha",
         "Topic :: Utilities",
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+
+"""Helpers for tests that run against recorded API traffic
+
+A Recording is written the way RecordingTransport would have written it, one
+exchange at a time, and served back by a ReplayTransport. Any request the
+code under test makes that isn't in the recording raises ReplayMissError, so
+the recording doubles as a check on the requests made.
+"""
+
+import base64
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import pyattask.session
+from pyattask.transport import ReplayTransport
+
+URL = 'https://example.attask-ondemand.com/attask/api/v4.0'
+
+# The url the session probes to check it's authenticated
+AUTH_URL = 'https://example.attask-ondemand.com/'
+
+USERID = '4c78a0c1000001e1f2c5b9c6e1b9b4a7'
+
+
+class Recording(object):
+    """API exchanges, to be replayed"""
+
+    def __init__(self):
+        self._records = []
+        self.add('get', AUTH_URL, headers={'UserID': USERID}, body='')
+
+    def add(self, method, url, params=None, data=None, body=None,
+            status_code=200, headers=None, response_url=None):
+        """Record one request and its response
+
+        Args:
+          method (str): get, post, put, delete
+          url (str): the request url, or an endpoint below URL, e.g.
+            "task/search"
+          params (dict, optional): request parameters, as sent
+          data (dict, optional): form fields, as sent
+          body (optional): the response body; anything but a str is encoded
+            as JSON
+          status_code (int, optional): the response status
+          headers (dict, optional): response headers
+          response_url (str, optional): the url the response came from.
+            Defaults to url
+        """
+        if '://' not in url:
+            url = URL + '/' + url
+        if not isinstance(body, str):
+            body = json.dumps(body)
+        self._records.append({
+            'method': method,
+            'url': url,
+            'params': params,
+            'data': data,
+            'response_url': response_url or url,
+            'status_code': status_code,
+            'reason': 'OK' if status_code == 200 else 'Error',
+            'headers': headers or {},
+            'body': base64.b64encode(body),
+            'elapsed': 0.0,
+        })
+        return self
+
+    def search(self, endpoint, params, data):
+        """Record a search returning data"""
+        return self.add('get', endpoint + '/search', params,
+                        body={'data': data})
+
+    def write(self, method, endpoint, records, data=None, status_code=200):
+        """Record a create (post) or update (put) of records, returning data
+
+        A single record is recorded as _write() sends it: to the object's
+        own url, when updating.
+        """
+        updates = records
+        if len(records) == 1:
+            updates = dict(records[0])
+            if method == 'put':
+                endpoint += '/' + updates.pop('ID')
+        return self.add(method, endpoint, {},
+                        {'updates': json.dumps(updates)}, {'data': data},
+                        status_code)
+
+    def save(self, path):
+        """Write the recording to path"""
+        with open(path, 'w') as recording:
+            for record in self._records:
+                recording.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+class ReplayTestCase(unittest.TestCase):
+    """Runs each test with a session of its own, in an empty HOME"""
+
+    # Keyword arguments for create_session()
+    session_settings = {}
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.home)
+        self.addCleanup(os.environ.__setitem__, 'HOME', os.environ['HOME'])
+        os.environ['HOME'] = self.home
+
+        pyattask.session.create_session(URL, **self.session_settings)
+        self.session = pyattask.session.get_session()
+        self.addCleanup(setattr, pyattask.session, '_CURRENT_SESSION', None)
+
+    def replay(self, recording, latency=None):
+        """Serve the session's requests from recording
+
+        Args:
+          recording (Recording): the exchanges to serve
+          latency (float, optional): seconds each response takes
+        """
+        path = os.path.join(self.home, 'test.rec')
+        recording.save(path)
+        self.session.set_transport(ReplayTransport(path, latency))
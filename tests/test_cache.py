@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyattask.cache import MemoryCache, SQLiteCache
+
+
+class MemoryCacheTest(unittest.TestCase):
+
+    def test_least_recently_used_go_first(self):
+        cache = MemoryCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')),
+                         (1, None, 3))
+
+    def test_tags(self):
+        cache = MemoryCache(max_entries=2)
+        cache.set('a', 1, tag='TASK:T1')
+        cache.set('b', 2, tag='TASK:T1')
+        cache.set('c', 3, tag='TASK:T2')
+        cache.invalidate('TASK:T1')
+
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache._tags, {'TASK:T2': set(['c'])})
+
+    def test_expired_entries_are_dropped(self):
+        cache = MemoryCache()
+        cache.set('a', 1, ttl=-1, tag='TASK:T1')
+
+        self.assertIsNone(cache.entry('a'))
+        self.assertEqual(len(cache._entries), 0)
+        self.assertEqual(cache._tags, {})
+
+
+class SQLiteCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'cache.db')
+
+    def rows(self, cache):
+        return cache._connect().execute(
+            'SELECT count(*) FROM entries').fetchone()[0]
+
+    def test_purge(self):
+        cache = SQLiteCache(self.path, grace=60, purge_every=None)
+        cache.set('stale', 1, ttl=-30)
+        cache.set('expired', 2, ttl=-90)
+        cache.set('fresh', 3)
+
+        self.assertEqual(cache.purge(), 1)
+        self.assertEqual(cache.entry('stale').value, 1)
+        self.assertIsNone(cache.entry('expired'))
+
+    def test_purges_as_it_goes(self):
+        cache = SQLiteCache(self.path, purge_every=3)
+        cache.set('a', 1, ttl=-1)
+        cache.set('b', 2, ttl=-1)
+        self.assertEqual(self.rows(cache), 2)
+
+        cache.set('c', 3)
+        self.assertEqual(self.rows(cache), 1)
+        self.assertEqual(cache.get('c'), 3)
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+
+from pyattask.changes import ChangeCursor, deleted_ids
+from pyattask.task import Task
+
+from tests.support import Recording, ReplayTestCase
+
+START = '2014-03-01T09:00:00:000-0500'
+T1 = '2014-03-02T10:15:00:000-0500'
+T2 = '2014-03-02T11:40:00:000-0500'
+
+FIELDS = 'ID,name,entryDate,lastUpdateDate'
+
+
+def task(id_, timestamp):
+    return {'ID': id_, 'objCode': 'TASK', 'name': 'Task ' + id_,
+            'entryDate': START, 'lastUpdateDate': timestamp}
+
+
+def since(timestamp, first, after=False):
+    """The search for changes at or after (or just after) timestamp"""
+    return {'lastUpdateDate': timestamp,
+            'lastUpdateDate_Mod': 'gt' if after else 'gte',
+            'lastUpdateDate_1_Sort': 'asc', 'ID_2_Sort': 'asc',
+            'fields': FIELDS, '$$FIRST': str(first), '$$LIMIT': '2'}
+
+
+def at(timestamp, after_id=None):
+    """The search for changes at exactly timestamp, after an ID"""
+    params = {'lastUpdateDate': timestamp, 'ID_Sort': 'asc',
+              'fields': FIELDS, '$$FIRST': '0', '$$LIMIT': '2'}
+    if after_id is not None:
+        params.update(ID=after_id, ID_Mod='gt')
+    return params
+
+
+class ChangeFeedTest(ReplayTestCase):
+
+    def feed(self, cursor):
+        return Task.changes(since=cursor, fields=['ID', 'name'], pagesize=2)
+
+    def test_pages_through_a_shared_timestamp(self):
+        # Three objects share T1, more than a page's worth
+        self.replay(Recording()
+                    .search('task', since(START, 0),
+                            [task('A', T1), task('B', T1)])
+                    .search('task', at(T1), [task('A', T1), task('B', T1)])
+                    .search('task', at(T1, 'B'), [task('C', T1)])
+                    .search('task', since(T1, 0, after=True), [task('D', T2)]))
+
+        feed = self.feed(START)
+        changes = [(change.kind, change.obj['id']) for change in feed]
+
+        self.assertEqual(changes, [('changed', 'A'), ('changed', 'B'),
+                                   ('changed', 'C'), ('changed', 'D')])
+        self.assertEqual(feed.cursor, ChangeCursor(T2, ['D']))
+
+    def test_resumes_within_a_shared_timestamp(self):
+        self.replay(Recording()
+                    .search('task', since(T1, 0),
+                            [task('A', T1), task('B', T1)])
+                    .search('task', at(T1), [task('A', T1), task('B', T1)])
+                    .search('task', at(T1, 'B'), [task('C', T1)])
+                    .search('task', since(T1, 0, after=True), []))
+
+        feed = self.feed(ChangeCursor(T1, ['A']))
+
+        self.assertEqual([change.obj['id'] for change in feed], ['B', 'C'])
+        self.assertEqual(feed.cursor, ChangeCursor(T1, ['A', 'B', 'C']))
+
+    def test_new_object_sorting_before_those_seen(self):
+        # AA was updated at T1 after the last feed delivered B at T1; it
+        # sorts first, so skipping by position would skip it instead of B
+        self.replay(Recording()
+                    .search('task', since(T1, 0),
+                            [task('AA', T1), task('B', T1)])
+                    .search('task', at(T1), [task('AA', T1), task('B', T1)])
+                    .search('task', at(T1, 'B'), [])
+                    .search('task', since(T1, 0, after=True), []))
+
+        feed = self.feed(ChangeCursor(T1, ['B']))
+
+        self.assertEqual([change.obj['id'] for change in feed], ['AA'])
+        self.assertEqual(feed.cursor, ChangeCursor(T1, ['AA', 'B']))
+
+    def test_added_or_changed(self):
+        added = dict(task('N', T2), entryDate=T1)
+        self.replay(Recording().search('task', since(START, 0),
+                                       [task('A', T1), added])
+                    .search('task', since(T2, 0), [added]))
+
+        feed = self.feed(START)
+
+        self.assertEqual([(change.kind, change.obj['id']) for change in feed],
+                         [('changed', 'A'), ('added', 'N')])
+
+
+class DeletedIdsTest(ReplayTestCase):
+
+    def sweep(self, after_id=None):
+        params = {'projectID': 'P1', 'ID_Sort': 'asc', 'fields': 'ID',
+                  '$$FIRST': '0', '$$LIMIT': '2'}
+        if after_id is not None:
+            params.update(ID=after_id, ID_Mod='gt')
+        return params
+
+    def ids(self, *ids):
+        return [{'ID': id_, 'objCode': 'TASK'} for id_ in ids]
+
+    def test_pages_by_id(self):
+        # T2 is deleted while the sweep is under way; paging by offset would
+        # then skip T4 and report it deleted too
+        self.replay(Recording()
+                    .search('task', self.sweep(), self.ids('T1', 'T2'))
+                    .search('task', self.sweep('T2'), self.ids('T4', 'T5'))
+                    .search('task', self.sweep('T5'), []))
+
+        missing = deleted_ids(Task, ['T1', 'T3', 'T4', 'T5', 'T6'],
+                              {'projectID': 'P1'}, pagesize=2)
+
+        self.assertEqual(missing, set(['T3', 'T6']))
+
+    def test_stops_once_all_are_found(self):
+        self.replay(Recording().search('task', self.sweep(),
+                                       self.ids('T1', 'T2')))
+
+        self.assertEqual(deleted_ids(Task, ['T1'], {'projectID': 'P1'},
+                                     pagesize=2), set())
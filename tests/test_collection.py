@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+
+import unittest
+
+from pyattask.collection import IndexedCollection
+from pyattask.task import Task
+
+
+def task(id_, **fields):
+    attrs = dict((Task._attr_name(field), value)
+                 for field, value in fields.items())
+    attrs['id'] = id_
+    return Task(attrs=attrs)
+
+
+class IndexedCollectionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tasks = IndexedCollection([
+            task('T1', status='NEW', assignedToID='U1'),
+            task('T2', status='INP', assignedToID='U1'),
+            task('T3', status='NEW', assignedToID='U2'),
+        ])
+
+    def ids(self, objs):
+        return sorted(obj['id'] for obj in objs)
+
+    def test_find(self):
+        self.assertEqual(self.ids(self.tasks.find(status='NEW')),
+                         ['T1', 'T3'])
+        self.assertEqual(
+            self.ids(self.tasks.find(status='NEW', assignedToID='U1')),
+            ['T1'])
+        self.assertEqual(self.tasks.find(status='CPL'), [])
+
+    def test_index_on_mixed_case_fields(self):
+        self.tasks.index_on('ID', 'assignedToID')
+        self.assertEqual(self.ids(self.tasks.find(assignedToID='U2',
+                                                  ID='T3')), ['T3'])
+        self.assertEqual(len(self.tasks._indexes), 1)
+
+    def test_indexes_follow_changes(self):
+        self.assertEqual(self.ids(self.tasks.find(status='NEW')),
+                         ['T1', 'T3'])
+        self.tasks.add(task('T1', status='INP', assignedToID='U1'))
+        self.tasks.remove('T3')
+        self.tasks.add(task('T4', status='NEW'))
+
+        self.assertEqual(self.ids(self.tasks.find(status='NEW')), ['T4'])
+        self.assertEqual(self.ids(self.tasks.find(status='INP')),
+                         ['T1', 'T2'])
+        self.assertEqual(len(self.tasks), 3)
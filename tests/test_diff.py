@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+
+import unittest
+
+from pyattask.diff import ADDED, CHANGED, REMOVED, diff, summarize
+from pyattask.task import Task
+
+from tests.support import Recording, ReplayTestCase
+
+
+def task(id_, **fields):
+    # Built directly rather than with from_json(), so that any field goes
+    attrs = dict((Task._attr_name(field), value)
+                 for field, value in fields.items())
+    attrs['id'] = id_
+    return Task(attrs=attrs)
+
+
+def deltas(old, new, **kwargs):
+    return sorted((delta.kind, delta.id, delta.changes)
+                  for delta in diff(old, new, **kwargs))
+
+
+class DiffTest(unittest.TestCase):
+
+    old = [task('T1', name='Plan', status='NEW'),
+           task('T2', name='Build', status='NEW'),
+           task('T3', name='Ship', status='NEW')]
+    new = [task('T1', name='Plan', status='NEW'),
+           task('T2', name='Build', status='INP'),
+           task('T4', name='Test', status='NEW')]
+
+    def test_changes(self):
+        self.assertEqual(deltas(self.old, self.new,
+                                fields=['name', 'status']), [
+            (ADDED, 'T4', {}),
+            (CHANGED, 'T2', {'status': ('NEW', 'INP')}),
+            (REMOVED, 'T3', {'name': ('Ship', None),
+                             'status': ('NEW', None)}),
+        ])
+
+    def test_without_changes(self):
+        self.assertEqual(deltas(self.old, self.new,
+                                fields=['name', 'status'], changes=False), [
+            (ADDED, 'T4', None), (CHANGED, 'T2', None), (REMOVED, 'T3', None),
+        ])
+
+    def test_only_the_given_fields_are_compared(self):
+        self.assertEqual(deltas(self.old, self.new, fields=['ID', 'name']), [
+            (ADDED, 'T4', {}),
+            (REMOVED, 'T3', {'name': ('Ship', None)}),
+        ])
+
+    def test_default_fields(self):
+        # The fields of the class requested by default, status among them
+        self.assertEqual([delta.id for delta in diff(self.old, self.new)
+                          if delta.kind == CHANGED], ['T2'])
+
+    def test_missing_field(self):
+        old = [task('T1', name='Plan', description='Draft')]
+        new = [task('T1', name='Plan')]
+        self.assertEqual(deltas(old, new, fields=['name', 'description']), [
+            (CHANGED, 'T1', {'description': ('Draft', None)}),
+        ])
+
+    def test_unhashable_values(self):
+        # Collection fields, e.g. fetched with fields=predecessors:*
+        old = [task('T1', predecessors=[{'ID': 'T0'}])]
+        new = [task('T1', predecessors=[{'ID': 'T0'}, {'ID': 'T5'}])]
+        for changes in (True, False):
+            self.assertEqual(
+                [delta.kind for delta in diff(old, new,
+                                              fields=['predecessors'],
+                                              changes=changes)],
+                [CHANGED])
+        self.assertEqual(list(diff(old, old, fields=['predecessors'],
+                                   changes=False)), [])
+
+    def test_duplicate_ids(self):
+        twice = [task('T1', name='Plan'), task('T1', name='Plan')]
+        self.assertRaises(ValueError, list,
+                          diff(twice, self.new, fields=['name']))
+        self.assertRaises(ValueError, list,
+                          diff(self.old, twice, fields=['name']))
+
+    def test_empty(self):
+        self.assertEqual(list(diff([], [])), [])
+        self.assertEqual(deltas([], self.new[:1]), [(ADDED, 'T1', {})])
+
+    def test_summarize(self):
+        self.assertEqual(
+            summarize(diff(self.old, self.new, fields=['name', 'status'])),
+            {ADDED: 1, CHANGED: 1, REMOVED: 1})
+
+
+class DiffSearchTest(ReplayTestCase):
+
+    def test_against_a_search(self):
+        page = {'projectID': 'P1', 'fields': 'ID,name,status', '$$LIMIT': 2}
+        self.replay(Recording()
+                    .search('task', dict(page, **{'$$FIRST': 0}), [
+                        {'ID': 'T1', 'objCode': 'TASK', 'name': 'Plan',
+                         'status': 'CPL'},
+                        {'ID': 'T2', 'objCode': 'TASK', 'name': 'Build',
+                         'status': 'NEW'},
+                    ])
+                    .search('task', dict(page, **{'$$FIRST': 2}), []))
+        old = [task('T1', name='Plan', status='INP'),
+               task('T2', name='Build', status='NEW'),
+               task('T3', name='Ship', status='NEW')]
+
+        new = Task.iter_search({'projectID': 'P1'},
+                               {'fields': 'ID,name,status'}, pagesize=2)
+
+        self.assertEqual(deltas(old, new, fields=['name', 'status']), [
+            (CHANGED, 'T1', {'status': ('INP', 'CPL')}),
+            (REMOVED, 'T3', {'name': ('Ship', None),
+                             'status': ('NEW', None)}),
+        ])
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+
+import time
+import unittest
+
+from pyattask.cache import MemoryCache
+from pyattask.events import UPDATE, EventReceiver, decode_event
+from pyattask.issue import Issue
+from pyattask.task import Task
+
+from tests.support import Recording, ReplayTestCase
+
+
+def issue(name):
+    return {'ID': 'I1', 'objCode': 'OPTASK', 'name': name}
+
+
+class DecodeTest(unittest.TestCase):
+
+    def test_issue(self):
+        event = decode_event({'eventType': UPDATE,
+                              'newState': issue('Broken build'),
+                              'oldState': issue('Build')})
+
+        self.assertEqual((event.kind, event.objcode, event.id),
+                         (UPDATE, 'OPTASK', 'I1'))
+        self.assertIsInstance(event.obj, Issue)
+        self.assertEqual(event.old['name'], 'Build')
+
+    def test_task(self):
+        event = decode_event({'eventType': 'DELETE', 'oldState': {
+            'ID': 'T1', 'objCode': 'TASK', 'name': 'Plan'}})
+
+        self.assertIsNone(event.obj)
+        self.assertIsInstance(event.old, Task)
+
+    def test_unknown_objcode(self):
+        state = {'ID': 'H1', 'objCode': 'HOUR', 'hours': 2}
+        event = decode_event({'eventType': 'CREATE', 'newState': state})
+
+        self.assertEqual(event.obj, state)
+
+    def test_not_an_event(self):
+        self.assertRaises(ValueError, decode_event, {'eventType': 'READ'})
+        self.assertRaises(ValueError, decode_event,
+                          {'eventType': UPDATE, 'newState': {'ID': 'T1'}})
+
+
+class InvalidateTest(ReplayTestCase):
+
+    def test_issue_event_drops_cached_issue(self):
+        fields = {'fields': 'ID,name'}
+        self.replay(Recording()
+                    .add('get', 'issue/I1', fields,
+                         body={'data': issue('Build')})
+                    .add('get', 'issue/I1', fields,
+                         body={'data': issue('Broken build')}))
+        self.session.set_cache(MemoryCache())
+
+        self.assertEqual(Issue.get('I1', params=dict(fields))['name'],
+                         'Build')
+        self.assertEqual(Issue.get('I1', params=dict(fields))['name'],
+                         'Build')
+        self.session.publish(decode_event({'eventType': UPDATE,
+                                           'newState': issue('Broken build')}))
+        self.assertEqual(Issue.get('I1', params=dict(fields))['name'],
+                         'Broken build')
+
+
+class ReceiverTest(unittest.TestCase):
+
+    def test_stop_without_start(self):
+        receiver = EventReceiver()
+        started = time.time()
+        receiver.stop()
+        self.assertLess(time.time() - started, 1)
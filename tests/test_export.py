@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+
+import json
+import os
+
+from pyattask.exceptions import GetHTTPError
+from pyattask.export import export
+from pyattask.task import Task
+
+from tests.support import Recording, ReplayTestCase
+
+
+def tasks(*ids):
+    return [{'ID': id_, 'objCode': 'TASK', 'name': 'Task ' + id_}
+            for id_ in ids]
+
+
+class ExportTest(ReplayTestCase):
+
+    def setUp(self):
+        super(ExportTest, self).setUp()
+        self.output = os.path.join(self.home, 'tasks.ndjson')
+        self.checkpoint = self.output + '.checkpoint'
+
+    def query(self, after_id=None):
+        params = {'status': 'NEW', 'ID_Sort': 'asc', 'fields': 'name,ID'}
+        if after_id is not None:
+            params.update(ID=after_id, ID_Mod='gt')
+        return params
+
+    def search(self, pagesize, first, after_id=None):
+        return dict(self.query(after_id),
+                    **{'$$FIRST': first, '$$LIMIT': pagesize})
+
+    def count(self, count, after_id=None):
+        return ('get', 'task/count', self.query(after_id), None,
+                {'data': {'count': count}})
+
+    def export(self, pagesize):
+        return export(Task, self.output, Task.query().where(status='NEW'),
+                      fields=['name'], pagesize=pagesize, concurrency=1,
+                      checkpoint=self.checkpoint)
+
+    def exported(self):
+        with open(self.output) as exported:
+            return [json.loads(line)['name'] for line in exported]
+
+    def test_export(self):
+        self.replay(Recording()
+                    .add(*self.count(3))
+                    .search('task', self.search(2, 0), tasks('T1', 'T2'))
+                    .search('task', self.search(2, 2), tasks('T3')))
+
+        self.assertEqual(self.export(2), 3)
+        self.assertEqual(self.exported(), ['Task T1', 'Task T2', 'Task T3'])
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_resume(self):
+        self.replay(Recording()
+                    .add(*self.count(4))
+                    .search('task', self.search(2, 0), tasks('T1', 'T2'))
+                    .add('get', 'task/search', self.search(2, 2),
+                         body={}, status_code=500))
+        self.assertRaises(GetHTTPError, self.export, 2)
+        self.assertEqual(self.exported(), ['Task T1', 'Task T2'])
+
+        # Resumed with another page size, after T1 was deleted and T5 added
+        self.replay(Recording()
+                    .add(*self.count(3, 'T2'))
+                    .search('task', self.search(3, 0, 'T2'),
+                            tasks('T3', 'T4', 'T5')))
+
+        self.assertEqual(self.export(3), 5)
+        self.assertEqual(self.exported(), ['Task T1', 'Task T2', 'Task T3',
+                                           'Task T4', 'Task T5'])
+
+    def test_checkpoint_for_another_export(self):
+        self.replay(Recording()
+                    .add(*self.count(4))
+                    .search('task', self.search(2, 0), tasks('T1', 'T2'))
+                    .add('get', 'task/search', self.search(2, 2),
+                         body={}, status_code=500))
+        self.assertRaises(GetHTTPError, self.export, 2)
+
+        self.assertRaises(ValueError, export, Task, self.output,
+                          fields=['name'], checkpoint=self.checkpoint)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+
+from pyattask.importer import import_rows
+from pyattask.task import Task
+
+from tests.support import Recording, ReplayTestCase
+
+
+def created(id_, record):
+    return dict(record, ID=id_, objCode='TASK')
+
+
+class ImportTest(ReplayTestCase):
+
+    def run_import(self, rows, **kwargs):
+        results = []
+        counts = import_rows(Task, enumerate(rows, 1), results.append,
+                             concurrency=1, **kwargs)
+        return counts, results
+
+    def outcomes(self, results):
+        return [(result['row'], result['action'], result['ID'],
+                 result['status']) for result in results]
+
+    def test_bulk(self):
+        creates = [{'name': 'Plan'}, {'name': 'Build'}]
+        updates = [{'ID': 'T8', 'name': 'Ship'}, {'ID': 'T9', 'name': 'Test'}]
+        self.replay(Recording()
+                    .write('post', 'task', creates,
+                           [created('T1', creates[0]),
+                            created('T2', creates[1])])
+                    .write('put', 'task', updates,
+                           [created('T8', updates[0]),
+                            created('T9', updates[1])]))
+
+        counts, results = self.run_import([creates[0], updates[0],
+                                           creates[1], updates[1]])
+
+        self.assertEqual(counts, (4, 0))
+        self.assertEqual(self.outcomes(results), [
+            (1, 'create', 'T1', 'ok'), (2, 'update', 'T8', 'ok'),
+            (3, 'create', 'T2', 'ok'), (4, 'update', 'T9', 'ok'),
+        ])
+
+    def test_invalid_rows(self):
+        rows = [{'name': 'Plan'}, {'name': 'Build', 'colour': 'red'}]
+        self.replay(Recording().write('post', 'task', rows[:1],
+                                      created('T1', rows[0])))
+
+        counts, results = self.run_import(rows)
+
+        self.assertEqual(counts, (1, 1))
+        self.assertEqual(results[1]['error'], 'unknown fields: colour')
+
+    def test_short_bulk_create(self):
+        # One object came back for three rows: which rows it was for can't
+        # be told, and creating them again could duplicate it
+        rows = [{'name': 'Plan'}, {'name': 'Build'}, {'name': 'Ship'}]
+        self.replay(Recording().write('post', 'task', rows,
+                                      [created('T1', rows[0])]))
+
+        counts, results = self.run_import(rows)
+
+        self.assertEqual(counts, (0, 3))
+        self.assertEqual(self.outcomes(results), [
+            (1, 'create', None, 'error'), (2, 'create', None, 'error'),
+            (3, 'create', None, 'error'),
+        ])
+        self.assertEqual(results[0]['error'],
+                         'bulk create returned 1 objects for 3 rows')
+
+    def test_short_bulk_update(self):
+        # Updates are retried one by one instead
+        rows = [{'ID': 'T1', 'name': 'Plan'}, {'ID': 'T2', 'name': 'Build'},
+                {'ID': 'T3', 'name': 'Ship'}]
+        recording = Recording().write('put', 'task', rows,
+                                      [created('T2', rows[1])])
+        recording.write('put', 'task', rows[:1], created('T1', rows[0]))
+        recording.write('put', 'task', rows[1:2], created('T2', rows[1]))
+        recording.write('put', 'task', rows[2:], None, status_code=404)
+        self.replay(recording)
+
+        counts, results = self.run_import(rows)
+
+        self.assertEqual(counts, (2, 1))
+        self.assertEqual(self.outcomes(results), [
+            (1, 'update', 'T1', 'ok'), (2, 'update', 'T2', 'ok'),
+            (3, 'update', 'T3', 'error'),
+        ])
+
+    def test_failed_bulk_is_retried_singly(self):
+        rows = [{'name': 'Plan'}, {'name': ''}]
+        recording = Recording().write('post', 'task', rows, None,
+                                      status_code=422)
+        recording.write('post', 'task', rows[:1], created('T1', rows[0]))
+        recording.write('post', 'task', rows[1:], None, status_code=422)
+        self.replay(recording)
+
+        counts, results = self.run_import(rows)
+
+        self.assertEqual(counts, (1, 1))
+        self.assertEqual(self.outcomes(results), [
+            (1, 'create', 'T1', 'ok'), (2, 'create', None, 'error'),
+        ])
+
+    def test_failed_bulk_create_is_not_retried(self):
+        # A 5xx leaves it unknown whether the objects were created, so
+        # creating them one by one could duplicate them
+        rows = [{'name': 'Plan'}, {'name': 'Build'}]
+        recording = Recording().write('post', 'task', rows, None,
+                                      status_code=503)
+        recording.write('post', 'task', rows[:1], created('T1', rows[0]))
+        recording.write('post', 'task', rows[1:], created('T2', rows[1]))
+        self.replay(recording)
+
+        counts, results = self.run_import(rows)
+
+        self.assertEqual(counts, (0, 2))
+        self.assertIn('returned error 503', results[0]['error'])
+
+    def test_failed_bulk_update_is_retried(self):
+        rows = [{'ID': 'T1', 'name': 'Plan'}, {'ID': 'T2', 'name': 'Build'}]
+        recording = Recording().write('put', 'task', rows, None,
+                                      status_code=503)
+        recording.write('put', 'task', rows[:1], created('T1', rows[0]))
+        recording.write('put', 'task', rows[1:], created('T2', rows[1]))
+        self.replay(recording)
+
+        counts, results = self.run_import(rows)
+
+        self.assertEqual(counts, (2, 0))
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+import time
+
+from pyattask.task import Task
+
+from tests.support import Recording, ReplayTestCase
+
+
+def tasks(*ids):
+    return [{'ID': id_, 'objCode': 'TASK', 'name': 'Task ' + id_}
+            for id_ in ids]
+
+
+class SearchAllTest(ReplayTestCase):
+
+    def setUp(self):
+        super(SearchAllTest, self).setUp()
+        self.addCleanup(setattr, Task, '_api_max_results',
+                        Task._api_max_results)
+        Task._api_max_results = 2
+
+    def page(self, first, **params):
+        return dict(params, fields='ID,name', ID_Sort='asc',
+                    **{'$$FIRST': first, '$$LIMIT': 2})
+
+    def ids(self, objs):
+        return [obj['id'] for obj in objs]
+
+    def test_one_page(self):
+        # A short first page is all there is; no need to count
+        self.replay(Recording().search('task', self.page(0, status='NEW'),
+                                       tasks('T1')))
+
+        found = Task.search_all({'status': 'NEW'}, {'fields': 'ID,name'})
+
+        self.assertEqual(self.ids(found), ['T1'])
+
+    def test_pages(self):
+        self.replay(Recording()
+                    .search('task', self.page(0, status='NEW'),
+                            tasks('T1', 'T2'))
+                    .add('get', 'task/count', {'status': 'NEW'},
+                         body={'data': {'count': 5}})
+                    .search('task', self.page(2, status='NEW'),
+                            tasks('T3', 'T4'))
+                    .search('task', self.page(4, status='NEW'),
+                            tasks('T5')))
+
+        found = Task.search_all({'status': 'NEW'}, {'fields': 'ID,name'})
+
+        self.assertEqual(self.ids(found), ['T1', 'T2', 'T3', 'T4', 'T5'])
+
+    def test_query_sorted_by_id_last(self):
+        self.replay(Recording().search('task', {
+            'status': 'NEW', 'name_1_Sort': 'asc', 'ID_2_Sort': 'asc',
+            'fields': 'ID,name', '$$FIRST': 0, '$$LIMIT': 2,
+        }, tasks('T1')))
+
+        found = Task.search_all(Task.query().where(status='NEW')
+                                .order_by('name').fields('ID', 'name'))
+
+        self.assertEqual(self.ids(found), ['T1'])
+
+
+class PrefetchTest(ReplayTestCase):
+
+    def test_close_does_not_wait_for_requests_in_flight(self):
+        def page(first):
+            return {'fields': 'ID,name', '$$FIRST': first, '$$LIMIT': 2}
+        self.replay(Recording()
+                    .search('task', page(0), tasks('T1', 'T2'))
+                    .search('task', page(2), tasks('T3', 'T4'))
+                    .search('task', page(4), tasks('T5', 'T6')),
+                    latency=1.0)
+
+        results = Task.iter_search({}, {'fields': 'ID,name'}, pagesize=2,
+                                   prefetch=2)
+        self.assertEqual(next(results)['id'], 'T1')
+        started = time.time()
+        results.close()
+
+        self.assertLess(time.time() - started, 0.5)
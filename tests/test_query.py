@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+
+import datetime
+import unittest
+
+from pyattask.task import Task
+
+from tests.support import Recording, ReplayTestCase
+
+
+class CompileTest(unittest.TestCase):
+
+    def test_equality(self):
+        self.assertEqual(Task.query().where(status='NEW').params(),
+                         {'status': 'NEW'})
+
+    def test_modifiers(self):
+        query = Task.query().where(status__in=['NEW', 'INP'],
+                                   priority__gte=3, description__isnull=True)
+        self.assertEqual(query.params(), {
+            'status': ['NEW', 'INP'], 'status_Mod': 'in',
+            'priority': '3', 'priority_Mod': 'gte',
+            'description_Mod': 'isnull',
+        })
+
+    def test_values(self):
+        query = Task.query().where(
+            milestone=False,
+            plannedStartDate__gt=datetime.datetime(2014, 3, 1, 9, 30),
+            plannedCompletionDate__lt=datetime.date(2014, 4, 1))
+        self.assertEqual(query.params(), {
+            'milestone': 'false',
+            'plannedStartDate': '2014-03-01T09:30:00',
+            'plannedStartDate_Mod': 'gt',
+            'plannedCompletionDate': '2014-04-01',
+            'plannedCompletionDate_Mod': 'lt',
+        })
+
+    def test_between(self):
+        query = Task.query().where(priority__between=(1, 3))
+        self.assertEqual(query.params(), {
+            'priority': '1', 'priority_Range': '3', 'priority_Mod': 'between',
+        })
+
+    def test_gte_and_lte_make_a_range(self):
+        query = Task.query().where(priority__gte=1).where(priority__lte=3)
+        self.assertEqual(query, Task.query().where(priority__between=(1, 3)))
+
+    def test_repeated_condition(self):
+        query = Task.query().where(status='NEW').where(status='NEW')
+        self.assertEqual(query.params(), {'status': 'NEW'})
+
+    def test_conflicting_conditions(self):
+        query = Task.query().where(status='NEW')
+        self.assertRaises(ValueError, query.where, status='INP')
+        self.assertRaises(ValueError, query.where, status__ne='CPL')
+
+    def test_unknown_suffix(self):
+        self.assertRaises(ValueError, Task.query().where, status__near='NEW')
+
+    def test_none_is_null(self):
+        self.assertEqual(Task.query().where(parentID=None).params(),
+                         {'parentID_Mod': 'isnull'})
+        self.assertEqual(Task.query().where(parentID__ne=None).params(),
+                         {'parentID_Mod': 'notnull'})
+        self.assertRaises(ValueError, Task.query().where, priority__gt=None)
+        self.assertRaises(ValueError, Task.query().where,
+                          status__in=['NEW', None])
+
+    def test_empty_in(self):
+        self.assertRaises(ValueError, Task.query().where, status__in=[])
+
+    def test_any_of(self):
+        query = Task.query().where(projectID='P1').any_of(
+            {'status': 'NEW'}, {'assignedToID__isnull': True})
+        self.assertEqual(query.params(), {
+            'projectID': 'P1',
+            'OR:1:status': 'NEW',
+            'OR:2:assignedToID_Mod': 'isnull',
+        })
+
+    def test_any_of_merges_each_group(self):
+        query = Task.query().any_of({'priority__gte': 1, 'priority__lte': 3})
+        self.assertEqual(query.params(), {
+            'OR:1:priority': '1', 'OR:1:priority_Range': '3',
+            'OR:1:priority_Mod': 'between',
+        })
+        self.assertRaises(ValueError, Task.query().any_of,
+                          {'priority__gt': 1, 'priority__lte': 3})
+
+    def test_order_by(self):
+        self.assertEqual(Task.query().order_by('-entryDate').params(),
+                         {'entryDate_Sort': 'desc'})
+        self.assertEqual(Task.query().order_by('lastUpdateDate', 'ID').params(),
+                         {'lastUpdateDate_1_Sort': 'asc', 'ID_2_Sort': 'asc'})
+
+    def test_then_by(self):
+        query = Task.query().order_by('-entryDate').then_by('name', 'ID')
+        self.assertEqual(query, Task.query().order_by('-entryDate', 'name',
+                                                      'ID'))
+        self.assertEqual(query.then_by('entryDate'), query)
+
+    def test_fields_and_slice(self):
+        query = Task.query().fields('ID', 'name').slice(100, 50)
+        self.assertEqual(query.params(), {
+            'fields': 'ID,name', '$$FIRST': '100', '$$LIMIT': '50',
+        })
+
+    def test_immutable(self):
+        base = Task.query().where(status='NEW')
+        base.where(priority=1)
+        self.assertEqual(base.params(), {'status': 'NEW'})
+
+    def test_hashable(self):
+        first = Task.query().where(status__in=['NEW'], priority=1)
+        second = Task.query().where(status__in=['NEW']).where(priority=1)
+        self.assertEqual(first, second)
+        self.assertEqual(len(set([first, second])), 1)
+
+
+class SearchTest(ReplayTestCase):
+
+    def test_search_sends_the_compiled_query(self):
+        self.replay(Recording().search('task', {
+            'status': ['NEW', 'INP'], 'status_Mod': 'in',
+            'priority': '1', 'priority_Range': '3', 'priority_Mod': 'between',
+            'fields': 'ID,name',
+        }, [{'ID': 'T1', 'objCode': 'TASK', 'name': 'Plan'}]))
+
+        tasks = Task.query().where(
+            status__in=['NEW', 'INP'], priority__gte=1, priority__lte=3
+        ).fields('ID', 'name').search()
+
+        self.assertEqual([task['id'] for task in tasks], ['T1'])
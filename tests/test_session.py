@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+import unittest
+
+from pyattask.exceptions import AuthenticationError, GetHTTPError
+from pyattask.session import AtTaskSession
+from pyattask.task import Task
+from pyattask.transport import scrub_url
+
+from tests.support import URL, USERID, Recording, ReplayTestCase
+
+
+class CredentialsTest(ReplayTestCase):
+
+    def test_api_key_goes_in_a_header(self):
+        self.replay(Recording().add('get', 'session',
+                                    body={'data': {'userID': USERID}}))
+
+        self.assertTrue(self.session.login_apikey('s3cret'))
+        self.assertEqual(self.session._session.headers['apiKey'], 's3cret')
+        self.assertNotIn('apiKey', self.session._session.params)
+
+    def test_errors_hide_credentials(self):
+        self.replay(Recording().add(
+            'get', 'task/search', {'status': 'NEW'}, body={}, status_code=500,
+            response_url=URL + '/task/search?status=NEW&apiKey=s3cret'))
+
+        with self.assertRaises(GetHTTPError) as raised:
+            Task.search({'status': 'NEW'})
+        self.assertNotIn('s3cret', str(raised.exception))
+        self.assertIn('status=NEW', str(raised.exception))
+
+    def test_scrub_url(self):
+        self.assertEqual(scrub_url(URL + '/task?apiKey=s3cret&ID=T1'),
+                         URL + '/task?apiKey=SCRUBBED&ID=T1')
+        self.assertEqual(scrub_url(URL + '/task/T1'), URL + '/task/T1')
+
+
+class SamlFormTest(unittest.TestCase):
+
+    def test_form(self):
+        form = AtTaskSession._extract_saml_form(
+            '<form action="https://sp/acs">'
+            '<input name="SAMLResponse" value="abc"></form>')
+        self.assertEqual(form['url'], 'https://sp/acs')
+        self.assertEqual(form['values']['SAMLResponse'], 'abc')
+
+    def test_no_form(self):
+        self.assertRaises(AuthenticationError,
+                          AtTaskSession._extract_saml_form, '<p>Sorry</p>')
+
+    def test_malformed_html(self):
+        self.assertRaises(AuthenticationError,
+                          AtTaskSession._extract_saml_form,
+                          '<![foo]><form action="https://sp/acs">')
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#  Copyright (C) 2014 Jump Operations, LLC
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to:
+#    Free Software Foundation, Inc.
+#    51 Franklin Street, Fifth Floor
+#    Boston, MA  02110-1301, USA.
+
+import unittest
+
+from pyattask.project import Project
+from pyattask.task import Task
+from pyattask.tree import ProjectTree, load_tree
+
+from tests.support import Recording, ReplayTestCase
+
+
+def task(id_, parent_id, wbs, number, status):
+    return {'ID': id_, 'objCode': 'TASK', 'name': 'Task ' + id_,
+            'parentID': parent_id, 'wbs': wbs, 'taskNumber': number,
+            'status': status}
+
+
+def issue(id_, status):
+    return {'ID': id_, 'objCode': 'OPTASK', 'name': 'Issue ' + id_,
+            'status': status}
+
+
+class LoadTreeTest(ReplayTestCase):
+
+    # Null fields are dropped from the objects altogether
+    session_settings = {'strip_empty': True}
+
+    def setUp(self):
+        super(LoadTreeTest, self).setUp()
+        self.replay(
+            Recording()
+            .add('get', 'project/P1', {'fields': 'ID,name'},
+                 body={'data': {'ID': 'P1', 'objCode': 'PROJ',
+                                'name': 'Launch'}})
+            .search('task', {
+                'projectID': 'P1', 'fields': 'ID,name,wbs,taskNumber,'
+                'parentID,status', 'ID_Sort': 'asc',
+                '$$FIRST': 0, '$$LIMIT': 2000,
+            }, [
+                task('T1', None, '1', 1, 'INP'),
+                task('T2', 'T1', '1.1', 2, 'NEW'),
+                task('T3', 'T1', '1.2', 3, None),
+                task('T4', None, None, None, None),
+            ])
+            .search('issue', {
+                'projectID': 'P1', 'fields': 'ID,name,status',
+                'ID_Sort': 'asc', '$$FIRST': 0, '$$LIMIT': 2000,
+            }, [issue('I1', 'NEW'), issue('I2', None)]))
+        self.tree = load_tree(Project, 'P1', fields=['ID', 'name'],
+                              task_fields=['ID', 'name'],
+                              issue_fields=['ID', 'name'])
+
+    def ids(self, objs):
+        return [obj['id'] for obj in objs]
+
+    def test_project(self):
+        self.assertEqual(self.tree.project['name'], 'Launch')
+        self.assertEqual(len(self.tree.tasks), 4)
+        self.assertEqual(len(self.tree.issues), 2)
+
+    def test_hierarchy(self):
+        self.assertEqual(self.ids(self.tree.roots()), ['T1', 'T4'])
+        self.assertEqual(self.ids(self.tree.children('T1')), ['T2', 'T3'])
+        self.assertEqual(self.tree.children('T4'), [])
+        self.assertEqual(self.tree.parent('T2')['id'], 'T1')
+        self.assertIsNone(self.tree.parent('T1'))
+        self.assertIsNone(self.tree.parent(self.tree.task('T4')))
+
+    def test_lookups(self):
+        self.assertEqual(self.tree.task_by_wbs('1.2')['id'], 'T3')
+        self.assertEqual(self.tree.task_by_number(2)['id'], 'T2')
+        self.assertRaises(KeyError, self.tree.task_by_wbs, None)
+        self.assertRaises(KeyError, self.tree.task_by_number, None)
+        self.assertEqual(self.tree.issue('I2')['name'], 'Issue I2')
+
+    def test_status(self):
+        self.assertEqual(self.ids(self.tree.tasks_with_status('INP')),
+                         ['T1'])
+        self.assertEqual(self.ids(self.tree.tasks_with_status(None)),
+                         ['T3', 'T4'])
+        self.assertEqual(self.ids(self.tree.issues_with_status('NEW')),
+                         ['I1'])
+        self.assertEqual(self.tree.issues_with_status('CLS'), [])
+
+
+class ProjectTreeTest(unittest.TestCase):
+
+    def test_unfetched_fields(self):
+        # Only IDs: nothing to index but the IDs themselves
+        tasks = [Task.from_json({'ID': 'T1', 'objCode': 'TASK'})]
+        tree = ProjectTree(None, tasks, [])
+
+        self.assertEqual(tree.task('T1'), tasks[0])
+        self.assertEqual(tree.roots(), tasks)
+        self.assertIsNone(tree.parent('T1'))